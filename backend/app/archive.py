@@ -0,0 +1,132 @@
+"""Hot/cold split of maintenance requests.
+
+REPAIRED and SCRAP requests closed more than ``ARCHIVE_AFTER_DAYS`` ago are
+moved from ``maintenance_requests`` to ``maintenance_requests_archive``, so
+the list, calendar, dashboard and dispatch queries only ever touch live
+work.
+
+The move runs in small batches, each its own short transaction: pick up to
+``ARCHIVE_BATCH_SIZE`` ids (``FOR UPDATE SKIP LOCKED`` on PostgreSQL, so
+rows a user is editing are left for the next run and nobody waits on the
+archiver), ``INSERT ... SELECT`` them into the archive and delete them from
+the hot table. Insert and delete commit together, so a crash loses nothing
+and the next run simply continues with whatever is still hot.
+
+Readers that need history (``GET /requests/history``, the export) call
+:func:`reaches` with the lower bounds of their date range and union the
+archive in only when it can hold matching rows.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, literal, select
+
+from . import http_cache, metrics, models, stats
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# Breather between batches so the archiver never monopolizes the database.
+ARCHIVE_BATCH_PAUSE_SECONDS = float(os.getenv("ARCHIVE_BATCH_PAUSE_SECONDS", "0.1"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+CLOSED_STAGES = (models.RequestStage.REPAIRED, models.RequestStage.SCRAP)
+
+ARCHIVED_REQUESTS = metrics.Counter(
+    "archived_requests_total", "Maintenance requests moved to the archive table."
+)
+
+_HOT = models.MaintenanceRequest.__table__
+_COLD = models.ArchivedMaintenanceRequest.__table__
+
+
+def cutoff(now=None):
+    """Requests closed before this (naive UTC, like ``completed_at``) are archived."""
+    return (now or datetime.utcnow()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+async def archive_batch(db, before, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move up to ``batch_size`` requests closed before ``before``; commits. Returns how many moved."""
+    # SCRAP does not set completed_at; its last update is when it was closed.
+    closed_at = func.coalesce(_HOT.c.completed_at, _HOT.c.updated_at)
+    pick = (
+        select(_HOT.c.id, _HOT.c.stage, _HOT.c.company_name)
+        .where(_HOT.c.stage.in_(CLOSED_STAGES), closed_at < before)
+        .order_by(_HOT.c.id)
+        .limit(batch_size)
+    )
+    connection = await db.connection()
+    if connection.dialect.name == "postgresql":
+        pick = pick.with_for_update(skip_locked=True)
+    rows = (await db.execute(pick)).all()
+    if not rows:
+        await db.rollback()
+        return 0
+
+    ids = [row.id for row in rows]
+    names = [column.name for column in _HOT.columns]
+    await db.execute(
+        _COLD.insert().from_select(
+            [*names, "archived_at"],
+            select(*_HOT.c, literal(datetime.now(timezone.utc), _COLD.c.archived_at.type)).where(_HOT.c.id.in_(ids)),
+        )
+    )
+    await db.execute(delete(_HOT).where(_HOT.c.id.in_(ids)))
+
+    # Core statements bypass the flush hooks: the stage counters only count hot rows (like reconcile).
+    deltas = Counter()
+    for row in rows:
+        deltas[stats.counter_name("request_stage", row.stage, row.company_name)] -= 1
+    await connection.run_sync(lambda sync_conn: stats.apply_deltas(sync_conn, deltas))
+    await db.commit()
+    http_cache.bump(_HOT.name, _COLD.name)
+    ARCHIVED_REQUESTS.inc(len(ids))
+    return len(ids)
+
+
+async def run(session_factory, before=None, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive everything closed before ``before`` (default :func:`cutoff`), batch by batch."""
+    before = before or cutoff()
+    total = 0
+    while True:
+        async with session_factory() as db:
+            moved = await archive_batch(db, before, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+        await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+    if total:
+        logger.info("Archived %d maintenance requests closed before %s", total, before.isoformat())
+    return total
+
+
+async def reaches(db, created_from=None, completed_from=None) -> bool:
+    """Whether archived rows can match a range starting at ``created_from`` / ``completed_from``.
+
+    Upper bounds never exclude the archive (it only holds the oldest work),
+    so only the lower bounds are checked, against the newest archived values.
+    """
+    # Two single-aggregate subqueries so each is an index endpoint lookup.
+    newest_created, newest_completed = (await db.execute(select(
+        select(func.max(_COLD.c.created_at)).scalar_subquery(),
+        select(func.max(_COLD.c.completed_at)).scalar_subquery(),
+    ))).one()
+    if newest_created is None:
+        return False
+    if created_from is not None and created_from.replace(tzinfo=None) > newest_created.replace(tzinfo=None):
+        return False
+    if completed_from is not None and (newest_completed is None or completed_from > newest_completed):
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    from .database import AsyncSessionLocal, Base, engine
+
+    Base.metadata.create_all(bind=engine, tables=[_COLD])
+    moved = asyncio.run(run(AsyncSessionLocal))
+    print(f"Archived {moved} maintenance requests.")
@@ -0,0 +1,18 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(interval: float, job, *, run_first: bool = True):
+    """Call ``await job()`` every ``interval`` seconds until cancelled; failures are logged, not raised."""
+    if not run_first:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background job %s failed", getattr(job, "__name__", job))
+        await asyncio.sleep(interval)
@@ -0,0 +1,352 @@
+"""Streaming bulk import of equipment and work centers.
+
+The request body (CSV with a header row, or NDJSON) is parsed as it
+arrives, one record per line (a quoted CSV field may span lines). Records are validated against the Create
+schema and buffered into batches; each batch resolves its references with
+one query per reference type, checks for existing keys with one query, is
+written with a single COPY (PostgreSQL, insert mode) or executemany, and is
+committed on its own so a large import makes steady progress. Invalid rows
+are skipped and reported with their row number.
+
+In ``upsert`` mode rows whose natural key (serial_number / code) exists are
+updated in place - only the columns present in the row are overwritten -
+and the rest are inserted. Natural keys are unique within a company, so
+only the caller's own rows are looked up and updated.
+"""
+import codecs
+import csv
+import json
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import http_cache, models, schemas, stats, tenancy
+
+FORMATS = ("csv", "ndjson")
+MODES = ("insert", "upsert")
+
+
+@dataclass
+class Reference:
+    """A foreign key that may be given as ``<field>`` (id) or ``<name_field>`` (natural key)."""
+    field: str
+    name_field: str
+    model: type
+    name_column: str
+    label: str
+
+
+@dataclass
+class ImportSpec:
+    model: type
+    schema: type
+    key: str  # natural key used for duplicate detection / upsert
+    references: tuple = ()
+    required: tuple = ()  # optional in the schema but NOT NULL in the table
+    tracked_status: bool = False  # maintain stats counters for Equipment.status
+
+
+EQUIPMENT_IMPORT = ImportSpec(
+    model=models.Equipment,
+    schema=schemas.EquipmentCreate,
+    key="serial_number",
+    references=(
+        Reference("category_id", "category", models.Category, "name", "Category"),
+        Reference("default_team_id", "default_team", models.Team, "name", "Team"),
+        Reference("default_technician_id", "default_technician", models.User, "username", "Technician"),
+    ),
+    required=("default_team_id", "default_technician_id"),
+    tracked_status=True,
+)
+
+WORK_CENTER_IMPORT = ImportSpec(
+    model=models.WorkCenter,
+    schema=schemas.WorkCenterCreate,
+    key="code",
+)
+
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, row: int, message):
+        self.failed += 1
+        self.errors.append({"row": row, "error": message})
+
+
+async def _lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+class _Feed:
+    """Lines pushed in as the body streams, pulled by one csv.reader."""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _csv_rows(request: Request):
+    """Yield each CSV record (list of values, or the csv.Error) once all its lines have arrived.
+
+    One reader parses the whole body, so a quoted field may span lines. A
+    record is complete when its quotes balance: RFC 4180 doubles the quotes
+    inside a field, so an odd count means a quoted field is still open.
+    """
+    feed = _Feed()
+    reader = csv.reader(feed)
+    quotes = 0
+    async for line in _lines(request):
+        if not feed.lines and not line.strip():
+            continue
+        feed.lines.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        try:
+            yield next(reader)
+        except csv.Error as e:
+            feed.lines.clear()
+            yield e
+    if feed.lines:
+        yield csv.Error("unterminated quoted field at end of data")
+
+
+async def iter_records(request: Request, fmt: str):
+    """Yield (row_number, record dict | error string) as the body streams in."""
+    row = 0
+    if fmt == "csv":
+        header = None
+        async for values in _csv_rows(request):
+            if header is None:
+                if isinstance(values, csv.Error):
+                    raise HTTPException(status_code=400, detail=f"invalid CSV header: {values}")
+                header = [name.strip() for name in values]
+                continue
+            row += 1
+            if isinstance(values, csv.Error):
+                yield row, str(values)
+            elif len(values) != len(header):
+                yield row, f"expected {len(header)} columns, got {len(values)}"
+            else:
+                # Empty CSV cells mean "not provided".
+                yield row, {k: v for k, v in zip(header, values) if v != ""}
+        return
+
+    async for line in _lines(request):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("each line must be a JSON object")
+            yield row, record
+        except ValueError as e:
+            yield row, str(e)
+
+
+class _Row:
+    __slots__ = ("number", "record", "raw", "fields")
+
+    def __init__(self, number: int, record: dict, raw: dict, fields: set):
+        self.number = number
+        self.record = record  # validated, with schema defaults
+        self.raw = raw
+        self.fields = fields  # columns actually provided (what an upsert may overwrite)
+
+
+async def _resolve_references(db, spec: ImportSpec, batch, report: ImportReport):
+    """Fill id fields from names and drop rows whose references do not exist."""
+    for ref in spec.references:
+        ids = {r.record[ref.field] for r in batch if r.record.get(ref.field) is not None}
+        names = {r.raw[ref.name_field] for r in batch if r.record.get(ref.field) is None and r.raw.get(ref.name_field)}
+        if not ids and not names:
+            continue
+        model = ref.model
+        name_column = getattr(model, ref.name_column)
+        rows = await db.execute(
+            select(model.id, name_column).where(or_(model.id.in_(ids), name_column.in_(names)))
+        )
+        known_ids, by_name = set(), {}
+        for id_, name in rows:
+            known_ids.add(id_)
+            by_name[name] = id_
+
+        kept = []
+        for r in batch:
+            if r.record.get(ref.field) is None and r.raw.get(ref.name_field):
+                r.record[ref.field] = by_name.get(r.raw[ref.name_field])
+                if r.record[ref.field] is None:
+                    report.error(r.number, f"{ref.label} '{r.raw[ref.name_field]}' not found")
+                    continue
+                r.fields.add(ref.field)
+            elif r.record.get(ref.field) is not None and r.record[ref.field] not in known_ids:
+                report.error(r.number, f"{ref.label} {r.record[ref.field]} not found")
+                continue
+            kept.append(r)
+        batch = kept
+    return batch
+
+
+async def _copy(db, table, records):
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    columns = list(records[0].keys())
+    await raw.driver_connection.copy_records_to_table(
+        table.name,
+        records=[tuple(getattr(r[c], "value", r[c]) for c in columns) for r in records],
+        columns=columns,
+    )
+
+
+async def _update_by_key(db, table, key: str, rows, tenant):
+    # One executemany per distinct set of provided columns (normally exactly one).
+    groups = {}
+    for r in rows:
+        columns = tuple(sorted(c for c in r.fields if c != key))
+        groups.setdefault(columns, []).append(r)
+    for columns, group in groups.items():
+        if not columns:
+            continue
+        # SET clause comes from the parameter keys
+        stmt = update(table).where(table.c[key] == bindparam("_key"), tenancy.criterion(table.c.company_name, tenant))
+        await db.execute(stmt, [{"_key": r.record[key], **{c: r.record[c] for c in columns}} for r in group])
+
+
+async def _write_batch(db, spec: ImportSpec, mode: str, batch, report: ImportReport):
+    # References resolve through ORM selects (tenant-scoped by the session); the
+    # Core statements below add the tenant themselves.
+    batch = await _resolve_references(db, spec, batch, report)
+    table = spec.model.__table__
+    key_column = table.c[spec.key]
+    tenant = tenancy.tenant_of(db)
+
+    existing = {}
+    keys = [r.record[spec.key] for r in batch]
+    if keys:
+        columns = [key_column] + ([table.c.status] if spec.tracked_status else [])
+        stmt = select(*columns).where(key_column.in_(keys), tenancy.criterion(table.c.company_name, tenant))
+        for row in await db.execute(stmt):
+            existing[row[0]] = row[1] if spec.tracked_status else None
+
+    seen = set()
+    inserts, updates = [], []
+    for r in batch:
+        key = r.record[spec.key]
+        if key in seen:
+            report.error(r.number, f"duplicate {spec.key} '{key}' in this import")
+            continue
+        seen.add(key)
+        if key in existing:
+            if mode == "insert":
+                report.error(r.number, f"{spec.key} '{key}' already exists")
+                continue
+            updates.append(r)
+        else:
+            inserts.append(r)
+
+    if not inserts and not updates:
+        return
+
+    try:
+        if inserts:
+            records = [{**r.record, "company_name": tenant} for r in inserts]
+            if (await db.connection()).dialect.name == "postgresql":
+                await _copy(db, table, records)
+            else:
+                await db.execute(insert(table), records)
+        if updates:
+            await _update_by_key(db, table, spec.key, updates, tenant)
+
+        if spec.tracked_status:
+            deltas = Counter()
+            for r in inserts:
+                deltas[stats.counter_name("equipment_status", r.record["status"], tenant)] += 1
+            for r in updates:
+                old, new = existing[r.record[spec.key]], r.record["status"]
+                if "status" in r.fields and old != new:
+                    deltas[stats.counter_name("equipment_status", old, tenant)] -= 1
+                    deltas[stats.counter_name("equipment_status", new, tenant)] += 1
+            connection = await db.connection()
+            await connection.run_sync(lambda sync_conn: stats.apply_deltas(sync_conn, deltas))
+
+        await db.commit()
+    except IntegrityError as e:
+        # e.g. a concurrent writer took one of the keys; report the batch instead of failing the import
+        await db.rollback()
+        for r in inserts + updates:
+            report.error(r.number, f"batch rejected by the database: {e.orig}")
+        return
+
+    http_cache.bump(table.name)
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+
+async def run_import(db, request: Request, spec: ImportSpec, fmt: str, mode: str, batch_size: int) -> dict:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    if mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(MODES)}")
+
+    report = ImportReport()
+    batch = []
+    names = {ref.name_field: ref.field for ref in spec.references}
+    async for number, raw in iter_records(request, fmt):
+        report.processed += 1
+        if isinstance(raw, str):
+            report.error(number, raw)
+            continue
+        try:
+            validated = spec.schema(**{k: v for k, v in raw.items() if k not in names})
+        except ValidationError as e:
+            report.error(number, e.errors(include_url=False, include_context=False))
+            continue
+        missing = [
+            f for f in spec.required
+            if getattr(validated, f) is None and not any(raw.get(n) for n, target in names.items() if target == f)
+        ]
+        if missing:
+            report.error(number, f"missing required field(s): {', '.join(missing)}")
+            continue
+        batch.append(_Row(number, validated.model_dump(), raw, set(validated.model_fields_set)))
+        if len(batch) >= batch_size:
+            await _write_batch(db, spec, mode, batch, report)
+            batch = []
+    if batch:
+        await _write_batch(db, spec, mode, batch, report)
+
+    return {
+        "processed": report.processed,
+        "inserted": report.inserted,
+        "updated": report.updated,
+        "failed": report.failed,
+        "errors": report.errors,
+    }
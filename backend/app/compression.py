@@ -0,0 +1,119 @@
+"""Response compression (brotli when installed, else gzip).
+
+Only complete, single-message bodies of at least COMPRESSION_MIN_SIZE bytes
+are compressed; small bodies are not worth the CPU and streamed responses
+(SSE, exports) pass through untouched so they keep flushing incrementally.
+Responses that already carry a Content-Encoding (e.g. ``/requests/export``
+with ``gzip=true``) are left alone. Every other response of a compressible
+type carries ``Vary: Accept-Encoding``, compressed or not, so a shared cache
+keeps the identity and the encoded variants apart.
+"""
+import gzip
+import os
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+COMPRESSED_BYTES = metrics.Counter(
+    "http_response_compressed_bytes_total", "Response body bytes before and after compression.", ("encoding", "stage")
+)
+
+
+def _accepted(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def _vary_on_encoding(headers):
+    """``headers`` with Accept-Encoding merged into its Vary header."""
+    vary = [v for k, v in headers if k == b"vary"]
+    if any(part.strip().lower() in (b"accept-encoding", b"*") for v in vary for part in v.split(b",")):
+        return headers
+    return [(k, v) for k, v in headers if k != b"vary"] + [(b"vary", b", ".join(vary + [b"Accept-Encoding"]))]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware; see the module docstring for what gets compressed."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            response_headers = [(k.lower(), v) for k, v in start.get("headers", [])]
+            content_type = next((v for k, v in response_headers if k == b"content-type"), b"").decode("latin-1")
+            if any(k == b"content-encoding" for k, _ in response_headers) or not content_type.startswith(COMPRESSIBLE_TYPES):
+                await send(start)
+                await send(message)
+                return
+            # From here the encoding depends on the request's Accept-Encoding, even when it ends up identity.
+            response_headers = _vary_on_encoding(response_headers)
+            if encoding is None or message.get("more_body", False) or len(body) < self.minimum_size:
+                await send({**start, "headers": response_headers})
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            COMPRESSED_BYTES.inc(len(body), encoding=encoding, stage="before")
+            COMPRESSED_BYTES.inc(len(compressed), encoding=encoding, stage="after")
+            response_headers = [(k, v) for k, v in response_headers if k != b"content-length"] + [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,243 @@
+"""Load-aware automatic technician dispatch.
+
+Every technician has a weighted open load: the sum of PRIORITY_WEIGHTS over
+their NEW / IN_PROGRESS requests. ``LoadBoard`` keeps those loads in memory
+with one min-heap per team, so picking the least-loaded technician is a heap
+peek (stale entries are dropped lazily) instead of a COUNT per technician.
+
+A team's loads are read with a single GROUP BY the first time it is needed.
+After that they follow committed changes: a session hook collects the load
+deltas of every flushed MaintenanceRequest and applies them on commit. A
+dispatch decision reserves its weight immediately, so concurrent dispatches
+spread out instead of all picking the same technician; the reservation is
+swapped for the real delta on commit, or released on rollback.
+
+Core bulk statements bypass the hook: inserts go through ``assign_rows``,
+other statements call ``board.reset()``. Loads are per worker process; the
+periodic resync (DISPATCH_RESYNC_INTERVAL_SECONDS) bounds the drift from
+assignments made by other workers.
+"""
+import asyncio
+import heapq
+import os
+from collections import Counter
+
+from sqlalchemy import and_, case, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from . import metrics, models
+
+AUTO_DISPATCH = os.getenv("AUTO_DISPATCH", "false").lower() in ("1", "true", "yes")
+DISPATCH_RESYNC_INTERVAL_SECONDS = float(os.getenv("DISPATCH_RESYNC_INTERVAL_SECONDS", "60"))
+# How much more load the equipment's default technician may carry and still be preferred.
+DISPATCH_DEFAULT_TECH_SLACK = float(os.getenv("DISPATCH_DEFAULT_TECH_SLACK", "3"))
+
+PRIORITY_WEIGHTS = {
+    models.RequestPriority.LOW: 1,
+    models.RequestPriority.MEDIUM: 2,
+    models.RequestPriority.HIGH: 3,
+    models.RequestPriority.CRITICAL: 5,
+}
+OPEN_STAGES = (models.RequestStage.NEW, models.RequestStage.IN_PROGRESS)
+
+DISPATCH_DECISIONS = metrics.Counter(
+    "dispatch_decisions_total", "Automatic dispatch decisions by outcome.", ("outcome",)
+)
+
+
+def weight(priority) -> int:
+    return PRIORITY_WEIGHTS.get(priority, PRIORITY_WEIGHTS[models.RequestPriority.MEDIUM])
+
+
+class LoadBoard:
+    def __init__(self):
+        self.loads = {}  # technician_id -> weighted open load
+        self.team_of = {}  # technician_id -> team_id
+        self.heaps = {}  # team_id -> [(load, technician_id, version)]
+        self.versions = {}
+        self._lock = asyncio.Lock()
+
+    # --- state ---
+
+    def set_team(self, team_id, loads: dict):
+        for technician_id in [t for t, team in self.team_of.items() if team == team_id]:
+            self.team_of.pop(technician_id)
+        self.heaps[team_id] = []
+        for technician_id, load in loads.items():
+            self.team_of[technician_id] = team_id
+            self.loads[technician_id] = load
+            self._push(technician_id)
+
+    def reset(self):
+        self.loads.clear()
+        self.team_of.clear()
+        self.heaps.clear()
+        self.versions.clear()
+
+    def _push(self, technician_id):
+        version = self.versions.get(technician_id, 0) + 1
+        self.versions[technician_id] = version
+        heap = self.heaps[self.team_of[technician_id]]
+        heapq.heappush(heap, (self.loads[technician_id], technician_id, version))
+        if len(heap) > 4 * len(self.versions) + 64:
+            # Too many stale entries: rebuild (amortised O(1) per update).
+            heap[:] = [e for e in heap if self.versions.get(e[1]) == e[2]]
+            heapq.heapify(heap)
+
+    def add(self, technician_id, delta):
+        """Apply a load change; technicians of teams that are not loaded yet are ignored."""
+        if delta and technician_id in self.team_of:
+            self.loads[technician_id] += delta
+            self._push(technician_id)
+
+    def least_loaded(self, team_id):
+        heap = self.heaps.get(team_id)
+        while heap:
+            load, technician_id, version = heap[0]
+            if self.versions.get(technician_id) == version and self.team_of.get(technician_id) == team_id:
+                return technician_id
+            heapq.heappop(heap)
+        return None
+
+    def choose(self, team_id, priority=None, preferred=None):
+        """(technician_id, outcome) for a new request of ``priority`` in a loaded team."""
+        best = self.least_loaded(team_id)
+        if best is None:
+            return None, "no_technician"
+        if preferred is not None and preferred != best and self.team_of.get(preferred) == team_id:
+            # Critical work goes to whoever is free; otherwise keep the equipment's usual technician if close.
+            slack = 0 if priority == models.RequestPriority.CRITICAL else DISPATCH_DEFAULT_TECH_SLACK
+            if self.loads[preferred] - self.loads[best] <= slack:
+                return preferred, "default_technician"
+        if best == preferred:
+            return best, "default_technician"
+        return best, "least_loaded"
+
+    # --- database ---
+
+    async def ensure_team(self, db, team_id):
+        if team_id in self.heaps:
+            return
+        async with self._lock:
+            if team_id in self.heaps:
+                return
+            MR, User = models.MaintenanceRequest, models.User
+            load = func.coalesce(func.sum(case(
+                (MR.id.is_(None), 0),
+                else_=case(PRIORITY_WEIGHTS, value=MR.priority, else_=weight(None)),
+            )), 0)
+            rows = await db.execute(
+                select(User.id, load)
+                .outerjoin(MR, and_(MR.technician_id == User.id, MR.stage.in_(OPEN_STAGES)))
+                .where(User.team_id == team_id, User.role == models.UserRole.TECHNICIAN)
+                .group_by(User.id)
+            )
+            self.set_team(team_id, {technician_id: float(value) for technician_id, value in rows})
+
+
+board = LoadBoard()
+
+
+async def assign(db, request: models.MaintenanceRequest, preferred=None):
+    """Set ``request.technician_id`` to the best technician of its team (no-op without a team)."""
+    if request.team_id is None:
+        return None
+    await board.ensure_team(db, request.team_id)
+    technician_id, outcome = board.choose(request.team_id, request.priority, preferred)
+    DISPATCH_DECISIONS.inc(outcome=outcome)
+    if technician_id is not None:
+        request.technician_id = technician_id
+        amount = weight(request.priority)
+        board.add(technician_id, amount)
+        db.sync_session.info.setdefault("dispatch_reserved", Counter())[technician_id] += amount
+    return technician_id
+
+
+async def assign_rows(db, rows, preferred=None):
+    """assign() for request rows a Core insert is about to write (the session hooks never see them).
+
+    Rows without a technician get one when AUTO_DISPATCH is on; ``preferred``
+    maps equipment_id -> its default technician. No flush will settle a
+    reservation, so every row's weight goes on the board right away; hand the
+    rows the insert skipped to :func:`release_rows`.
+    """
+    preferred = preferred or {}
+    for row in rows:
+        if AUTO_DISPATCH and row["technician_id"] is None and row["team_id"] is not None:
+            await board.ensure_team(db, row["team_id"])
+            technician_id, outcome = board.choose(row["team_id"], row["priority"], preferred.get(row["equipment_id"]))
+            DISPATCH_DECISIONS.inc(outcome=outcome)
+            row["technician_id"] = technician_id
+        if row["technician_id"] is not None:
+            board.add(row["technician_id"], weight(row["priority"]))
+
+
+def release_rows(rows):
+    for row in rows:
+        if row["technician_id"] is not None:
+            board.add(row["technician_id"], -weight(row["priority"]))
+
+
+async def resync():
+    board.reset()
+
+
+# --- Keeping loads in step with committed changes ---
+
+def _before_after(obj, key):
+    history = inspect(obj).attrs[key].history
+    current = getattr(obj, key)
+    before = history.deleted[0] if history.deleted else (None if history.added else current)
+    return before, current
+
+
+def _contribution(technician_id, stage, priority):
+    if technician_id is None or stage not in OPEN_STAGES:
+        return None, 0
+    return technician_id, weight(priority)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_load_deltas(session, flush_context):
+    deltas = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User) and obj in session.dirty:
+            before, after = _before_after(obj, "team_id")
+            role_before, role_after = _before_after(obj, "role")
+            if before != after or role_before != role_after:
+                session.info["dispatch_reset"] = True
+            continue
+        if not isinstance(obj, models.MaintenanceRequest):
+            continue
+        if obj in session.new:
+            old = (None, 0)
+        else:
+            old = _contribution(*(_before_after(obj, k)[0] for k in ("technician_id", "stage", "priority")))
+        new = (None, 0) if obj in session.deleted else _contribution(obj.technician_id, obj.stage, obj.priority)
+        if old == new:
+            continue
+        deltas = deltas if deltas is not None else session.info.setdefault("dispatch_deltas", Counter())
+        if old[0] is not None:
+            deltas[old[0]] -= old[1]
+        if new[0] is not None:
+            deltas[new[0]] += new[1]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_load_deltas(session):
+    deltas = session.info.pop("dispatch_deltas", Counter())
+    reserved = session.info.pop("dispatch_reserved", Counter())
+    if session.info.pop("dispatch_reset", False):
+        board.reset()
+        return
+    deltas.subtract(reserved)
+    for technician_id, delta in deltas.items():
+        board.add(technician_id, delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _release_reservations(session):
+    session.info.pop("dispatch_deltas", None)
+    session.info.pop("dispatch_reset", None)
+    for technician_id, amount in session.info.pop("dispatch_reserved", Counter()).items():
+        board.add(technician_id, -amount)
@@ -0,0 +1,218 @@
+"""Change events pushed to dashboards over SSE / WebSocket (see routers/events.py).
+
+Routers call ``publish`` after committing a create/update/delete. Events go
+through a pluggable backend: the default ``LocalBackend`` delivers to this
+process only; a broker backend (Redis, NATS, ...) can be configured with
+``EVENTS_BACKEND=package.module:ClassName`` so every worker sees every event.
+A backend implements ``start(deliver)``, ``publish(event)`` and ``stop()``,
+and calls ``deliver(event)`` for each event it receives.
+
+Events carry the tenant (``company_name``) of the changed row and only
+reach subscribers of that tenant.
+
+Each subscriber has a bounded queue. A client that falls behind by more than
+``EVENTS_QUEUE_SIZE`` events has its backlog dropped and receives a single
+``resync`` event instead, telling it to re-fetch; the publisher never waits
+on a slow client.
+"""
+import asyncio
+import importlib
+import itertools
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+EVENTS_PUBLISHED = metrics.Counter("events_published_total", "Change events published.", ("entity", "action"))
+EVENTS_DROPPED = metrics.Counter("events_dropped_total", "Events dropped for subscribers that fell behind.")
+
+_CLOSED = object()
+
+
+class LocalBackend:
+    """In-process backend: events reach the subscribers of this worker only."""
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, event: dict):
+        if self._deliver is not None:
+            self._deliver(event)
+
+    async def stop(self):
+        self._deliver = None
+
+
+def _load_backend(spec: str):
+    if spec == "local":
+        return LocalBackend()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class Subscription:
+    def __init__(self, tenant=None, team_id=None, technician_id=None, maxsize=EVENTS_QUEUE_SIZE):
+        self.tenant = tenant
+        self.team_id = team_id
+        self.technician_id = technician_id
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+
+    def matches(self, event: dict) -> bool:
+        if event.get("tenant") != self.tenant:
+            return False
+        # Events without routing keys (e.g. bulk imports) go to everyone in the tenant.
+        if event.get("broadcast"):
+            return True
+        if self.team_id is not None and self.team_id not in event["team_ids"]:
+            return False
+        if self.technician_id is not None and self.technician_id not in event["technician_ids"]:
+            return False
+        return True
+
+    def offer(self, event):
+        if self.lagged:
+            EVENTS_DROPPED.inc()
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client: drop its backlog, it will re-fetch after the resync event.
+            dropped = self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            EVENTS_DROPPED.inc(dropped)
+            self.lagged = True
+            self.queue.put_nowait({"type": "resync", "dropped": dropped})
+
+    async def get(self):
+        event = await self.queue.get()
+        if event is _CLOSED:
+            return None
+        if self.lagged and event.get("type") == "resync":
+            self.lagged = False
+        return event
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+
+class EventHub:
+    def __init__(self, backend=None):
+        self.backend = backend or _load_backend(EVENTS_BACKEND)
+        self.subscribers = set()
+        self._ids = itertools.count(1)
+
+    async def start(self):
+        await self.backend.start(self.dispatch)
+
+    async def stop(self):
+        await self.backend.stop()
+        # Ends open streams so shutdown does not wait on idle clients.
+        for subscription in list(self.subscribers):
+            subscription.close()
+
+    def publish(self, event: dict):
+        EVENTS_PUBLISHED.inc(entity=event["entity"], action=event["action"])
+        try:
+            self.backend.publish(event)
+        except Exception:
+            # A broker hiccup must not fail the write that already committed.
+            logger.exception("Publishing event %s failed", event.get("type"))
+
+    def dispatch(self, event: dict):
+        event = {**event, "seq": next(self._ids)}
+        for subscription in list(self.subscribers):
+            if subscription.matches(event):
+                subscription.offer(event)
+
+    @asynccontextmanager
+    async def subscribe(self, tenant=None, team_id=None, technician_id=None):
+        subscription = Subscription(tenant, team_id, technician_id)
+        self.subscribers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self.subscribers.discard(subscription)
+
+
+hub = EventHub()
+
+
+@metrics.register_collector
+def _event_metrics():
+    yield "events_subscribers", "gauge", "Open event stream subscriptions.", {}, len(hub.subscribers)
+
+
+def _ids(*values):
+    return sorted({v for v in values if v is not None})
+
+
+def publish(entity: str, action: str, id=None, data=None, team_ids=(), technician_ids=(), broadcast=False, tenant=None):
+    """Publish a change; ``team_ids`` / ``technician_ids`` route it to filtered subscribers."""
+    hub.publish({
+        "type": f"{entity}.{action}",
+        "entity": entity,
+        "action": action,
+        "id": id,
+        "tenant": tenant,
+        "data": data,
+        "team_ids": _ids(*team_ids),
+        "technician_ids": _ids(*technician_ids),
+        "broadcast": broadcast,
+        "at": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+
+def request_changed(action: str, request, previous_technician_id=None, previous_team_id=None):
+    data = None
+    if action != "deleted":
+        data = {
+            key: _plain(getattr(request, key))
+            for key in ("stage", "priority", "title", "equipment_id", "work_center_id", "team_id", "technician_id")
+        }
+    # The previous assignee hears about a reassignment too.
+    publish(
+        "request", action, request.id, data,
+        team_ids=(request.team_id, previous_team_id),
+        technician_ids=(request.technician_id, previous_technician_id),
+        tenant=request.company_name,
+    )
+
+
+def equipment_changed(action: str, equipment):
+    data = None
+    if action != "deleted":
+        data = {key: _plain(getattr(equipment, key)) for key in ("name", "status", "default_team_id", "default_technician_id")}
+    publish(
+        "equipment", action, equipment.id, data,
+        team_ids=(equipment.default_team_id,),
+        technician_ids=(equipment.default_technician_id,),
+        tenant=equipment.company_name,
+    )
+
+
+def user_changed(action: str, user):
+    data = None
+    if action != "deleted":
+        data = {key: _plain(getattr(user, key)) for key in ("username", "role", "team_id")}
+    publish("user", action, user.id, data, team_ids=(user.team_id,), technician_ids=(user.id,), tenant=user.company_name)
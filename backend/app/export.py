@@ -0,0 +1,114 @@
+"""Streaming export of maintenance requests (CSV / NDJSON).
+
+Rows are read through a server-side cursor (``yield_per``) and written to
+the response as they arrive, so memory stays flat regardless of how many
+rows match. Each row is flat: the request columns plus the reporter,
+technician, team and equipment names, resolved by outer joins in the same
+query. Archived requests are unioned in when the requested range reaches
+them (see archive.py). Output may be gzip-compressed on the fly.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import aliased
+
+from . import models, tenancy
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+# Rows fetched per round trip from the server-side cursor.
+EXPORT_YIELD_PER = 1000
+
+def _columns(source, reporter, technician):
+    return (
+        source.id, source.title, source.description, source.request_type, source.priority, source.stage,
+        source.maintenance_for, source.equipment_id, models.Equipment.name.label("equipment_name"),
+        source.work_center_id, source.team_id, models.Team.name.label("team_name"),
+        source.technician_id, technician.username.label("technician_username"),
+        source.reporter_id, reporter.username.label("reporter_username"),
+        source.scheduled_date, source.created_at, source.started_at, source.completed_at, source.duration_minutes,
+    )
+
+
+FIELDNAMES = [column.key for column in _columns(models.MaintenanceRequest, models.User, models.User)]
+
+
+def _source_query(source, filters):
+    reporter, technician = aliased(models.User), aliased(models.User)
+    return (
+        select(*_columns(source, reporter, technician))
+        .outerjoin(models.Equipment, source.equipment_id == models.Equipment.id)
+        .outerjoin(models.Team, source.team_id == models.Team.id)
+        .outerjoin(technician, source.technician_id == technician.id)
+        .outerjoin(reporter, source.reporter_id == reporter.id)
+        .where(*filters(source))
+    )
+
+
+def export_query(filters, include_archive: bool = False):
+    """SELECT of the export columns in (created_at, id) order.
+
+    ``filters(source)`` returns the WHERE clauses for a request table (hot or
+    archived, same column names); with ``include_archive`` the archive is
+    unioned in (see archive.reaches).
+    """
+    hot = _source_query(models.MaintenanceRequest, filters)
+    if not include_archive:
+        # Same order as the list endpoint, served by the (created_at, id) indexes.
+        return hot.order_by(models.MaintenanceRequest.created_at, models.MaintenanceRequest.id)
+    merged = union_all(hot, _source_query(models.ArchivedMaintenanceRequest, filters)).subquery()
+    return select(merged).order_by(merged.c.created_at, merged.c.id)
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+
+def _encode_csv(rows, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELDNAMES)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps({k: _plain(v) for k, v in zip(FIELDNAMES, row)}, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+async def stream(session_factory, stmt, fmt: str, tenant, compress: bool = False):
+    """Yield encoded chunks (one per fetched partition) of ``stmt``'s rows in ``tenant``.
+
+    Owns its session: the response body is produced after the endpoint has
+    returned, so the request-scoped session cannot be relied on.
+    """
+    gzip = zlib.compressobj(wbits=31) if compress else None  # 31: gzip container
+    first = True
+    async with session_factory() as db:
+        tenancy.bind(db, tenant)
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+        async for rows in result.partitions():
+            chunk = _encode_csv(rows, first) if fmt == "csv" else _encode_ndjson(rows)
+            first = False
+            data = chunk.encode()
+            if gzip:
+                data = gzip.compress(data)
+            if data:
+                yield data
+    if fmt == "csv" and first:
+        # No rows at all: still emit the header.
+        data = _encode_csv([], True).encode()
+        yield gzip.compress(data) if gzip else data
+    if gzip:
+        yield gzip.flush()
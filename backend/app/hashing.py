@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from . import metrics, utils
+
+
+def _timed(fn, *args):
+    # Runs inside the worker (thread or process); reports pure bcrypt time back.
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Dedicated, bounded executor for bcrypt work.
+
+    Keeps password hashing off the shared Starlette threadpool and rejects work
+    with 503 + Retry-After once ``max_queue`` jobs are waiting or running.
+    """
+
+    def __init__(self, kind: str, workers: int, max_queue: int, retry_after: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = None
+        self._lock = threading.Lock()
+        # metrics
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+        self.max_latency_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self.pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            future = self._get_executor().submit(_timed, fn, *args)
+            result, run_seconds = await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+        latency = time.perf_counter() - submitted
+        with self._lock:
+            self.completed += 1
+            self.run_seconds_total += run_seconds
+            self.wait_seconds_total += max(latency - run_seconds, 0.0)
+            self.max_latency_seconds = max(self.max_latency_seconds, latency)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "run_seconds_total": self.run_seconds_total,
+            "max_latency_seconds": self.max_latency_seconds,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    kind=utils.PASSWORD_HASH_EXECUTOR,
+    workers=utils.PASSWORD_HASH_WORKERS,
+    max_queue=utils.PASSWORD_HASH_MAX_QUEUE,
+    retry_after=utils.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
+
+
+async def hash_password(password: str) -> str:
+    return await hasher.run(utils.get_password_hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    return await hasher.run(utils.verify_and_update_password, plain_password, hashed_password)
+
+
+@metrics.register_collector
+def _hasher_metrics():
+    stats = hasher.stats()
+    yield "password_hash_queue_depth", "gauge", "Password hashing jobs queued or running.", {}, stats["queue_depth"]
+    yield "password_hash_completed_total", "counter", "Password hashing jobs completed.", {}, stats["completed"]
+    yield "password_hash_rejected_total", "counter", "Password hashing jobs rejected with 503.", {}, stats["rejected"]
+    yield "password_hash_wait_seconds_total", "counter", "Time jobs spent queued for a worker.", {}, stats["wait_seconds_total"]
+    yield "password_hash_run_seconds_total", "counter", "Time spent in bcrypt.", {}, stats["run_seconds_total"]
@@ -0,0 +1,125 @@
+"""HTTP caching helpers: ETags, conditional GET and the reference-data cache.
+
+Reference endpoints (categories, teams, work centers, technicians) are
+served through :func:`cached_response`. Responses are cached in-process under
+the current version of every table they read; versions are bumped after a
+commit that touched the table (ORM writes are tracked automatically, Core
+bulk writes call :func:`bump`), so a local write is visible immediately.
+Entries also expire after ``REFERENCE_CACHE_TTL_SECONDS`` which bounds
+staleness for writes made by other worker processes. A request whose
+``If-None-Match`` matches a cached entry gets a 304 without touching the
+database.
+"""
+import hashlib
+import os
+import threading
+from collections import defaultdict
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import cache, serialization
+
+REFERENCE_CACHE_TTL_SECONDS = float(os.getenv("REFERENCE_CACHE_TTL_SECONDS", "30"))
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "1024"))
+REFERENCE_CACHE_CONTROL = "private, no-cache"
+
+_versions = defaultdict(int)
+_versions_lock = threading.Lock()
+response_cache = cache.TTLCache(maxsize=REFERENCE_CACHE_MAX_ENTRIES, ttl=REFERENCE_CACHE_TTL_SECONDS)
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    # Weak comparison: W/"x" and "x" match.
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+# --- Table versions ---
+
+def bump(*tables: str):
+    with _versions_lock:
+        for table in tables:
+            _versions[table] += 1
+
+
+def versions(*tables: str) -> tuple:
+    return tuple(_versions[table] for table in tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched_tables(session, flush_context):
+    touched = session.info.setdefault("touched_tables", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            touched.add(table)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_touched_tables(session):
+    touched = session.info.pop("touched_tables", None)
+    if touched:
+        bump(*touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched_tables(session):
+    session.info.pop("touched_tables", None)
+
+
+# --- Cached responses ---
+
+class _Entry:
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, body: bytes, etag: str, headers: dict):
+        self.body = body
+        self.etag = etag
+        self.headers = headers
+
+
+def _respond(request: Request, entry: _Entry) -> Response:
+    if matches(request, entry.etag):
+        return not_modified(entry.etag, REFERENCE_CACHE_CONTROL)
+    headers = {"ETag": entry.etag, "Cache-Control": REFERENCE_CACHE_CONTROL, **entry.headers}
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def cached_entry(tables: tuple, key: tuple, loader) -> _Entry:
+    """The cached, serialized ``await loader()`` -> (content, extra_headers).
+
+    ``tables`` are the tables the content depends on, ``key`` identifies the
+    query (endpoint + parameters).
+    """
+    cache_key = (key, versions(*tables))
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        content, headers = await loader()
+        body = serialization.dumps(content)
+        entry = _Entry(body, make_etag(hashlib.sha1(body).hexdigest()), headers or {})
+        response_cache.set(cache_key, entry)
+    return entry
+
+
+def tenant_key(request: Request):
+    """The caller's tenant (set by ``auth.bind_tenant``); part of every cache key."""
+    return getattr(request.state, "tenant", None)
+
+
+async def cached_response(request: Request, tables: tuple, key: tuple, loader) -> Response:
+    """Serve ``await loader()`` -> (content, extra_headers) from the reference cache."""
+    return _respond(request, await cached_entry(tables, (tenant_key(request), *key), loader))
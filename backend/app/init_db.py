@@ -1,5 +1,6 @@
 from .database import engine, Base
 from . import models
+from . import search  # registers the full-text search indexes
 
 def init_db():
     print("Creating database tables...")
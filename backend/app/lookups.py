@@ -0,0 +1,36 @@
+"""Batch lookups by id (``GET /requests/?ids=1,2,3``).
+
+DataLoader style: all the ids a view needs (kanban cards, detail pages, the
+users referenced by a page) are resolved with one ``IN`` query, and the rows
+come back in the order the ids were asked for. Unknown ids are skipped
+rather than failing the whole batch; the client can diff what it got.
+"""
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "500"))
+
+
+def parse_ids(ids: Optional[str]) -> Optional[list]:
+    """Distinct ids from "1,2,3" in request order, or None when the parameter is absent."""
+    if ids is None:
+        return None
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    parsed = list(dict.fromkeys(parsed))
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+
+async def load_many(db, stmt, model, ids: list) -> list:
+    """The ``model`` rows of ``stmt`` with the given ids, in the same order; missing ids are left out."""
+    if not ids:
+        return []
+    rows = (await db.scalars(stmt.where(model.id.in_(ids)))).unique().all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[id] for id in ids if id in by_id]
@@ -1,8 +1,41 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from . import pagination, hashing, metrics, stats, reliability, database, background, events, plans, dispatch, compression, archive, request_log, profiling
 from .routers import auth, equipment, requests, teams, categories, users, reports, work_centers
+from .routers import plans as plans_router, search as search_router, bootstrap as bootstrap_router
+from .routers import events as events_router
 
-app = FastAPI(title="GearGuard API", description="Maintenance Management System")
+STATS_RECONCILE_INTERVAL_SECONDS = float(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", "600"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await events.hub.start()
+    tasks = [
+        # Also seeds the dashboard counters on first start.
+        asyncio.create_task(background.run_periodically(
+            STATS_RECONCILE_INTERVAL_SECONDS, lambda: stats.reconcile(database.AsyncSessionLocal)
+        )),
+        asyncio.create_task(plans.scheduler.run(database.AsyncSessionLocal)),
+        # Picks up assignments made by other workers.
+        asyncio.create_task(background.run_periodically(
+            dispatch.DISPATCH_RESYNC_INTERVAL_SECONDS, dispatch.resync, run_first=False
+        )),
+    ]
+    if archive.ARCHIVE_INTERVAL_SECONDS > 0: # 0: archive from cron with `python -m app.archive` instead
+        tasks.append(asyncio.create_task(background.run_periodically(
+            archive.ARCHIVE_INTERVAL_SECONDS, lambda: archive.run(database.AsyncSessionLocal), run_first=False
+        )))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await events.hub.stop()
+    hashing.hasher.shutdown()
+
+app = FastAPI(title="GearGuard API", description="Maintenance Management System", lifespan=lifespan)
 
 # CORS
 origins = ["*"] # Allow all for dev
@@ -12,17 +45,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, "ETag", "Server-Timing"],
 )
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(metrics.PrometheusMiddleware)
+# Outermost, so total includes compression: Server-Timing, slow request/query log, cProfile sampling.
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Data routers run on a session scoped to the caller's company (see tenancy.py).
+tenant_scoped = [Depends(auth.bind_tenant)]
 
 app.include_router(auth.router)
-app.include_router(equipment.router)
-app.include_router(work_centers.router) # Added work_centers router
-app.include_router(requests.router)
-app.include_router(teams.router)
-app.include_router(categories.router)
-app.include_router(users.router)
-app.include_router(reports.router)
+app.include_router(equipment.router, dependencies=tenant_scoped)
+app.include_router(work_centers.router, dependencies=tenant_scoped) # Added work_centers router
+app.include_router(requests.router, dependencies=tenant_scoped)
+app.include_router(teams.router, dependencies=tenant_scoped)
+app.include_router(categories.router, dependencies=tenant_scoped)
+app.include_router(users.router, dependencies=tenant_scoped)
+app.include_router(reports.router, dependencies=tenant_scoped)
+app.include_router(events_router.router)
+app.include_router(plans_router.router, dependencies=tenant_scoped)
+app.include_router(search_router.router, dependencies=tenant_scoped)
+app.include_router(bootstrap_router.router, dependencies=tenant_scoped)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to GearGuard API"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
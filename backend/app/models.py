@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, Index, Float, Table
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.sql import func
 import enum
+from datetime import datetime, timezone
 from .database import Base
 
 class UserRole(str, enum.Enum):
@@ -31,6 +32,11 @@ class EquipmentStatus(str, enum.Enum):
     UNDER_MAINTENANCE = "UNDER_MAINTENANCE"
     SCRAP = "SCRAP"
 
+def tenant_unique(name, company_name, key):
+    """Unique index on ``key`` within one company. NULL company_name is a tenant of its
+    own (see tenancy.py), so it is compared as "" - a plain UNIQUE treats NULLs as distinct."""
+    return Index(name, func.coalesce(company_name, ""), key, unique=True)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -52,18 +58,28 @@ class User(Base):
     assigned_requests = relationship("MaintenanceRequest", foreign_keys="[MaintenanceRequest.technician_id]", back_populates="technician")
     reported_requests = relationship("MaintenanceRequest", foreign_keys="[MaintenanceRequest.reporter_id]", back_populates="reporter")
 
+    __table_args__ = (
+        Index("ix_users_company_name_id", "company_name", "id"),
+    )
+
 class Team(Base):
     __tablename__ = "teams"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True)
+    name = Column(String, index=True)
     description = Column(String, nullable=True)
+    company_name = Column(String, nullable=True) # Tenant (see tenancy.py)
 
     members = relationship("User", back_populates="teams") # Users in this team
     equipment = relationship("Equipment", back_populates="default_team")
 
+    __table_args__ = (
+        tenant_unique("uq_teams_company_name_name", company_name, name),
+    )
+
 class Category(Base):
     __tablename__ = "categories"
+    # Shared by every company (not tenant-owned), so names stay globally unique.
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
@@ -76,7 +92,7 @@ class Equipment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    serial_number = Column(String, unique=True, index=True)
+    serial_number = Column(String, index=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     category_rel = relationship("Category", back_populates="equipment")
     
@@ -92,14 +108,22 @@ class Equipment(Base):
     default_technician_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     default_technician = relationship("User", foreign_keys=[default_technician_id])
 
+    company_name = Column(String, nullable=True) # Tenant (see tenancy.py)
+
     requests = relationship("MaintenanceRequest", back_populates="equipment")
 
+    __table_args__ = (
+        # Tenant-scoped lists page by id inside one tenant.
+        Index("ix_equipment_company_name_id", "company_name", "id"),
+        tenant_unique("uq_equipment_company_name_serial_number", company_name, serial_number),
+    )
+
 class WorkCenter(Base):
     __tablename__ = "work_centers"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    code = Column(String, unique=True, index=True)
+    code = Column(String, index=True)
     department = Column(String)
     status = Column(Enum(EquipmentStatus), default=EquipmentStatus.ACTIVE)
     location = Column(String, nullable=True)
@@ -108,9 +132,15 @@ class WorkCenter(Base):
     capacity = Column(Integer, default=0) # e.g. units per hour
     cost_per_hour = Column(Integer, default=0)
     oee_target = Column(Integer, default=85) # Percentage
+    company_name = Column(String, nullable=True) # Tenant (see tenancy.py)
 
     requests = relationship("MaintenanceRequest", back_populates="work_center")
 
+    __table_args__ = (
+        Index("ix_work_centers_company_name_id", "company_name", "id"),
+        tenant_unique("uq_work_centers_company_name_code", company_name, code),
+    )
+
 class MaintenanceRequest(Base):
     __tablename__ = "maintenance_requests"
 
@@ -140,8 +170,169 @@ class MaintenanceRequest(Base):
     reporter = relationship("User", foreign_keys=[reporter_id], back_populates="reported_requests")
 
     scheduled_date = Column(DateTime, nullable=True)
+    # Set on requests materialized from a MaintenancePlan; occurrence_key makes generation idempotent.
+    plan_id = Column(Integer, ForeignKey("maintenance_plans.id"), nullable=True)
+    occurrence_key = Column(String, nullable=True, unique=True)
     started_at = Column(DateTime, nullable=True)
-    completed_at = Column(DateTime, nullable=True)
+    # active_history: the reliability hook needs the previous value even on expired instances.
+    completed_at = column_property(Column(DateTime, nullable=True), active_history=True)
     duration_minutes = Column(Integer, nullable=True)
+    # When the request entered its current stage (NULL: never moved, i.e. created_at); see request_log.py.
+    stage_changed_at = Column(DateTime, nullable=True)
+    company_name = Column(String, nullable=True) # Tenant (see tenancy.py)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Python-side default keeps the stored precision identical to the bound cursor values
+    # (SQLite's CURRENT_TIMESTAMP drops microseconds), so keyset comparisons on ties work everywhere.
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    # Bumped by every ORM update; Core bulk updates must set it themselves. Feeds the calendar ETag.
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), alone and behind the list filters.
+
+        Index("ix_maintenance_requests_created_at_id", "created_at", "id"),
+        Index("ix_maintenance_requests_equipment_created_at_id", "equipment_id", "created_at", "id"),
+        Index("ix_maintenance_requests_technician_created_at_id", "technician_id", "created_at", "id"),
+        # Calendar: one range scan per date column (created_at is covered above).
+        Index("ix_maintenance_requests_scheduled_date_id", "scheduled_date", "id"),
+        # Plan edits drop a plan's future occurrences.
+        Index("ix_maintenance_requests_plan_scheduled_date", "plan_id", "scheduled_date"),
+        # Tenant-scoped list and calendar scans stay inside the caller's tenant.
+        Index("ix_maintenance_requests_company_name_created_at_id", "company_name", "created_at", "id"),
+        Index("ix_maintenance_requests_company_name_scheduled_date_id", "company_name", "scheduled_date", "id"),
+        # Ids must never be reused once the newest request has been archived (SQLite otherwise hands out max(id) + 1).
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedMaintenanceRequest(Base):
+    """Closed requests moved out of maintenance_requests by archive.py.
+
+    Same columns (no foreign keys or unique constraints: the referenced rows may
+    be deleted long after a request was archived), plus when it was moved.
+    """
+    __table__ = Table(
+        "maintenance_requests_archive",
+        Base.metadata,
+        *(
+            Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False, nullable=c.nullable)
+            for c in MaintenanceRequest.__table__.columns
+        ),
+        Column("archived_at", DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)),
+        # History / export: keyset scans on (created_at, id), alone, per tenant and behind the filters.
+        Index("ix_maintenance_requests_archive_created_at_id", "created_at", "id"),
+        Index("ix_maintenance_requests_archive_company_name_created_at_id", "company_name", "created_at", "id"),
+        Index("ix_maintenance_requests_archive_equipment_created_at_id", "equipment_id", "created_at", "id"),
+        Index("ix_maintenance_requests_archive_technician_created_at_id", "technician_id", "created_at", "id"),
+        # Newest archived completion: decides whether a completed_at range needs the archive.
+        Index("ix_maintenance_requests_archive_completed_at", "completed_at"),
+    )
+
+class MaintenancePlan(Base):
+    """Recurring preventive maintenance; occurrences become PREVENTIVE requests (see plans.py)."""
+    __tablename__ = "maintenance_plans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    description = Column(Text, nullable=True)
+    priority = Column(Enum(RequestPriority), default=RequestPriority.MEDIUM)
+
+    # Exactly one target; a category plan covers all of its (non-scrapped) equipment.
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    work_center_id = Column(Integer, ForeignKey("work_centers.id"), nullable=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)  # defaults to the equipment's team
+    technician_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_by_id = Column(Integer, ForeignKey("users.id"))  # reporter of generated requests
+    company_name = Column(String, nullable=True)  # tenant; stamped on the generated requests
+
+    # Recurrence: every interval_days from starts_at, or a cron expression (one time per day at most).
+    interval_days = Column(Integer, nullable=True)
+    cron = Column(String, nullable=True)
+    starts_at = Column(DateTime)
+    ends_at = Column(DateTime, nullable=True)
+    active = Column(Boolean, default=True)
+
+    # Occurrences up to this instant have been materialized.
+    generated_until = Column(DateTime, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        index=True,
+    )
+
+class StatCounter(Base):
+    """Incrementally maintained dashboard counters, e.g. "request_stage:NEW" (see stats.py)."""
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class ReliabilityRollup(Base):
+    """Repair/failure aggregates per dimension member and time bucket (see reliability.py)."""
+    __tablename__ = "reliability_rollups"
+
+    company_name = Column(String, primary_key=True)  # tenant; "" for the unnamed tenant (NULL cannot be upserted on)
+    dimension = Column(String, primary_key=True)  # all / equipment / category / team / technician
+    dimension_id = Column(Integer, primary_key=True)  # 0 for "all"
+    granularity = Column(String, primary_key=True)  # day / week / month
+    period_start = Column(DateTime, primary_key=True)
+
+    repair_count = Column(Integer, nullable=False, default=0)
+    repair_minutes_sum = Column(Float, nullable=False, default=0)
+    failure_count = Column(Integer, nullable=False, default=0)
+    first_failure_at = Column(DateTime, nullable=True)
+    last_failure_at = Column(DateTime, nullable=True)
+
+class RepairTimeHistogram(Base):
+    """Repair-time histogram buckets per rollup row, used for percentiles."""
+    __tablename__ = "repair_time_histogram"
+
+    company_name = Column(String, primary_key=True)  # as in ReliabilityRollup
+    dimension = Column(String, primary_key=True)
+    dimension_id = Column(Integer, primary_key=True)
+    granularity = Column(String, primary_key=True)
+    period_start = Column(DateTime, primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # index into reliability.REPAIR_MINUTE_BUCKETS
+    count = Column(Integer, nullable=False, default=0)
+    # Observed range inside the bucket; percentiles never leave it.
+    min_minutes = Column(Float, nullable=False)
+    max_minutes = Column(Float, nullable=False)
+
+class RequestEvent(Base):
+    """Append-only log of request changes (see request_log.py); rows are never updated."""
+    __tablename__ = "request_events"
+
+    id = Column(Integer, primary_key=True)
+    # No foreign keys: the log outlives archived requests and deleted users.
+    request_id = Column(Integer, nullable=False)
+    company_name = Column(String, nullable=True)  # tenant of the request
+    kind = Column(String, nullable=False)  # "created", "stage", "technician" or "priority"
+    old_value = Column(String, nullable=True)
+    new_value = Column(String, nullable=True)
+    actor_id = Column(Integer, nullable=True)  # user who made the change (NULL: system / anonymous)
+    occurred_at = Column(DateTime, nullable=False)
+    # Stage events: seconds spent in the stage that was left.
+    stage_seconds = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_request_events_request_id_id", "request_id", "id"),
+        Index("ix_request_events_company_name_occurred_at", "company_name", "occurred_at"),
+    )
+
+class StageTimeRollup(Base):
+    """Time spent per stage, summed per day from stage events (see request_log.py)."""
+    __tablename__ = "stage_time_rollups"
+
+    company_name = Column(String, primary_key=True)  # "" for the unnamed tenant (NULL cannot be upserted on)
+    team_id = Column(Integer, primary_key=True)  # 0: no team
+    stage = Column(String, primary_key=True)  # the stage that was left
+    day = Column(DateTime, primary_key=True)
+    transitions = Column(Integer, nullable=False, default=0)
+    seconds_sum = Column(Float, nullable=False, default=0)
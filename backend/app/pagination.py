@@ -0,0 +1,118 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_, select, union_all
+
+# Header carrying the cursor of the next page. The list bodies stay plain
+# JSON arrays so existing clients keep working.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values) -> str:
+    payload = []
+    for value in values:
+        if isinstance(value, datetime):
+            payload.append({"dt": value.isoformat()})
+        else:
+            payload.append(value)
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = []
+        for value in payload:
+            if isinstance(value, dict):
+                value = datetime.fromisoformat(value["dt"])
+            values.append(value)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _after(columns, values):
+    # (c0, c1, ...) > (v0, v1, ...) spelled out so it works on every backend
+    # and still lets the planner use the composite index as a range scan.
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column > values[i]))
+    return or_(*clauses)
+
+
+async def paginate(
+    db,
+    stmt,
+    columns,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+):
+    """Keyset pagination of the select ``stmt`` over ``columns`` (the last one must be unique).
+
+    When ``cursor`` is given it takes precedence over ``skip``; the cursor of
+    the following page is returned in the ``X-Next-Cursor`` header.
+    """
+    if limit < 1:
+        return []  # routes bound limit to >= 1; an empty page has no last row to continue from
+    if cursor:
+        stmt = stmt.where(_after(columns, decode_cursor(cursor, len(columns))))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    rows = (await db.scalars(stmt.order_by(*columns).limit(limit + 1))).unique().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [getattr(last, column.key) for column in columns]
+        )
+    return rows
+
+
+async def paginate_union(
+    db,
+    branches,
+    keys,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+):
+    """Keyset pagination over the UNION ALL of ``branches`` (selects with the same columns).
+
+    ``keys`` names the ordering columns (the last one unique across branches).
+    Each branch is cut to the page on its own index before the merge, so the
+    union never sees more than ``len(branches) * (limit + 1)`` rows. Returns
+    row mappings.
+    """
+    if limit < 1:
+        return []
+    values = decode_cursor(cursor, len(keys)) if cursor else None
+    parts = []
+    for branch in branches:
+        columns = [branch.selected_columns[key] for key in keys]
+        if values is not None:
+            branch = branch.where(_after(columns, values))
+        parts.append(select(branch.order_by(*columns).limit(limit + 1).subquery()))
+    merged = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    order = [merged.c[key] for key in keys]
+    rows = (await db.execute(select(merged).order_by(*order).limit(limit + 1))).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([rows[-1][key] for key in keys])
+    return rows
+
+
+def cursor_headers(response: Response) -> dict:
+    """The pagination headers set on ``response``, for replaying a cached page."""
+    cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return {NEXT_CURSOR_HEADER: cursor} if cursor else {}
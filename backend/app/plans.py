@@ -0,0 +1,365 @@
+"""Recurring preventive maintenance: plans -> PREVENTIVE requests.
+
+Each active plan sits in an in-memory min-heap keyed by its next
+not-yet-materialized occurrence. The scheduler pops every plan whose next
+occurrence falls inside the horizon (``PLAN_HORIZON_DAYS`` ahead), inserts
+the occurrences for all of its targets in batches, advances the plan's
+``generated_until`` watermark and pushes it back with its next due time.
+Plans that are not due cost nothing per tick. Generated requests are
+dispatched like POST /requests/: with AUTO_DISPATCH on, occurrences of a
+plan without a technician go to the least-loaded technician of their team
+(preferring the equipment's default one), and the load board counts them.
+
+Every generated request carries an ``occurrence_key`` (plan, target,
+scheduled time) with a unique constraint, so generation is idempotent:
+re-running a batch, or two workers generating the same plan, never
+duplicates requests.
+
+Plan edits are picked up incrementally: each tick only reloads plans whose
+``updated_at`` moved since the previous tick and replaces their heap entry
+(stale entries are skipped lazily via a per-plan version).
+"""
+import asyncio
+import heapq
+import logging
+import os
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import dispatch, events, http_cache, models, stats, tenancy
+
+logger = logging.getLogger(__name__)
+
+PLAN_HORIZON_DAYS = int(os.getenv("PLAN_HORIZON_DAYS", "90"))
+PLAN_SCHEDULER_INTERVAL_SECONDS = float(os.getenv("PLAN_SCHEDULER_INTERVAL_SECONDS", "300"))
+PLAN_INSERT_BATCH_SIZE = int(os.getenv("PLAN_INSERT_BATCH_SIZE", "5000"))
+
+# How far ahead next_occurrence looks for a sparse cron expression (e.g. "0 6 29 2 *").
+_CRON_LOOKAHEAD = timedelta(days=366 * 8)
+
+
+# --- Recurrence ---
+
+def _parse_field(text: str, low: int, high: int) -> set:
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step != 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"'{text}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron ("minute hour day-of-month month day-of-week"), at most one time per day."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("cron must have 5 fields: minute hour day-of-month month day-of-week")
+        minute, hour, dom, month, dow = fields
+        minutes = _parse_field(minute, 0, 59)
+        hours = _parse_field(hour, 0, 23)
+        if len(minutes) != 1 or len(hours) != 1:
+            raise ValueError("cron plans fire at most once per day: use a single minute and hour")
+        self.at = time(hours.pop(), minutes.pop())
+        self.days = _parse_field(dom, 1, 31)
+        self.months = _parse_field(month, 1, 12)
+        self.weekdays = {d % 7 for d in _parse_field(dow, 0, 7)}  # 0 and 7 are both Sunday
+        self.any_day = dom == "*"
+        self.any_weekday = dow == "*"
+
+    def matches(self, day) -> bool:
+        if day.month not in self.months:
+            return False
+        dom_ok = day.day in self.days
+        dow_ok = day.isoweekday() % 7 in self.weekdays
+        # Standard cron: when both day fields are restricted, either may match.
+        if self.any_day or self.any_weekday:
+            return dom_ok and dow_ok
+        return dom_ok or dow_ok
+
+    def occurrences(self, after: datetime, until: datetime):
+        day = after.date()
+        while True:
+            moment = datetime.combine(day, self.at)
+            if moment > until:
+                return
+            if moment > after and self.matches(day):
+                yield moment
+            day += timedelta(days=1)
+
+
+def validate(interval_days, cron):
+    """Raise ValueError unless exactly one valid recurrence is given."""
+    if (interval_days is None) == (cron is None):
+        raise ValueError("Provide exactly one of interval_days or cron")
+    if interval_days is not None and interval_days < 1:
+        raise ValueError("interval_days must be at least 1")
+    if cron is not None:
+        CronSchedule(cron)
+
+
+def occurrences(plan, after: datetime, until: datetime):
+    """Scheduled times of ``plan`` in (after, until]."""
+    start = plan.starts_at
+    if plan.ends_at is not None:
+        until = min(until, plan.ends_at)
+    after = max(after, start - timedelta(microseconds=1))
+    if after >= until:
+        return
+    if plan.cron:
+        yield from CronSchedule(plan.cron).occurrences(after, until)
+        return
+    step = timedelta(days=plan.interval_days)
+    moment = start + ((after - start) // step + 1) * step if after >= start else start
+    while moment <= until:
+        yield moment
+        moment += step
+
+
+def next_occurrence(plan, after: datetime):
+    return next(occurrences(plan, after, after + _CRON_LOOKAHEAD), None)
+
+
+def _watermark(plan) -> datetime:
+    return plan.generated_until or plan.starts_at - timedelta(microseconds=1)
+
+
+# --- Materialization ---
+
+async def _targets(db, plan):
+    """(equipment_id, work_center_id, team_id, default_technician_id) for every asset the plan covers."""
+    if plan.work_center_id:
+        return [(None, plan.work_center_id, plan.team_id, None)]
+    Equipment = models.Equipment
+    # Categories are shared between tenants; the plan only covers its own tenant's equipment.
+    query = select(Equipment.id, Equipment.default_team_id, Equipment.default_technician_id).where(
+        Equipment.status != models.EquipmentStatus.SCRAP,
+        tenancy.criterion(Equipment.company_name, plan.company_name),
+    )
+    if plan.equipment_id:
+        query = query.where(Equipment.id == plan.equipment_id)
+    else:
+        query = query.where(Equipment.category_id == plan.category_id)
+    return [
+        (id, None, plan.team_id or team_id, technician_id)
+        for id, team_id, technician_id in await db.execute(query.order_by(Equipment.id))
+    ]
+
+
+def occurrence_key(plan_id: int, equipment_id, work_center_id, scheduled: datetime) -> str:
+    target = f"e{equipment_id}" if equipment_id else f"w{work_center_id}"
+    return f"{plan_id}:{target}:{scheduled.isoformat()}"
+
+
+def _rows(plan, targets, times, now):
+    for scheduled in times:
+        for equipment_id, work_center_id, team_id, _ in targets:
+            yield {
+                "title": plan.name,
+                "description": plan.description or f"Preventive maintenance: {plan.name}",
+                "request_type": models.RequestType.PREVENTIVE,
+                "priority": plan.priority or models.RequestPriority.MEDIUM,
+                "stage": models.RequestStage.NEW,
+                "maintenance_for": "equipment" if equipment_id else "work_center",
+                "equipment_id": equipment_id,
+                "work_center_id": work_center_id,
+                "team_id": team_id,
+                "technician_id": plan.technician_id,
+                "reporter_id": plan.created_by_id,
+                "scheduled_date": scheduled,
+                "plan_id": plan.id,
+                "occurrence_key": occurrence_key(plan.id, equipment_id, work_center_id, scheduled),
+                "company_name": plan.company_name,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+
+async def _insert_batch(db, rows, tenant, preferred) -> int:
+    table = models.MaintenanceRequest.__table__
+    existing = set(await db.scalars(
+        select(table.c.occurrence_key).where(table.c.occurrence_key.in_([r["occurrence_key"] for r in rows]))
+    ))
+    rows = [r for r in rows if r["occurrence_key"] not in existing]
+    if not rows:
+        return 0
+    # Same dispatch as POST /requests/; the loads go on the board now, skipped rows are taken back below.
+    await dispatch.assign_rows(db, rows, preferred)
+    dialect = (await db.connection()).dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        # A concurrent generator may have taken some keys since the check above.
+        stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+        stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.occurrence_key])
+        # Count what was actually inserted: rows skipped on conflict must not reach the counters.
+        keys = set((await db.scalars(stmt.returning(table.c.occurrence_key), rows)).all())
+        dispatch.release_rows([r for r in rows if r["occurrence_key"] not in keys])
+        inserted = len(keys)
+    else:
+        await db.execute(insert(table), rows)
+        inserted = len(rows)
+    connection = await db.connection()
+    deltas = Counter({stats.counter_name("request_stage", models.RequestStage.NEW, tenant): inserted})
+    await connection.run_sync(lambda sync_conn: stats.apply_deltas(sync_conn, deltas))
+    return inserted
+
+
+async def materialize(db, plan, until: datetime) -> int:
+    """Insert ``plan``'s occurrences up to ``until``; returns how many requests were created."""
+    after = _watermark(plan)
+    times = list(occurrences(plan, after, until)) if plan.active else []
+    created = 0
+    if times:
+        targets = await _targets(db, plan)
+        preferred = {equipment_id: technician_id for equipment_id, _, _, technician_id in targets if equipment_id}
+        now = datetime.now(timezone.utc)
+        batch = []
+        try:
+            for row in _rows(plan, targets, times, now):
+                batch.append(row)
+                if len(batch) >= PLAN_INSERT_BATCH_SIZE:
+                    created += await _insert_batch(db, batch, plan.company_name, preferred)
+                    await db.commit()
+                    batch = []
+            if batch:
+                created += await _insert_batch(db, batch, plan.company_name, preferred)
+        except BaseException:
+            dispatch.board.reset()  # loads of a batch that did not commit are on the board
+            raise
+
+    table = models.MaintenancePlan.__table__
+    # Keep updated_at: it signals *edits* to the scheduler.
+    await db.execute(
+        update(table).where(table.c.id == plan.id)
+        .values(generated_until=until, updated_at=table.c.updated_at)
+    )
+    await db.commit()
+    plan.generated_until = until
+    if created:
+        http_cache.bump(models.MaintenanceRequest.__tablename__)
+        events.publish(
+            "request", "generated", data={"plan_id": plan.id, "created": created}, broadcast=True, tenant=plan.company_name,
+        )
+    return created
+
+
+async def discard_future(db, plan, now: datetime) -> int:
+    """Delete the plan's not-yet-started occurrences after ``now`` (before regenerating them)."""
+    table = models.MaintenanceRequest.__table__
+    result = await db.execute(
+        delete(table).where(
+            table.c.plan_id == plan.id,
+            table.c.stage == models.RequestStage.NEW,
+            table.c.scheduled_date > now,
+        )
+    )
+    if result.rowcount:
+        deltas = Counter({stats.counter_name("request_stage", models.RequestStage.NEW, plan.company_name): -result.rowcount})
+        connection = await db.connection()
+        await connection.run_sync(lambda sync_conn: stats.apply_deltas(sync_conn, deltas))
+        dispatch.board.reset()
+    return result.rowcount
+
+
+# --- Scheduler ---
+
+ALL_TENANTS = object()  # run_due / tick: every company (None is the unnamed tenant)
+
+class PlanScheduler:
+    def __init__(self):
+        self.heap = []  # (due, plan_id, version)
+        self.versions = {}
+        self.tenants = {}  # plan_id -> company_name
+        self.loaded_until = None  # max updated_at seen; the next load only reads newer edits
+        self._wake = asyncio.Event()
+
+    def schedule(self, plan):
+        version = self.versions.get(plan.id, 0) + 1
+        self.versions[plan.id] = version
+        self.tenants[plan.id] = plan.company_name
+        due = next_occurrence(plan, _watermark(plan)) if plan.active else None
+        if due is not None:
+            heapq.heappush(self.heap, (due, plan.id, version))
+
+    def wake(self):
+        self._wake.set()
+
+    async def load(self, db):
+        query = select(models.MaintenancePlan)
+        if self.loaded_until is not None:
+            query = query.where(models.MaintenancePlan.updated_at >= self.loaded_until)
+        for plan in await db.scalars(query):
+            self.schedule(plan)
+            if self.loaded_until is None or plan.updated_at > self.loaded_until:
+                self.loaded_until = plan.updated_at
+
+    def _pop_due(self, horizon: datetime, tenant=ALL_TENANTS) -> list:
+        due, others = [], []
+        while self.heap and self.heap[0][0] <= horizon:
+            entry = heapq.heappop(self.heap)
+            _, plan_id, version = entry
+            if self.versions.get(plan_id) != version:
+                continue
+            if tenant is not ALL_TENANTS and self.tenants.get(plan_id) != tenant:
+                others.append(entry)  # another company's plan: stays scheduled
+                continue
+            due.append(plan_id)
+        for entry in others:
+            heapq.heappush(self.heap, entry)
+        return due
+
+    async def run_due(self, db, now: datetime = None, horizon_days: int = PLAN_HORIZON_DAYS, tenant=ALL_TENANTS) -> int:
+        """Materialize the due plans (of ``tenant`` only, if given); ``db`` must not be tenant-scoped."""
+        now = now or datetime.utcnow()
+        horizon = now + timedelta(days=horizon_days)
+        due = self._pop_due(horizon, tenant)
+        if not due:
+            return 0
+        created = 0
+        plans = (await db.scalars(select(models.MaintenancePlan).where(models.MaintenancePlan.id.in_(due)))).all()
+        for plan in plans:
+            created += await materialize(db, plan, max(horizon, _watermark(plan)))
+            self.schedule(plan)
+        return created
+
+    async def tick(self, session_factory, horizon_days: int = PLAN_HORIZON_DAYS, tenant=ALL_TENANTS) -> int:
+        # An unscoped session of its own: the heap and the load watermark are shared by every tenant.
+        async with session_factory() as db:
+            await self.load(db)
+            return await self.run_due(db, horizon_days=horizon_days, tenant=tenant)
+
+    async def run(self, session_factory, interval: float = PLAN_SCHEDULER_INTERVAL_SECONDS):
+        """Tick every ``interval`` seconds, or right away after ``wake()``; failures are logged."""
+        while True:
+            self._wake.clear()
+            try:
+                created = await self.tick(session_factory)
+                if created:
+                    logger.info("Generated %d preventive requests", created)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Maintenance plan scheduler tick failed")
+                # Popped entries may be lost; rebuild the heap from the table next time.
+                self.loaded_until = None
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+scheduler = PlanScheduler()
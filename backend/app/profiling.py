@@ -0,0 +1,251 @@
+"""Per-request profiling: Server-Timing header, slow request / query log, sampled cProfile.
+
+ProfilingMiddleware keeps a Timings record per request in a context
+variable. The engine hooks in database.py add every SQL statement to it
+(count and duration), and ProfiledRoute notes when the endpoint function
+starts and returns. Each response then carries
+
+    Server-Timing: deps;dur=4.1, endpoint;dur=20.3, serialize;dur=3.2, db;dur=12.3;desc="4 queries", total;dur=28.0
+
+* ``deps``: dependencies before the endpoint runs (auth, tenant binding, body parsing);
+* ``endpoint``: the endpoint function;
+* ``serialize``: from the endpoint's return to the response start (response
+  model validation and JSON rendering);
+* ``db``: SQL time and statement count so far, overlapping the phases above;
+* ``total``: until the response headers are sent. The body of a streamed
+  response (exports) comes later and is only part of the slow request log.
+
+Requests slower than SLOW_REQUEST_MS and statements slower than
+SLOW_QUERY_MS are logged with their route. Event streams
+(``text/event-stream``) stay open by design and are left out of the slow
+request log. Statements are logged with
+parameter types only, never values (``redact``).
+
+PROFILE_ROUTE (a route template such as ``/requests/calendar``) turns on
+cProfile capture for that one route: a PROFILE_SAMPLE_RATE fraction of its
+requests, plus any request sent with ``X-Profile: 1``. Each capture is
+written to PROFILE_DIR (open with ``python -m pstats`` or snakeviz) and
+its top functions by own time are logged. One capture runs at a time; the
+profiler sees the whole event loop thread, so other requests served
+meanwhile show up too.
+"""
+import asyncio
+import cProfile
+import contextvars
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import time
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from starlette.routing import compile_path
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))  # 0 disables
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # 0 disables
+PROFILE_ROUTE = os.getenv("PROFILE_ROUTE", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "gearguard-profiles"))
+PROFILE_HEADER = b"x-profile"
+EVENT_STREAM = b"text/event-stream"
+
+SLOW_REQUESTS = metrics.Counter("slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("method", "route"))
+SLOW_QUERIES = metrics.Counter("slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.", ("route",))
+
+_current = contextvars.ContextVar("request_timings", default=None)
+_profile_path = compile_path(PROFILE_ROUTE)[0] if PROFILE_ROUTE else None
+_profiling = False
+
+
+class Timings:
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.endpoint_started = None
+        self.endpoint_finished = None
+        self.responded = None
+        self.streaming = False  # SSE response: long-lived, never "slow"
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest = (0.0, None)  # (seconds, statement)
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    def add_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.sql_seconds += seconds
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, statement)
+
+    def server_timing(self) -> str:
+        def ms(seconds):
+            return f"{seconds * 1000:.1f}"
+
+        parts = []
+        if self.endpoint_started is not None:
+            parts.append(f"deps;dur={ms(self.endpoint_started - self.started)}")
+            if self.endpoint_finished is not None:
+                parts.append(f"endpoint;dur={ms(self.endpoint_finished - self.endpoint_started)}")
+                parts.append(f"serialize;dur={ms(self.responded - self.endpoint_finished)}")
+        parts.append(f'db;dur={ms(self.sql_seconds)};desc="{self.queries} queries"')
+        parts.append(f"total;dur={ms(self.responded - self.started)}")
+        return ", ".join(parts)
+
+
+def current() -> Optional[Timings]:
+    """The Timings of the request being served, or None outside requests (scripts, background jobs)."""
+    return _current.get()
+
+
+def redact(parameters):
+    """``parameters`` with every value replaced by its type name, e.g. ``{'title': '<str>'}``."""
+    if isinstance(parameters, dict):
+        return {key: f"<{type(value).__name__}>" for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: describe the first row only
+            return [redact(parameters[0]), f"... {len(parameters)} rows"]
+        return tuple(f"<{type(value).__name__}>" for value in parameters)
+    return "<redacted>"
+
+
+def record_query(statement: str, parameters, seconds: float):
+    """Called by the engine hooks (database.py) after every statement."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add_query(statement, seconds)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        route = timings.route if timings is not None else "-"
+        SLOW_QUERIES.inc(route=route)
+        logger.warning(
+            "Slow query %.1f ms on %s: %s params=%s",
+            seconds * 1000, route, " ".join(statement.split()), redact(parameters),
+        )
+
+
+def _timed(endpoint):
+    # Generator endpoints are left alone: FastAPI tells them apart by their unwrapped type.
+    if inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is not None:
+                timings.endpoint_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            # Runs in the threadpool, which copies the request's context.
+            timings = _current.get()
+            if timings is not None:
+                timings.endpoint_started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that marks when its endpoint starts and returns (``deps`` / ``endpoint`` / ``serialize``)."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+def _wants_profile(scope) -> bool:
+    if _profile_path is None or _profiling or not _profile_path.match(scope["path"]):
+        return False
+    if any(name == PROFILE_HEADER and value == b"1" for name, value in scope["headers"]):
+        return True
+    return random.random() < PROFILE_SAMPLE_RATE
+
+
+def _save_profile(profiler, timings: Timings, elapsed_ms: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9]+", "_", timings.route).strip("_") or "root"
+    path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{elapsed_ms:.0f}ms.prof")
+    profiler.dump_stats(path)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("tottime").print_stats(20)
+    logger.info(
+        "Profiled %s %s (%.1f ms), saved to %s\n%s",
+        timings.scope["method"], timings.route, elapsed_ms, path, summary.getvalue(),
+    )
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: per-request Timings, Server-Timing header, slow request log, sampled cProfile."""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        global _profiling
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        timings = Timings(scope)
+        token = _current.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timings.responded = time.perf_counter()
+                timings.streaming = any(
+                    name.lower() == b"content-type" and value.startswith(EVENT_STREAM)
+                    for name, value in message.get("headers", [])
+                )
+                if SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = None
+        if _wants_profile(scope):
+            _profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed_ms = (time.perf_counter() - timings.started) * 1000
+            _current.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _profiling = False
+                # Writing the file and sorting the stats would block the event loop.
+                await asyncio.to_thread(_save_profile, profiler, timings, elapsed_ms)
+            if SLOW_REQUEST_MS and elapsed_ms >= SLOW_REQUEST_MS and not timings.streaming:
+                SLOW_REQUESTS.inc(method=scope["method"], route=timings.route)
+                seconds, statement = timings.slowest
+                logger.warning(
+                    "Slow request %s %s (%s) %.1f ms: %d queries, %.1f ms SQL%s",
+                    scope["method"], timings.route, scope["path"], elapsed_ms, timings.queries,
+                    timings.sql_seconds * 1000,
+                    f"; slowest {seconds * 1000:.1f} ms: {' '.join(statement.split())}" if statement else "",
+                )
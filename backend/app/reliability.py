@@ -0,0 +1,317 @@
+"""MTTR / MTBF rollups.
+
+When a request reaches REPAIRED, an ``after_flush`` hook adds it to
+``reliability_rollups`` (counts, summed repair minutes, failure span) and
+``repair_time_histogram`` for every dimension it belongs to (all, equipment,
+category, team, technician) at day, week and month granularity. Rollups are
+kept per tenant (``company_name``, "" for the unnamed one), so "all" and
+the shared categories only cover the caller's company. Reads only touch the
+rollups for the requested tenant/dimension/bucket/range, never the request
+history.
+
+* Repair time is ``duration_minutes`` (started -> completed) when the job was
+  started, otherwise created -> completed.
+* A failure is a CORRECTIVE request; its ``created_at`` is the failure time.
+  MTBF over a span is (last failure - first failure) / (failures - 1).
+* Percentiles interpolate inside the histogram bucket, within the repair
+  times actually observed there.
+
+A request counts once, when it is first repaired: ``completed_at`` is never
+cleared, so a reopened request that is repaired again is not added a second
+time. Run ``python -m app.reliability`` to rebuild the rollups from scratch
+(also backfills history recorded before the rollups existed, and recreates
+the tables when their layout changed); the rebuild counts every request
+that was ever repaired, with its latest repair.
+"""
+import bisect
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, delete, event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+DIMENSIONS = ("all", "equipment", "category", "team", "technician")
+GRANULARITIES = ("day", "week", "month")
+
+# Upper bounds (minutes) of the histogram buckets; the last bucket is open-ended.
+REPAIR_MINUTE_BUCKETS = (15, 30, 60, 120, 240, 480, 960, 1440, 2880, 5760, 10080, 20160)
+
+
+def period_start(moment: datetime, granularity: str) -> datetime:
+    day = datetime(moment.year, moment.month, moment.day)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _naive_utc(moment):
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def repair_minutes(request) -> float:
+    if request.duration_minutes is not None:
+        return float(request.duration_minutes)
+    created = _naive_utc(request.created_at) or _naive_utc(request.completed_at)
+    return max((_naive_utc(request.completed_at) - created).total_seconds() / 60, 0.0)
+
+
+def _histogram_bucket(minutes: float) -> int:
+    return bisect.bisect_left(REPAIR_MINUTE_BUCKETS, minutes)
+
+
+def _members(request, category_id):
+    yield "all", 0
+    if request.equipment_id:
+        yield "equipment", request.equipment_id
+    if category_id:
+        yield "category", category_id
+    if request.team_id:
+        yield "team", request.team_id
+    if request.technician_id:
+        yield "technician", request.technician_id
+
+
+def _rollup_rows(requests, categories):
+    """Aggregate repaired requests into rollup and histogram rows keyed by primary key."""
+    rollups = {}
+    histogram = {}
+    for request in requests:
+        completed = _naive_utc(request.completed_at)
+        minutes = repair_minutes(request)
+        failure_at = _naive_utc(request.created_at) if request.request_type == models.RequestType.CORRECTIVE else None
+        bucket = _histogram_bucket(minutes)
+        tenant = request.company_name or ""
+        for dimension, dimension_id in _members(request, categories.get(request.equipment_id)):
+            for granularity in GRANULARITIES:
+                key = (tenant, dimension, dimension_id, granularity, period_start(completed, granularity))
+                row = rollups.setdefault(key, {
+                    "repair_count": 0, "repair_minutes_sum": 0.0, "failure_count": 0,
+                    "first_failure_at": None, "last_failure_at": None,
+                })
+                row["repair_count"] += 1
+                row["repair_minutes_sum"] += minutes
+                if failure_at is not None:
+                    row["failure_count"] += 1
+                    row["first_failure_at"] = min(filter(None, (row["first_failure_at"], failure_at)))
+                    row["last_failure_at"] = max(filter(None, (row["last_failure_at"], failure_at)))
+                cell = histogram.setdefault(key + (bucket,), {"count": 0, "min_minutes": minutes, "max_minutes": minutes})
+                cell["count"] += 1
+                cell["min_minutes"] = min(cell["min_minutes"], minutes)
+                cell["max_minutes"] = max(cell["max_minutes"], minutes)
+    return rollups, histogram
+
+
+def _lowest(current, incoming):
+    return case((current.is_(None), incoming), (incoming.is_(None), current), (incoming < current, incoming), else_=current)
+
+
+def _highest(current, incoming):
+    return case((current.is_(None), incoming), (incoming.is_(None), current), (incoming > current, incoming), else_=current)
+
+
+def _insert_for(connection):
+    return postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+
+
+def write_rollups(connection, rollups, histogram):
+    if not rollups:
+        return
+    insert = _insert_for(connection)
+    table = models.ReliabilityRollup.__table__
+    keys = ("company_name", "dimension", "dimension_id", "granularity", "period_start")
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys],
+        set_={
+            "repair_count": table.c.repair_count + stmt.excluded.repair_count,
+            "repair_minutes_sum": table.c.repair_minutes_sum + stmt.excluded.repair_minutes_sum,
+            "failure_count": table.c.failure_count + stmt.excluded.failure_count,
+            "first_failure_at": _lowest(table.c.first_failure_at, stmt.excluded.first_failure_at),
+            "last_failure_at": _highest(table.c.last_failure_at, stmt.excluded.last_failure_at),
+        },
+    )
+    connection.execute(stmt, [dict(zip(keys, key), **row) for key, row in rollups.items()])
+
+    table = models.RepairTimeHistogram.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys + ("bucket",)],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "min_minutes": _lowest(table.c.min_minutes, stmt.excluded.min_minutes),
+            "max_minutes": _highest(table.c.max_minutes, stmt.excluded.max_minutes),
+        },
+    )
+    connection.execute(stmt, [dict(zip(keys + ("bucket",), key), **cell) for key, cell in histogram.items()])
+
+
+def _categories(connection, equipment_ids) -> dict:
+    if not equipment_ids:
+        return {}
+    rows = connection.execute(
+        select(models.Equipment.id, models.Equipment.category_id).where(models.Equipment.id.in_(equipment_ids))
+    )
+    return dict(rows.all())
+
+
+def _newly_repaired(session):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, models.MaintenanceRequest) or obj.stage != models.RequestStage.REPAIRED:
+            continue
+        if obj.completed_at is None or obj in session.deleted:
+            continue
+        if obj in session.new:
+            yield obj
+            continue
+        history = inspect(obj).attrs.stage.history
+        completed = inspect(obj).attrs.completed_at.history
+        # Already counted when it was first repaired (completed_at was set then).
+        previously_completed = completed.deleted[0] if completed.added else obj.completed_at
+        if history.added and models.RequestStage.REPAIRED not in history.deleted and previously_completed is None:
+            yield obj
+
+
+@event.listens_for(Session, "after_flush")
+def _track_repairs(session, flush_context):
+    repaired = list(_newly_repaired(session))
+    if not repaired:
+        return
+    connection = session.connection()
+    categories = _categories(connection, {r.equipment_id for r in repaired if r.equipment_id})
+    write_rollups(connection, *_rollup_rows(repaired, categories))
+
+
+def record_repairs(connection, request_ids):
+    """Roll up requests moved to REPAIRED by Core statements that bypass the flush hook.
+
+    ``request_ids`` are the requests repaired for the first time (see the module docstring).
+    """
+    if not request_ids:
+        return
+    MR = models.MaintenanceRequest
+    repaired = connection.execute(select(MR).where(MR.id.in_(request_ids), MR.completed_at.is_not(None))).all()
+    categories = _categories(connection, {r.equipment_id for r in repaired if r.equipment_id})
+    write_rollups(connection, *_rollup_rows(repaired, categories))
+
+
+# --- Reads ---
+
+def _percentile(cells, total, fraction):
+    """``fraction`` percentile from the histogram ``cells`` ((count, min, max) per bucket).
+
+    Interpolates linearly inside the bucket the percentile falls in, between
+    the smallest and largest repair time observed there, so a bucket holding
+    one 0-minute repair reports 0 rather than a made-up spread.
+    """
+    if not total:
+        return None
+    target = fraction * total
+    seen = 0
+    for count, low, high in cells:
+        if count and seen + count >= target:
+            if count == 1:
+                return float(high)
+            return low + (high - low) * max(target - seen - 1, 0) / (count - 1)
+        seen += count
+    return None
+
+
+async def query(db, tenant, dimension, granularity, start=None, end=None, dimension_id=None):
+    # Rollups are not tenant-scoped ORM models; the tenant is always filtered here.
+    filters = [
+        models.ReliabilityRollup.company_name == (tenant or ""),
+        models.ReliabilityRollup.dimension == dimension,
+        models.ReliabilityRollup.granularity == granularity,
+    ]
+    hist_filters = [
+        models.RepairTimeHistogram.company_name == (tenant or ""),
+        models.RepairTimeHistogram.dimension == dimension,
+        models.RepairTimeHistogram.granularity == granularity,
+    ]
+    if dimension_id is not None:
+        filters.append(models.ReliabilityRollup.dimension_id == dimension_id)
+        hist_filters.append(models.RepairTimeHistogram.dimension_id == dimension_id)
+    if start is not None:
+        filters.append(models.ReliabilityRollup.period_start >= period_start(start, granularity))
+        hist_filters.append(models.RepairTimeHistogram.period_start >= period_start(start, granularity))
+    if end is not None:
+        filters.append(models.ReliabilityRollup.period_start <= end)
+        hist_filters.append(models.RepairTimeHistogram.period_start <= end)
+
+    rollups = (await db.scalars(
+        select(models.ReliabilityRollup).where(*filters).order_by(
+            models.ReliabilityRollup.dimension_id, models.ReliabilityRollup.period_start
+        )
+    )).all()
+    histograms = defaultdict(lambda: [(0, None, None)] * (len(REPAIR_MINUTE_BUCKETS) + 1))
+    rows = await db.execute(
+        select(
+            models.RepairTimeHistogram.dimension_id, models.RepairTimeHistogram.period_start,
+            models.RepairTimeHistogram.bucket, models.RepairTimeHistogram.count,
+            models.RepairTimeHistogram.min_minutes, models.RepairTimeHistogram.max_minutes,
+        ).where(*hist_filters)
+    )
+    for dim_id, start_at, bucket, count, low, high in rows:
+        histograms[(dim_id, start_at)][bucket] = (count, low, high)
+
+    results = []
+    for row in rollups:
+        cells = histograms[(row.dimension_id, row.period_start)]
+        mtbf_hours = None
+        if row.failure_count > 1:
+            span = row.last_failure_at - row.first_failure_at
+            mtbf_hours = span.total_seconds() / 3600 / (row.failure_count - 1)
+        results.append({
+            "group_id": row.dimension_id,
+            "period_start": row.period_start,
+            "repairs": row.repair_count,
+            "failures": row.failure_count,
+            "mttr_minutes": row.repair_minutes_sum / row.repair_count if row.repair_count else None,
+            "mtbf_hours": mtbf_hours,
+            "repair_minutes_p50": _percentile(cells, row.repair_count, 0.5),
+            "repair_minutes_p90": _percentile(cells, row.repair_count, 0.9),
+            "repair_minutes_p95": _percentile(cells, row.repair_count, 0.95),
+        })
+    return results
+
+
+# --- Rebuild ---
+
+def rebuild(connection, batch_size: int = 5000):
+    """Recompute all rollups from maintenance_requests and its archive (one-off backfill / repair).
+
+    Every request that was ever repaired counts, reopened ones included, as in the flush hook.
+    """
+    connection.execute(delete(models.ReliabilityRollup))
+    connection.execute(delete(models.RepairTimeHistogram))
+    for MR in (models.MaintenanceRequest, models.ArchivedMaintenanceRequest):
+        last_id = 0
+        while True:
+            batch = connection.execute(
+                select(MR).where(MR.completed_at.is_not(None), MR.id > last_id)
+                .order_by(MR.id).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            categories = _categories(connection, {r.equipment_id for r in batch if r.equipment_id})
+            write_rollups(connection, *_rollup_rows(batch, categories))
+
+
+if __name__ == "__main__":
+    from .database import engine, Base
+
+    # Derived data only: recreate the tables so a changed layout (e.g. the tenant key) is picked up.
+    tables = [models.ReliabilityRollup.__table__, models.RepairTimeHistogram.__table__]
+    Base.metadata.drop_all(bind=engine, tables=tables)
+    Base.metadata.create_all(bind=engine, tables=tables)
+    with engine.begin() as connection:
+        rebuild(connection)
+    print("Reliability rollups rebuilt.")
@@ -0,0 +1,180 @@
+"""Append-only change log of maintenance requests, and time-in-stage rollups.
+
+Creating a request and every change of its stage, technician or priority
+adds a ``request_events`` row (old / new value, actor, time), so waiting
+time, wrench time and reassignments survive later edits.
+
+Events are buffered, not written one by one: a ``before_flush`` hook
+collects them in ``session.info`` and a ``before_commit`` hook writes the
+whole buffer with one multi-row INSERT (plus one upsert of the rollups), so
+a commit costs the same two statements however many events it carries, and
+a rolled back transaction writes none. Core bulk writes that bypass the
+unit of work call :func:`record` themselves.
+
+Each stage event carries the seconds spent in the stage that was left
+(``stage_changed_at``, or ``created_at`` for a request that never moved);
+the same commit adds them to ``stage_time_rollups`` per tenant, team, stage
+and day, which ``/reports/time-in-stage`` sums. Time in the current stage
+of open requests is counted when they leave it. Requests generated by plans
+(Core inserts) get no "created" event; their first stage starts at
+``created_at`` all the same.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+TRACKED = ("stage", "technician_id", "priority")
+KINDS = {"stage": "stage", "technician_id": "technician", "priority": "priority"}
+
+_BUFFER = "request_log"
+
+
+def bind_actor(session, user_id):
+    """Attribute the events ``session`` records to ``user_id``."""
+    session.info["actor_id"] = user_id
+
+
+def _value(value):
+    value = getattr(value, "value", value)
+    return None if value is None else str(value)
+
+
+def _naive_utc(moment):
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def stage_seconds(stage_changed_at, created_at, now: datetime) -> float:
+    entered = _naive_utc(stage_changed_at) or _naive_utc(created_at) or now
+    return max((now - entered).total_seconds(), 0.0)
+
+
+def record(session, request_id, kind: str, old, new, company_name, team_id=None, seconds=None, now=None):
+    """Buffer one event for ``request_id``; written when ``session`` (a sync Session) commits."""
+    session.info.setdefault(_BUFFER, []).append({
+        "request_id": request_id, "company_name": company_name, "team_id": team_id,
+        "kind": kind, "old_value": _value(old), "new_value": _value(new),
+        "occurred_at": now or datetime.utcnow(), "stage_seconds": seconds,
+    })
+
+
+@event.listens_for(Session, "before_flush")
+def _collect(session, flush_context, instances):
+    now = datetime.utcnow()
+    entries = []
+    for obj in session.new:
+        if isinstance(obj, models.MaintenanceRequest):
+            if obj.stage_changed_at is None:
+                obj.stage_changed_at = now
+            stage = obj.stage or models.RequestStage.NEW
+            entries.append((obj, "created", None, stage, None))
+    for obj in session.dirty:
+        if not isinstance(obj, models.MaintenanceRequest) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        for attr in TRACKED:
+            history = state.attrs[attr].history
+            if not (history.added and history.deleted) or history.added[0] == history.deleted[0]:
+                continue
+            seconds = None
+            if attr == "stage":
+                seconds = stage_seconds(obj.stage_changed_at, obj.created_at, now)
+                obj.stage_changed_at = now
+            entries.append((obj, KINDS[attr], history.deleted[0], history.added[0], seconds))
+    if entries:
+        # id, tenant and team are only final after the flush; resolved in _write.
+        session.info.setdefault(_BUFFER, []).extend(
+            {"request": obj, "kind": kind, "old_value": _value(old), "new_value": _value(new),
+             "occurred_at": now, "stage_seconds": seconds}
+            for obj, kind, old, new, seconds in entries
+        )
+
+
+def _rollup_rows(rows):
+    totals = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        if row["kind"] == "stage" and row["stage_seconds"] is not None:
+            day = row["occurred_at"].replace(hour=0, minute=0, second=0, microsecond=0)
+            key = (row["company_name"] or "", row["team_id"] or 0, row["old_value"], day)
+            totals[key][0] += 1
+            totals[key][1] += row["stage_seconds"]
+    return [
+        {"company_name": c, "team_id": t, "stage": s, "day": d, "transitions": n, "seconds_sum": total}
+        for (c, t, s, d), (n, total) in totals.items()
+    ]
+
+
+def _write_rollups(connection, rows):
+    if not rows:
+        return
+    table = models.StageTimeRollup.__table__
+    stmt = (postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.company_name, table.c.team_id, table.c.stage, table.c.day],
+        set_={
+            "transitions": table.c.transitions + stmt.excluded.transitions,
+            "seconds_sum": table.c.seconds_sum + stmt.excluded.seconds_sum,
+        },
+    )
+    connection.execute(stmt, rows)
+
+
+@event.listens_for(Session, "before_commit")
+def _write(session):
+    if _BUFFER not in session.info and not session.new and not session.dirty:
+        return
+    # The commit's own flush runs after this hook; flush first so its events are buffered too.
+    session.flush()
+    pending = session.info.pop(_BUFFER, None)
+    if not pending:
+        return
+    actor_id = session.info.get("actor_id")
+    rows = []
+    for entry in pending:
+        request = entry.pop("request", None)
+        if request is not None:
+            entry.update(request_id=request.id, company_name=request.company_name, team_id=request.team_id)
+        rows.append(dict(entry, actor_id=actor_id))
+    connection = session.connection()
+    columns = ("request_id", "company_name", "kind", "old_value", "new_value", "actor_id", "occurred_at", "stage_seconds")
+    connection.execute(insert(models.RequestEvent.__table__), [{k: row[k] for k in columns} for row in rows])
+    _write_rollups(connection, _rollup_rows(rows))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_BUFFER, None)
+
+
+# --- Reads ---
+
+async def time_in_stage(db, tenant, start=None, end=None, team_id=None) -> list:
+    """Per stage: transitions out of it and hours spent in it, for stage changes in [start, end)."""
+    R = models.StageTimeRollup
+    query = select(R.stage, R.transitions, R.seconds_sum).where(R.company_name == (tenant or ""))
+    if start is not None:
+        query = query.where(R.day >= start)
+    if end is not None:
+        query = query.where(R.day < end)
+    if team_id is not None:
+        query = query.where(R.team_id == team_id)
+    totals = defaultdict(lambda: [0, 0.0])
+    for stage, transitions, seconds in await db.execute(query):
+        totals[stage][0] += transitions
+        totals[stage][1] += seconds
+    results = []
+    for stage in models.RequestStage:
+        transitions, seconds = totals[stage.value]
+        results.append({
+            "stage": stage.value,
+            "transitions": transitions,
+            "total_hours": round(seconds / 3600, 2),
+            "avg_hours": round(seconds / 3600 / transitions, 2) if transitions else None,
+        })
+    return results
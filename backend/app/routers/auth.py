@@ -1,15 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.session import make_transient_to_detached
 from datetime import timedelta
-from .. import models, schemas, database, utils
+from .. import models, schemas, database, utils, cache, hashing, metrics, events, tenancy, request_log, profiling
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from datetime import datetime
+from typing import Optional
 from jose import jwt, JWTError
 
-router = APIRouter(tags=["Authentication"])
+router = APIRouter(tags=["Authentication"], route_class=profiling.ProfiledRoute)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+# Detached snapshots of authenticated users keyed by token subject (username), so an
+# authenticated call does not need its own SELECT on users.
+principal_cache = cache.TTLCache(maxsize=utils.PRINCIPAL_CACHE_MAX_SIZE, ttl=utils.PRINCIPAL_CACHE_TTL_SECONDS)
+
+def _snapshot_user(user: models.User) -> models.User:
+    columns = {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+    snapshot = models.User(**columns)
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+@metrics.register_collector
+def _principal_cache_metrics():
+    stats = principal_cache.stats()
+    yield "principal_cache_hits_total", "counter", "Authenticated-principal cache hits.", {}, stats["hits"]
+    yield "principal_cache_misses_total", "counter", "Authenticated-principal cache misses.", {}, stats["misses"]
+    yield "principal_cache_entries", "gauge", "Authenticated principals currently cached.", {}, stats["size"]
+
+def invalidate_principal(username: str):
+    principal_cache.invalidate(username)
+
+@event.listens_for(models.User, "after_delete")
+def _invalidate_deleted_principal(mapper, connection, target):
+    invalidate_principal(target.username)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_db)):
+    return await authenticate(token, db)
+
+async def authenticate(token: str, db: AsyncSession) -> models.User:
+    """Resolve a bearer token to its user (for callers that get the token elsewhere, e.g. a query parameter)."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -23,44 +55,106 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.username == username).first()
+    cached = principal_cache.get(username)
+    if cached is not None:
+        # Attach a copy to this request's session without hitting the database.
+        return await db.merge(cached, load=False)
+
+    user = await db.scalar(select(models.User).where(models.User.username == username))
     if user is None:
         raise credentials_exception
+    principal_cache.set(username, _snapshot_user(user))
     return user
 
-router = APIRouter(tags=["Authentication"])
+async def bind_tenant(
+    request: Request,
+    user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(database.get_db)
+):
+    """Router dependency: require a signed-in caller, scope the request's session to
+    their company (see tenancy.py) and attribute its request changes to them
+    (request_log.py).
+
+    Endpoints that also depend on ``get_current_user`` get the same user
+    (FastAPI resolves it once per request).
+    """
+    tenancy.bind(db, user.company_name)
+    request_log.bind_actor(db, user.id)  # request_events record who made each change
+    request.state.tenant = user.company_name  # cache keys (http_cache) include it
+
+async def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(database.get_db)
+) -> Optional[models.User]:
+    if not token:
+        return None
+    return await authenticate(token, db)
+
+router = APIRouter(tags=["Authentication"], route_class=profiling.ProfiledRoute)
 
 @router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    hashed_password = utils.get_password_hash(user.password)
+async def register(
+    user: schemas.UserCreate,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: Optional[models.User] = Depends(get_optional_user)
+):
+    # An admin signing a user up adds them to the admin's own company unless the body names one.
+    company_name = user.company_name
+    if "company_name" not in user.model_fields_set and current_user is not None and current_user.role == models.UserRole.ADMIN:
+        company_name = current_user.company_name
+    # Self sign-up may start a new company, but only an admin of an existing one can add users to it.
+    if company_name is not None:
+        is_admin = (
+            current_user is not None
+            and current_user.role == models.UserRole.ADMIN
+            and current_user.company_name == company_name
+        )
+        if not is_admin:
+            taken = await db.scalar(select(models.User.id).where(models.User.company_name == company_name).limit(1))
+            if taken is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"Only an admin of '{company_name}' can add users to it",
+                )
+    hashed_password = await hashing.hash_password(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
         password_hash=hashed_password,
         role=user.role,
         department=user.department,
+        company_name=company_name,
         team_id=user.team_id
     )
     try:
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         # Debugging 500: Return the actual error
         print(f"Register Error: {e}") 
         raise HTTPException(status_code=500, detail=str(e))
+    events.user_changed("created", db_user)
     return db_user
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not utils.verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_db)):
+    user = await db.scalar(select(models.User).where(models.User.username == form_data.username))
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await hashing.verify_and_update_password(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Configured bcrypt cost changed since this hash was created
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
     
     access_token_expires = timedelta(minutes=utils.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = utils.create_access_token(
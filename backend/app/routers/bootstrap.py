@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from .. import models, schemas, database, http_cache, profiling
+
+router = APIRouter(prefix="/bootstrap", tags=["Bootstrap"], route_class=profiling.ProfiledRoute)
+
+# Just what the pickers on the forms need; the full record comes from GET /equipment/{id}.
+EQUIPMENT_SUMMARY_COLUMNS = (
+    models.Equipment.id, models.Equipment.name, models.Equipment.serial_number, models.Equipment.status,
+    models.Equipment.department, models.Equipment.category_id,
+    models.Equipment.default_team_id, models.Equipment.default_technician_id,
+)
+
+async def _categories(db):
+    categories = (await db.scalars(select(models.Category).order_by(models.Category.id))).all()
+    return [schemas.CategoryOut.model_validate(c) for c in categories]
+
+async def _teams(db):
+    teams = (await db.scalars(select(models.Team).order_by(models.Team.id))).all()
+    return [schemas.TeamOut.model_validate(t) for t in teams]
+
+async def _technicians(db):
+    users = (await db.scalars(
+        select(models.User).where(models.User.role == models.UserRole.TECHNICIAN).order_by(models.User.id)
+    )).all()
+    return [schemas.UserOut.model_validate(u) for u in users]
+
+async def _work_centers(db):
+    work_centers = (await db.scalars(select(models.WorkCenter).order_by(models.WorkCenter.id))).all()
+    return [schemas.WorkCenterOut.model_validate(wc) for wc in work_centers]
+
+async def _equipment_summary(db):
+    rows = await db.execute(select(*EQUIPMENT_SUMMARY_COLUMNS).order_by(models.Equipment.id))
+    return [dict(row._mapping) for row in rows]
+
+# name -> (tables the section reads, loader)
+SECTIONS = {
+    "categories": (("categories",), _categories),
+    "teams": (("teams",), _teams),
+    "technicians": (("users",), _technicians),
+    "work_centers": (("work_centers",), _work_centers),
+    "equipment_summary": (("equipment",), _equipment_summary),
+}
+
+@router.get("/")
+async def read_bootstrap(
+    request: Request,
+    include: Optional[str] = None, # comma list of SECTIONS, default all
+    db: AsyncSession = Depends(database.get_db)
+):
+    # Every form's reference data in one round trip. Each section is cached on its own
+    # (keyed by its tables' versions), so editing a team only reloads "teams".
+    names = [n.strip() for n in include.split(",") if n.strip()] if include else list(SECTIONS)
+    unknown = [n for n in names if n not in SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    names = list(dict.fromkeys(names))
+
+    entries = []
+    for name in names:
+        tables, loader = SECTIONS[name]
+
+        async def load(loader=loader):
+            return await loader(db), None
+
+        key = (http_cache.tenant_key(request), "bootstrap", name)
+        entries.append(await http_cache.cached_entry(tables, key, load))
+
+    # The combined tag changes when any included section does; an unchanged form gets a 304.
+    etag = http_cache.make_etag("bootstrap", *(f"{n}:{e.etag}" for n, e in zip(names, entries)))
+    if http_cache.matches(request, etag):
+        return http_cache.not_modified(etag, http_cache.REFERENCE_CACHE_CONTROL)
+    # Splice the cached section bodies instead of re-serializing them.
+    body = b"{" + b",".join(b'"%s":%s' % (n.encode(), e.body) for n, e in zip(names, entries)) + b"}"
+    return Response(
+        content=body, media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": http_cache.REFERENCE_CACHE_CONTROL},
+    )
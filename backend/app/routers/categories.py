@@ -1,23 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas, database, http_cache, profiling
 
-router = APIRouter(prefix="/categories", tags=["Categories"])
+router = APIRouter(prefix="/categories", tags=["Categories"], route_class=profiling.ProfiledRoute)
 
 @router.post("/", response_model=schemas.CategoryOut)
-def create_category(category: schemas.CategoryCreate, db: Session = Depends(database.get_db)):
+async def create_category(category: schemas.CategoryCreate, db: AsyncSession = Depends(database.get_db)):
     db_category = models.Category(**category.dict())
     try:
         db.add(db_category)
-        db.commit()
-        db.refresh(db_category)
+        await db.commit()
+        await db.refresh(db_category)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"A category named '{category.name}' already exists")
     except Exception as e:
         print(f"Category Create Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     return db_category
 
 @router.get("/", response_model=List[schemas.CategoryOut])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    categories = db.query(models.Category).offset(skip).limit(limit).all()
-    return categories
+async def read_categories(request: Request, skip: int = 0, limit: int = Query(100, ge=1, le=1000), db: AsyncSession = Depends(database.get_db)):
+    async def load():
+        categories = (await db.scalars(select(models.Category).offset(skip).limit(limit))).all()
+        return [schemas.CategoryOut.model_validate(category) for category in categories], None
+
+    return await http_cache.cached_response(request, ("categories",), ("categories", skip, limit), load)
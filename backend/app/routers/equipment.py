@@ -1,39 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from .. import models, schemas, database
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload
+from typing import List, Optional
+from .. import models, schemas, database, pagination, bulk_import, events, serialization, lookups, profiling
 
-router = APIRouter(prefix="/equipment", tags=["Equipment"])
+router = APIRouter(prefix="/equipment", tags=["Equipment"], route_class=profiling.ProfiledRoute)
 
 from . import auth
 
+# Loader strategy matching schemas.EquipmentOut.
+EQUIPMENT_OUT_OPTIONS = (
+    joinedload(models.Equipment.default_technician),
+    joinedload(models.Equipment.category_rel),
+    raiseload("*"),
+)
+
+EQUIPMENT_FIELDS = serialization.FieldSpec(
+    models.Equipment, schemas.EquipmentOut,
+    expandable={
+        "default_technician": (models.Equipment.default_technician, serialization.FieldSpec(models.User, schemas.UserOut)),
+        "category_rel": (models.Equipment.category_rel, serialization.FieldSpec(models.Category, schemas.CategoryOut)),
+    },
+)
+
+async def _get_equipment_out(db: AsyncSession, id: int):
+    return await db.scalar(
+        select(models.Equipment)
+        .options(*EQUIPMENT_OUT_OPTIONS)
+        .where(models.Equipment.id == id)
+        .execution_options(populate_existing=True)
+    )
+
 @router.get("/", response_model=List[schemas.EquipmentOut])
-def read_equipment(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    equipment = db.query(models.Equipment).options(
-        joinedload(models.Equipment.default_technician),
-        joinedload(models.Equipment.category_rel)
-    ).offset(skip).limit(limit).all()
+async def read_equipment(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None, # default_technician, category_rel
+    ids: Optional[str] = None, # "1,2,3": that equipment in that order, no pagination
+    db: AsyncSession = Depends(database.get_db)
+):
+    selection = serialization.parse(EQUIPMENT_FIELDS, fields, expand)
+    options = EQUIPMENT_OUT_OPTIONS if selection is None else serialization.loader_options(EQUIPMENT_FIELDS, selection)
+    query = select(models.Equipment).options(*options)
+    wanted = lookups.parse_ids(ids)
+    if wanted is not None:
+        equipment = await lookups.load_many(db, query, models.Equipment, wanted)
+    else:
+        equipment = await pagination.paginate(db, query, [models.Equipment.id], response, limit, cursor=cursor, skip=skip)
+    if selection is not None:
+        return serialization.FastJSONResponse(
+            [serialization.render(e, selection) for e in equipment], headers=pagination.cursor_headers(response)
+        )
     return equipment
 
+@router.post("/import")
+async def import_equipment(
+    request: Request,
+    format: str = "csv",
+    mode: str = "insert",
+    batch_size: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Streamed CSV/NDJSON body; references may be ids or names (category, default_team, default_technician).
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+    report = await bulk_import.run_import(db, request, bulk_import.EQUIPMENT_IMPORT, format, mode, batch_size)
+    if report["inserted"] or report["updated"]:
+        # One summary event instead of one per row; clients re-fetch the list.
+        events.publish(
+            "equipment", "imported", data={"inserted": report["inserted"], "updated": report["updated"]},
+            broadcast=True, tenant=current_user.company_name,
+        )
+    return report
+
 @router.get("/{id}", response_model=schemas.EquipmentOut)
-def read_equipment_by_id(id: int, db: Session = Depends(database.get_db)):
-    equipment = db.query(models.Equipment).filter(models.Equipment.id == id).first()
+async def read_equipment_by_id(id: int, db: AsyncSession = Depends(database.get_db)):
+    equipment = await _get_equipment_out(db, id)
     if equipment is None:
         raise HTTPException(status_code=404, detail="Equipment not found")
     return equipment
 
 @router.put("/{id}", response_model=schemas.EquipmentOut)
-def update_equipment(
+async def update_equipment(
     id: int, 
     equipment_update: schemas.EquipmentUpdate, 
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
          raise HTTPException(status_code=403, detail="Not authorized")
          
-    db_equipment = db.query(models.Equipment).filter(models.Equipment.id == id).first()
+    db_equipment = await db.get(models.Equipment, id)
     if not db_equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
         
@@ -41,23 +104,28 @@ def update_equipment(
         setattr(db_equipment, key, value)
         
     db.add(db_equipment)
-    db.commit()
-    db.refresh(db_equipment)
-    return db_equipment
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"Serial number '{equipment_update.serial_number}' is already in use")
+    events.equipment_changed("updated", db_equipment)
+    return await _get_equipment_out(db, db_equipment.id)
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_equipment(
+async def delete_equipment(
     id: int, 
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
          raise HTTPException(status_code=403, detail="Not authorized")
 
-    db_equipment = db.query(models.Equipment).filter(models.Equipment.id == id).first()
+    db_equipment = await db.get(models.Equipment, id)
     if not db_equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
         
-    db.delete(db_equipment)
-    db.commit()
+    await db.delete(db_equipment)
+    await db.commit()
+    events.equipment_changed("deleted", db_equipment)
     return None
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import anyio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from .. import database, events, profiling
+from . import auth
+
+router = APIRouter(prefix="/events", tags=["Events"], route_class=profiling.ProfiledRoute)
+
+# EventSource cannot send headers, so the token may also come as ?token=.
+optional_bearer = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+
+async def _subscriber(
+    bearer: Optional[str] = Depends(optional_bearer),
+    token: Optional[str] = Query(None),
+):
+    if not (bearer or token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    # Not get_db: a yield dependency lives as long as the stream, and so would its pooled connection.
+    async with database.AsyncSessionLocal() as db:
+        return await auth.authenticate(bearer or token, db)
+
+def _sse(event: dict) -> str:
+    lines = f"event: {event['type']}\n"
+    if "seq" in event:
+        lines += f"id: {event['seq']}\n"
+    return lines + f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    team_id: Optional[int] = None,
+    technician_id: Optional[int] = None,
+    current_user = Depends(_subscriber),
+):
+    # Server-Sent Events; a comment line every EVENTS_HEARTBEAT_SECONDS keeps proxies from closing idle streams.
+    async def body():
+        async with events.hub.subscribe(current_user.company_name, team_id, technician_id) as subscription:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), events.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield _sse(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    token: str,
+    team_id: Optional[int] = None,
+    technician_id: Optional[int] = None,
+):
+    async with database.AsyncSessionLocal() as db:
+        try:
+            user = await auth.authenticate(token, db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    await websocket.accept()
+
+    async def forward(subscription, cancel_scope):
+        while (event := await subscription.get()) is not None:
+            await websocket.send_json(event)
+        cancel_scope.cancel()
+
+    async def until_disconnect(cancel_scope):
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        cancel_scope.cancel()
+
+    # Whichever side finishes first (hub shutdown or client gone) ends the other.
+    async with events.hub.subscribe(user.company_name, team_id, technician_id) as subscription:
+        async with anyio.create_task_group() as group:
+            group.start_soon(forward, subscription, group.cancel_scope)
+            group.start_soon(until_disconnect, group.cancel_scope)
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass
@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from .. import models, schemas, database, pagination, plans, http_cache, profiling
+from . import auth
+
+router = APIRouter(prefix="/plans", tags=["Maintenance Plans"], route_class=profiling.ProfiledRoute)
+
+# Editing any of these changes the future occurrences, which are then regenerated.
+SCHEDULE_FIELDS = {
+    "name", "description", "priority", "team_id", "technician_id",
+    "interval_days", "cron", "starts_at", "ends_at", "active",
+}
+
+def _require_planner(current_user: models.User):
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored like scheduled_date: naive UTC.
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _validate(plan):
+    targets = [plan.equipment_id, plan.category_id, plan.work_center_id]
+    if sum(t is not None for t in targets) != 1:
+        raise HTTPException(status_code=400, detail="Provide exactly one of equipment_id, category_id or work_center_id")
+    try:
+        plans.validate(plan.interval_days, plan.cron)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if plan.ends_at is not None and plan.ends_at <= plan.starts_at:
+        raise HTTPException(status_code=400, detail="ends_at must be after starts_at")
+
+async def _check_references(db: AsyncSession, plan):
+    # Lookups run on the tenant-scoped session, so another company's rows are "not found".
+    references = (
+        (models.Equipment, plan.equipment_id, "Equipment"), (models.WorkCenter, plan.work_center_id, "Work center"),
+        (models.Category, plan.category_id, "Category"), (models.Team, plan.team_id, "Team"),
+        (models.User, plan.technician_id, "Technician"),
+    )
+    for model, id, label in references:
+        if id is not None and await db.get(model, id) is None:
+            raise HTTPException(status_code=400, detail=f"{label} {id} not found")
+
+@router.post("/", response_model=schemas.PlanOut)
+async def create_plan(
+    plan: schemas.PlanCreate,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    _require_planner(current_user)
+    db_plan = models.MaintenancePlan(**plan.dict())
+    db_plan.starts_at = _naive_utc(db_plan.starts_at)
+    db_plan.ends_at = _naive_utc(db_plan.ends_at)
+    db_plan.created_by_id = current_user.id
+    _validate(db_plan)
+    await _check_references(db, db_plan)
+    db.add(db_plan)
+    await db.commit()
+    # The scheduler picks the new plan up (by updated_at) on its next tick.
+    plans.scheduler.wake()
+    return db_plan
+
+@router.get("/", response_model=List[schemas.PlanOut])
+async def read_plans(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    active: Optional[bool] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    query = select(models.MaintenancePlan)
+    if active is not None:
+        query = query.where(models.MaintenancePlan.active == active)
+    return await pagination.paginate(db, query, [models.MaintenancePlan.id], response, limit, cursor=cursor, skip=skip)
+
+@router.post("/generate")
+async def generate_now(
+    horizon_days: int = Query(plans.PLAN_HORIZON_DAYS, ge=1, le=3660),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Materialize the caller's due plans right away instead of waiting for the next tick.
+    _require_planner(current_user)
+    created = await plans.scheduler.tick(
+        database.AsyncSessionLocal, horizon_days=horizon_days, tenant=current_user.company_name
+    )
+    return {"created": created}
+
+@router.get("/{id}", response_model=schemas.PlanOut)
+async def read_plan(id: int, db: AsyncSession = Depends(database.get_db)):
+    plan = await db.get(models.MaintenancePlan, id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return plan
+
+async def _reschedule(db: AsyncSession, plan: models.MaintenancePlan):
+    # Only this plan is touched: its untouched future occurrences are replaced from now on.
+    now = datetime.utcnow()
+    await plans.discard_future(db, plan, now)
+    plan.generated_until = max(now, plan.starts_at - timedelta(microseconds=1))
+
+@router.put("/{id}", response_model=schemas.PlanOut)
+async def update_plan(
+    id: int,
+    plan_update: schemas.PlanUpdate,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    _require_planner(current_user)
+    plan = await db.get(models.MaintenancePlan, id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
+    update_data = plan_update.dict(exclude_unset=True)
+    for key in ("starts_at", "ends_at"):
+        if key in update_data:
+            update_data[key] = _naive_utc(update_data[key])
+    # Switching recurrence kind clears the other one.
+    if update_data.get("cron"):
+        update_data.setdefault("interval_days", None)
+    if update_data.get("interval_days"):
+        update_data.setdefault("cron", None)
+    for key, value in update_data.items():
+        setattr(plan, key, value)
+    _validate(plan)
+    await _check_references(db, plan)
+
+    if SCHEDULE_FIELDS & update_data.keys():
+        await _reschedule(db, plan)
+    await db.commit()
+    http_cache.bump(models.MaintenanceRequest.__tablename__)
+    plans.scheduler.wake()
+    return plan
+
+@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_plan(
+    id: int,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Deactivates the plan and drops its future, untouched occurrences; history stays linked.
+    _require_planner(current_user)
+    plan = await db.get(models.MaintenancePlan, id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    plan.active = False
+    await _reschedule(db, plan)
+    await db.commit()
+    http_cache.bump(models.MaintenanceRequest.__tablename__)
+    plans.scheduler.wake()
+    return None
@@ -1,25 +1,37 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .. import models, database
+from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, database, stats, reliability, tenancy, request_log, profiling
 
-router = APIRouter(prefix="/reports", tags=["Reports"])
+router = APIRouter(prefix="/reports", tags=["Reports"], route_class=profiling.ProfiledRoute)
 
 @router.get("/stats")
-def get_dashboard_stats(db: Session = Depends(database.get_db)):
+async def get_dashboard_stats(db: AsyncSession = Depends(database.get_db)):
+    # Counters are maintained transactionally by the write paths (see stats.py); one small read
+    # of the caller's tenant's counters.
+    tenant = tenancy.tenant_of(db)
+    names = [
+        stats.counter_name(prefix, value, tenant)
+        for prefix, values in (
+            ("equipment_status", models.EquipmentStatus), ("user_role", models.UserRole), ("request_stage", models.RequestStage)
+        )
+        for value in values
+    ]
+    counters = await stats.read_counters(db, names)
+
+    def count(prefix, *values):
+        return sum(counters.get(stats.counter_name(prefix, value, tenant), 0) for value in values)
+
     # 1. Critical Equipment (Health < 30%)
     # Logic: For now, we count equipment with status 'UNDER_MAINTENANCE' or associated with CRITICAL active requests.
     # Let's simple count Equipment where status != ACTIVE
-    critical_eq_count = db.query(models.Equipment).filter(
-        models.Equipment.status != models.EquipmentStatus.ACTIVE
-    ).count()
+    critical_eq_count = count("equipment_status", models.EquipmentStatus.UNDER_MAINTENANCE, models.EquipmentStatus.SCRAP)
 
     # 2. Technician Load
     # Logic: Ratio of Active Requests to Total Technicians.
-    total_techs = db.query(models.User).filter(models.User.role == models.UserRole.TECHNICIAN).count()
-    active_requests = db.query(models.MaintenanceRequest).filter(
-        models.MaintenanceRequest.stage.in_([models.RequestStage.NEW, models.RequestStage.IN_PROGRESS])
-    ).count()
+    total_techs = count("user_role", models.UserRole.TECHNICIAN)
+    active_requests = count("request_stage", models.RequestStage.NEW, models.RequestStage.IN_PROGRESS)
     
     # Avoid division by zero
     tech_load_msg = "0% Utilized"
@@ -47,3 +59,36 @@ def get_dashboard_stats(db: Session = Depends(database.get_db)):
             "label": "Pending Requests"
         }
     }
+
+@router.get("/reliability")
+async def get_reliability(
+    group_by: str = "all",
+    bucket: str = "month",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    # MTTR / MTBF / repair-time percentiles, served from the rollup tables (see reliability.py)
+    if group_by not in reliability.DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(reliability.DIMENSIONS)}")
+    if bucket not in reliability.GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(reliability.GRANULARITIES)}")
+
+    results = await reliability.query(
+        db, tenancy.tenant_of(db), group_by, bucket, start=start, end=end, dimension_id=group_id
+    )
+    return {"group_by": group_by, "bucket": bucket, "results": results}
+
+@router.get("/time-in-stage")
+async def get_time_in_stage(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    team_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    # Hours spent per stage (NEW = waiting, IN_PROGRESS = wrench time) by requests that left it
+    # in [start, end), from the daily rollups the change log maintains (see request_log.py).
+    stages = await request_log.time_in_stage(db, tenancy.tenant_of(db), start=start, end=end, team_id=team_id)
+    return {"team_id": team_id, "stages": stages}
+
@@ -1,38 +1,175 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from collections import Counter
+from sqlalchemy import case, cast, func, literal, select, union, update, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 from datetime import datetime
-from .. import models, schemas, database
+from .. import models, schemas, database, pagination, http_cache, stats, reliability, export, events, dispatch, serialization, lookups, tenancy, archive, request_log, profiling
 from . import auth
 
-router = APIRouter(prefix="/requests", tags=["Requests"])
+router = APIRouter(prefix="/requests", tags=["Requests"], route_class=profiling.ProfiledRoute)
 
+# Loader strategy matching schemas.RequestOut: both nested users come back in the same
+# SELECT, anything else the schema does not render must never be lazy-loaded.
+REQUEST_OUT_OPTIONS = (
+    joinedload(models.MaintenanceRequest.reporter),
+    joinedload(models.MaintenanceRequest.technician),
+    raiseload("*"),
+)
+
+REQUEST_FIELDS = serialization.FieldSpec(
+    models.MaintenanceRequest, schemas.RequestOut,
+    expandable={
+        "reporter": (models.MaintenanceRequest.reporter, serialization.FieldSpec(models.User, schemas.UserOut)),
+        "technician": (models.MaintenanceRequest.technician, serialization.FieldSpec(models.User, schemas.UserOut)),
+    },
+)
+
+# Clients may store the calendar but must revalidate it (cheap thanks to the ETag).
+CALENDAR_CACHE_CONTROL = "private, no-cache"
+
+async def _get_request_out(db: AsyncSession, id: int):
+    return await db.scalar(
+        select(models.MaintenanceRequest)
+        .options(*REQUEST_OUT_OPTIONS)
+        .where(models.MaintenanceRequest.id == id)
+        .execution_options(populate_existing=True)
+    )
 
 
 @router.get("/", response_model=List[schemas.RequestOut])
-def read_requests(
+async def read_requests(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     equipment_id: Optional[int] = None, 
     technician_id: Optional[int] = None, # Added filter
-    db: Session = Depends(database.get_db)
+    fields: Optional[str] = None, # e.g. "id,title,stage,technician.username"
+    expand: Optional[str] = None, # reporter, technician
+    ids: Optional[str] = None, # "1,2,3": those requests in that order, no pagination
+    db: AsyncSession = Depends(database.get_db)
 ):
-    query = db.query(models.MaintenanceRequest)
+    # Ordered on (created_at, id) so pages are stable; backed by the composite indexes on MaintenanceRequest.
+    order = [models.MaintenanceRequest.created_at, models.MaintenanceRequest.id]
+    selection = serialization.parse(REQUEST_FIELDS, fields, expand)
+    options = REQUEST_OUT_OPTIONS if selection is None else serialization.loader_options(REQUEST_FIELDS, selection, order)
+    query = select(models.MaintenanceRequest).options(*options)
     if equipment_id:
-        query = query.filter(models.MaintenanceRequest.equipment_id == equipment_id)
+        query = query.where(models.MaintenanceRequest.equipment_id == equipment_id)
     if technician_id:
-        query = query.filter(models.MaintenanceRequest.technician_id == technician_id)
+        query = query.where(models.MaintenanceRequest.technician_id == technician_id)
         
-    requests = query.offset(skip).limit(limit).all()
-    # Sort or Order if needed, but not specified.
+    wanted = lookups.parse_ids(ids)
+    if wanted is not None:
+        requests = await lookups.load_many(db, query, models.MaintenanceRequest, wanted)
+    else:
+        requests = await pagination.paginate(db, query, order, response, limit, cursor=cursor, skip=skip)
+    if selection is not None:
+        return serialization.FastJSONResponse(
+            [serialization.render(r, selection) for r in requests], headers=pagination.cursor_headers(response)
+        )
     return requests
 
+def _range_filters(equipment_id, technician_id, created_from, created_to, completed_from, completed_to):
+    # WHERE clauses for either request table (hot or archived); date ranges are inclusive on both ends.
+    def filters(source):
+        clauses = []
+        if equipment_id:
+            clauses.append(source.equipment_id == equipment_id)
+        if technician_id:
+            clauses.append(source.technician_id == technician_id)
+        if created_from:
+            clauses.append(source.created_at >= datetime.combine(created_from, time.min))
+        if created_to:
+            clauses.append(source.created_at < datetime.combine(created_to + timedelta(days=1), time.min))
+        if completed_from:
+            clauses.append(source.completed_at >= datetime.combine(completed_from, time.min))
+        if completed_to:
+            clauses.append(source.completed_at < datetime.combine(completed_to + timedelta(days=1), time.min))
+        return clauses
+    return filters
+
+async def _reaches_archive(db, created_from, completed_from):
+    return await archive.reaches(
+        db,
+        created_from=datetime.combine(created_from, time.min) if created_from else None,
+        completed_from=datetime.combine(completed_from, time.min) if completed_from else None,
+    )
+
+@router.get("/export")
+async def export_requests(
+    format: str = "csv",
+    equipment_id: Optional[int] = None,
+    technician_id: Optional[int] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    completed_from: Optional[date] = None,
+    completed_to: Optional[date] = None,
+    gzip: bool = False,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(export.FORMATS)}")
+
+    filters = _range_filters(equipment_id, technician_id, created_from, created_to, completed_from, completed_to)
+    # Old closed requests live in the archive; only union it in when the range can reach it.
+    query = export.export_query(filters, include_archive=await _reaches_archive(db, created_from, completed_from))
+    # The stream opens its own session; hand this connection back first, or concurrent
+    # exports each hold one while waiting for a second and starve the pool.
+    await db.close()
+
+    filename = f"maintenance_requests.{'csv' if format == 'csv' else 'ndjson'}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export.stream(database.AsyncSessionLocal, query, format, current_user.company_name, compress=gzip),
+        media_type=export.MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+@router.get("/history", response_model=List[schemas.RequestHistoryOut])
+async def read_request_history(
+    response: Response,
+    equipment_id: Optional[int] = None,
+    technician_id: Optional[int] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    completed_from: Optional[date] = None,
+    completed_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    # Like GET /requests/ but including archived requests when the range reaches them;
+    # keyset-paginated on (created_at, id) across both tables.
+    filters = _range_filters(equipment_id, technician_id, created_from, created_to, completed_from, completed_to)
+    sources = [(models.MaintenanceRequest, False)]
+    if await _reaches_archive(db, created_from, completed_from):
+        sources.append((models.ArchivedMaintenanceRequest, True))
+    fields = [name for name in schemas.RequestHistoryOut.model_fields if name != "archived"]
+    branches = [
+        select(*(getattr(source, name) for name in fields), literal(archived).label("archived")).where(*filters(source))
+        for source, archived in sources
+    ]
+    return await pagination.paginate_union(db, branches, ("created_at", "id"), response, limit, cursor=cursor)
+
 @router.get("/calendar", response_model=List[schemas.RequestOut])
-def read_requests_calendar(
+async def read_requests_calendar(
+    request: Request,
+    response: Response,
     start_date: date,
     end_date: date,
-    db: Session = Depends(database.get_db)
+    team_id: Optional[int] = None,
+    technician_id: Optional[int] = None,
+    request_type: Optional[models.RequestType] = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(database.get_db)
 ):
     # Filter by scheduled_date for Preventive, or created_at for Corrective?
     # Logic: "Requests specifically typed as Preventive... must appear on Calendar View"
@@ -43,18 +180,55 @@ def read_requests_calendar(
     # I'll return requests where (scheduled_date is within range) OR (request_type=CORRECTIVE and created_at within range)
     # Actually, simpler: return all requests overlapping the window.
     
-    # Filter by scheduled_date OR created_at (for Corrective maintenance that might not have a scheduled date)
-    from sqlalchemy import or_
-    query = db.query(models.MaintenanceRequest).filter(
-        or_(
-            models.MaintenanceRequest.scheduled_date.between(start_date, end_date),
-            models.MaintenanceRequest.created_at.between(start_date, end_date)
-        )
+    # Filter by scheduled_date OR created_at (for Corrective maintenance that might not have a scheduled date).
+    # Written as a UNION of two range scans (scheduled_date / created_at indexes) instead of an OR,
+    # which most planners turn into a sequential scan.
+    MR = models.MaintenanceRequest
+    in_window = union(
+        select(MR.id).where(MR.scheduled_date.between(start_date, end_date)),
+        select(MR.id).where(MR.created_at.between(start_date, end_date)),
+    ).subquery()
+    filters = [MR.id.in_(select(in_window.c.id))]
+    if team_id:
+        filters.append(MR.team_id == team_id)
+    if technician_id:
+        filters.append(MR.technician_id == technician_id)
+    if request_type:
+        filters.append(MR.request_type == request_type)
+
+    # Conditional GET: the fingerprint of the matching rows is an aggregate over the same index scans,
+    # so an unchanged month costs one small query and a 304.
+    fingerprint = (await db.execute(
+        select(func.count(MR.id), func.max(MR.id), func.sum(MR.id), func.max(MR.updated_at)).where(*filters)
+    )).one()
+    etag = http_cache.make_etag(
+        "calendar", tenancy.tenant_of(db), start_date, end_date, team_id, technician_id, request_type, limit, *fingerprint
     )
-    return query.all()
+    if http_cache.matches(request, etag):
+        return http_cache.not_modified(etag, CALENDAR_CACHE_CONTROL)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CALENDAR_CACHE_CONTROL
+
+    query = select(MR).options(*REQUEST_OUT_OPTIONS).where(*filters).order_by(
+        func.coalesce(MR.scheduled_date, MR.created_at), MR.id
+    ).limit(limit)
+    return (await db.scalars(query)).all()
+
+@router.get("/{id}", response_model=schemas.RequestOut)
+async def read_request(id: int, db: AsyncSession = Depends(database.get_db)):
+    db_request = await _get_request_out(db, id)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Request not found")
+    return db_request
+
+@router.get("/{id}/events", response_model=List[schemas.RequestEventOut])
+async def read_request_events(id: int, db: AsyncSession = Depends(database.get_db)):
+    # The request's change log, oldest first; kept for archived requests too.
+    RE = models.RequestEvent
+    return (await db.scalars(select(RE).where(RE.request_id == id).order_by(RE.id))).all()
 
 @router.post("/", response_model=schemas.RequestOut)
-def create_request(request: schemas.RequestCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def create_request(request: schemas.RequestCreate, db: AsyncSession = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
     # Validation: Must have either equipment_id or work_center_id
     if not request.equipment_id and not request.work_center_id:
         raise HTTPException(status_code=400, detail="Either Equipment or Work Center must be selected.")
@@ -70,29 +244,169 @@ def create_request(request: schemas.RequestCreate, db: Session = Depends(databas
     db_request.company_name = current_user.company_name # Inherit company
 
     # Logic: Auto-fill team_id from Equipment if not provided
-    if request.equipment_id and not request.team_id:
-         equipment = db.query(models.Equipment).filter(models.Equipment.id == request.equipment_id).first()
-         if equipment and equipment.default_team_id:
-             db_request.team_id = equipment.default_team_id
+    # Lookups are tenant-scoped: another company's equipment / work center is "not found".
+    equipment = await db.get(models.Equipment, request.equipment_id) if request.equipment_id else None
+    if request.equipment_id and equipment is None:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    if request.work_center_id and await db.get(models.WorkCenter, request.work_center_id) is None:
+        raise HTTPException(status_code=404, detail="Work center not found")
+    if equipment and not request.team_id and equipment.default_team_id:
+         db_request.team_id = equipment.default_team_id
+
+    # Auto-dispatch: least-loaded technician of the team, preferring the equipment's default technician
+    if dispatch.AUTO_DISPATCH and not db_request.technician_id:
+        await dispatch.assign(db, db_request, preferred=equipment.default_technician_id if equipment else None)
     
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
-    return db_request
+    await db.commit()
+    events.request_changed("created", db_request)
+    return await _get_request_out(db, db_request.id)
+
+def _minutes_between(dialect: str, start, end):
+    if dialect == "postgresql":
+        return func.extract("epoch", end - start) / 60
+    # SQLite
+    return (func.julianday(end) - func.julianday(start)) * 1440
+
+@router.patch("/bulk", response_model=List[schemas.RequestBulkResult])
+async def bulk_update_requests(
+    bulk: schemas.RequestBulkUpdate,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Same rules as update_request, applied to many requests with a fixed number of set-based statements.
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+    changes = bulk.dict(exclude_unset=True, exclude={"ids"})
+    if not bulk.ids or not changes:
+        raise HTTPException(status_code=400, detail="Provide ids and at least one of stage, priority, technician_id")
+
+    MR = models.MaintenanceRequest
+    table = MR.__table__
+    ids = list(dict.fromkeys(bulk.ids))
+    current = {
+        row.id: row for row in await db.execute(
+            select(
+                MR.id, MR.stage, MR.team_id, MR.equipment_id, MR.technician_id, MR.priority,
+                MR.stage_changed_at, MR.created_at, MR.completed_at,
+            ).where(MR.id.in_(ids))
+        )
+    }
+    results = {id: schemas.RequestBulkResult(id=id, status="updated") for id in ids}
+    for id in ids:
+        if id not in current:
+            results[id] = schemas.RequestBulkResult(id=id, status="not_found", detail="Request not found")
+
+    # Validation Logic: Technician Assignment (one lookup, checked against every request's team)
+    if changes.get("technician_id"):
+        tech = await db.get(models.User, changes["technician_id"])
+        for id, row in current.items():
+            if not tech:
+                results[id] = schemas.RequestBulkResult(id=id, status="rejected", detail="Technician not found")
+            elif row.team_id and tech.team_id != row.team_id:
+                results[id] = schemas.RequestBulkResult(
+                    id=id, status="rejected", detail="Technician does not belong to the assigned team"
+                )
+
+    accepted = [id for id in ids if results[id].status == "updated"]
+    if not accepted:
+        return list(results.values())
+
+    now = datetime.utcnow()
+    dialect = (await db.connection()).dialect.name
+    tenant = tenancy.tenant_of(db)
+    # Core statements are not tenant-filtered by the session; scope them explicitly.
+    in_tenant = tenancy.criterion(table.c.company_name, tenant)
+    new_stage = changes.get("stage")
+    stage_deltas = Counter()
+    repaired_ids = []
+
+    if new_stage is not None:
+        moving = [id for id in accepted if current[id].stage != new_stage]
+        for id in moving:
+            stage_deltas[stats.counter_name("request_stage", current[id].stage, tenant)] -= 1
+            stage_deltas[stats.counter_name("request_stage", new_stage, tenant)] += 1
+
+        if new_stage == models.RequestStage.IN_PROGRESS and moving:
+            await db.execute(update(table).where(table.c.id.in_(moving), in_tenant).values(started_at=now))
+
+        if new_stage == models.RequestStage.REPAIRED and moving:
+            await db.execute(
+                update(table).where(table.c.id.in_(moving), in_tenant).values(
+                    completed_at=now,
+                    duration_minutes=case(
+                        (table.c.started_at.is_(None), table.c.duration_minutes),
+                        else_=cast(_minutes_between(dialect, table.c.started_at, now), Integer),
+                    ),
+                )
+            )
+            # A request repaired before is already in the reliability rollups.
+            repaired_ids = [id for id in moving if current[id].completed_at is None]
+
+        # Logic: Scrap Trigger
+        if new_stage == models.RequestStage.SCRAP:
+            equipment_ids = {current[id].equipment_id for id in accepted if current[id].equipment_id}
+            if equipment_ids:
+                equipment_table = models.Equipment.__table__
+                for equipment_id, old_status in await db.execute(
+                    select(equipment_table.c.id, equipment_table.c.status).where(
+                        equipment_table.c.id.in_(equipment_ids),
+                        equipment_table.c.status != models.EquipmentStatus.SCRAP,
+                        tenancy.criterion(equipment_table.c.company_name, tenant),
+                    )
+                ):
+                    stage_deltas[stats.counter_name("equipment_status", old_status, tenant)] -= 1
+                    stage_deltas[stats.counter_name("equipment_status", models.EquipmentStatus.SCRAP, tenant)] += 1
+                await db.execute(
+                    update(equipment_table)
+                    .where(equipment_table.c.id.in_(equipment_ids), tenancy.criterion(equipment_table.c.company_name, tenant))
+                    .values(status=models.EquipmentStatus.SCRAP)
+                )
+
+    values = dict(changes, updated_at=now)
+    if new_stage is not None:
+        values["stage_changed_at"] = case((table.c.stage != new_stage, now), else_=table.c.stage_changed_at)
+    await db.execute(update(table).where(table.c.id.in_(accepted), in_tenant).values(**values))
+
+    # These statements bypass the ORM flush hooks; keep the counters, rollups and change log in the same transaction.
+    for id in accepted:
+        row = current[id]
+        for key, kind in request_log.KINDS.items():
+            if key in changes and changes[key] != getattr(row, key):
+                seconds = request_log.stage_seconds(row.stage_changed_at, row.created_at, now) if key == "stage" else None
+                request_log.record(
+                    db.sync_session, id, kind, getattr(row, key), changes[key], tenant,
+                    team_id=row.team_id, seconds=seconds, now=now,
+                )
+    connection = await db.connection()
+    await connection.run_sync(lambda sync_conn: stats.apply_deltas(sync_conn, stage_deltas))
+    await connection.run_sync(lambda sync_conn: reliability.record_repairs(sync_conn, repaired_ids))
+    await db.commit()
+    http_cache.bump(table.name, models.Equipment.__tablename__)
+    # Technician loads changed outside the ORM; reload them lazily.
+    dispatch.board.reset()
+    for id in accepted:
+        technician_id = changes.get("technician_id", current[id].technician_id)
+        events.publish(
+            "request", "updated", id, {key: getattr(value, "value", value) for key, value in changes.items()},
+            team_ids=(current[id].team_id,), technician_ids=(technician_id, current[id].technician_id), tenant=tenant,
+        )
+    return list(results.values())
 
 @router.put("/{id}", response_model=schemas.RequestOut)
-def update_request(id: int, request_update: schemas.RequestUpdate, db: Session = Depends(database.get_db)):
-    db_request = db.query(models.MaintenanceRequest).filter(models.MaintenanceRequest.id == id).first()
+async def update_request(id: int, request_update: schemas.RequestUpdate, db: AsyncSession = Depends(database.get_db)):
+    db_request = await db.get(models.MaintenanceRequest, id)
     if not db_request:
         raise HTTPException(status_code=404, detail="Request not found")
 
     update_data = request_update.dict(exclude_unset=True)
+    previous_technician_id = db_request.technician_id
     
     # Validation Logic: Technician Assignment
     if "technician_id" in update_data and update_data["technician_id"]:
         tech_id = update_data["technician_id"]
         # Check if tech is in the assigned team
-        tech = db.query(models.User).filter(models.User.id == tech_id).first()
+        tech = await db.get(models.User, tech_id)
         if not tech:
              raise HTTPException(status_code=400, detail="Technician not found")
              
@@ -111,7 +425,7 @@ def update_request(id: int, request_update: schemas.RequestUpdate, db: Session =
         
         if new_stage == models.RequestStage.SCRAP:
             # Trigger Update Equipment
-            db_equipment = db.query(models.Equipment).filter(models.Equipment.id == db_request.equipment_id).first()
+            db_equipment = await db.get(models.Equipment, db_request.equipment_id) if db_request.equipment_id else None
             if db_equipment:
                 db_equipment.status = models.EquipmentStatus.SCRAP
                 # No separate commit needed if same session, but good to be explicit or ensure it flushes.
@@ -129,17 +443,25 @@ def update_request(id: int, request_update: schemas.RequestUpdate, db: Session =
     for key, value in update_data.items():
         setattr(db_request, key, value)
 
+    # Auto-dispatch requests that are (re)opened without a technician
+    if dispatch.AUTO_DISPATCH and db_request.stage == models.RequestStage.NEW and not db_request.technician_id:
+        equipment = await db.get(models.Equipment, db_request.equipment_id) if db_request.equipment_id else None
+        await dispatch.assign(db, db_request, preferred=equipment.default_technician_id if equipment else None)
+
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
-    return db_request
+    await db.commit()
+    events.request_changed("updated", db_request, previous_technician_id=previous_technician_id)
+    if "stage" in update_data and update_data["stage"] == models.RequestStage.SCRAP and db_equipment:
+        events.equipment_changed("updated", db_equipment)
+    return await _get_request_out(db, db_request.id)
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_request(id: int, db: Session = Depends(database.get_db)):
-    db_request = db.query(models.MaintenanceRequest).filter(models.MaintenanceRequest.id == id).first()
+async def delete_request(id: int, db: AsyncSession = Depends(database.get_db)):
+    db_request = await db.get(models.MaintenanceRequest, id)
     if not db_request:
         raise HTTPException(status_code=404, detail="Request not found")
         
-    db.delete(db_request)
-    db.commit()
+    await db.delete(db_request)
+    await db.commit()
+    events.request_changed("deleted", db_request)
     return None
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import schemas, database, search, profiling
+
+router = APIRouter(prefix="/search", tags=["Search"], route_class=profiling.ProfiledRoute)
+
+@router.get("/", response_model=List[schemas.SearchHit])
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[str] = None, # comma separated subset of request,equipment,work_center
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(database.get_db)
+):
+    kinds = search.KINDS
+    if types:
+        kinds = tuple(t.strip() for t in types.split(",") if t.strip())
+        unknown = [t for t in kinds if t not in search.KINDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"types must be a subset of {', '.join(search.KINDS)}")
+    return await search.search(db, q, kinds, limit)
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas, database, http_cache, profiling
 
-router = APIRouter(prefix="/teams", tags=["Teams"])
+router = APIRouter(prefix="/teams", tags=["Teams"], route_class=profiling.ProfiledRoute)
 
 @router.post("/", response_model=schemas.TeamOut)
-def create_team(team: schemas.TeamCreate, db: Session = Depends(database.get_db)):
+async def create_team(team: schemas.TeamCreate, db: AsyncSession = Depends(database.get_db)):
     db_team = models.Team(**team.dict())
     db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"A team named '{team.name}' already exists")
+    await db.refresh(db_team)
     return db_team
 
 @router.get("/", response_model=List[schemas.TeamOut])
-def read_teams(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    teams = db.query(models.Team).offset(skip).limit(limit).all()
-    return teams
+async def read_teams(request: Request, skip: int = 0, limit: int = Query(100, ge=1, le=1000), db: AsyncSession = Depends(database.get_db)):
+    async def load():
+        teams = (await db.scalars(select(models.Team).offset(skip).limit(limit))).all()
+        return [schemas.TeamOut.model_validate(team) for team in teams], None
+
+    return await http_cache.cached_response(request, ("teams",), ("teams", skip, limit), load)
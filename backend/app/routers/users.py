@@ -1,31 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from .. import models, schemas, database
+from .. import models, schemas, database, pagination, http_cache, events, serialization, lookups, profiling
+from . import auth
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=profiling.ProfiledRoute)
+
+USER_FIELDS = serialization.FieldSpec(models.User, schemas.UserOut)
 
 @router.get("/", response_model=List[schemas.UserOut])
-def read_users(
+async def read_users(
+    request: Request,
     skip: int = 0, 
-    limit: int = 100, 
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     role: Optional[models.UserRole] = None,
     team_id: Optional[int] = None,
-    db: Session = Depends(database.get_db)
+    fields: Optional[str] = None,
+    ids: Optional[str] = None, # "1,2,3": those users in that order, no pagination
+    db: AsyncSession = Depends(database.get_db)
 ):
-    query = db.query(models.User)
-    
-    if role:
-        query = query.filter(models.User.role == role)
-    if team_id:
-        query = query.filter(models.User.team_id == team_id)
+    selection = serialization.parse(USER_FIELDS, fields, None)
+    wanted = lookups.parse_ids(ids)
+
+    async def load():
+        page = Response()
+        query = select(models.User)
+        if selection is not None:
+            query = query.options(*serialization.loader_options(USER_FIELDS, selection))
         
-    users = query.offset(skip).limit(limit).all()
-    return users
+        if role:
+            query = query.where(models.User.role == role)
+        if team_id:
+            query = query.where(models.User.team_id == team_id)
+            
+        if wanted is not None:
+            users = await lookups.load_many(db, query, models.User, wanted)
+        else:
+            users = await pagination.paginate(db, query, [models.User.id], page, limit, cursor=cursor, skip=skip)
+        if selection is not None:
+            return [serialization.render(user, selection) for user in users], pagination.cursor_headers(page)
+        return [schemas.UserOut.model_validate(user) for user in users], pagination.cursor_headers(page)
+
+    # Technician pickers on every form hit this; served from the reference cache.
+    key = ("users", skip, limit, cursor, role, team_id, selection.key if selection else None, None if wanted is None else tuple(wanted))
+    return await http_cache.cached_response(request, ("users",), key, load)
 
 @router.put("/{user_id}", response_model=schemas.UserOut)
-def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def update_user(
+    user_id: int,
+    user_update: schemas.UserUpdate,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -34,6 +66,9 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
         setattr(user, key, value)
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    # Role/team checks read the cached principal, drop it so the change applies immediately.
+    auth.invalidate_principal(user.username)
+    await db.refresh(user)
+    events.user_changed("updated", user)
     return user
@@ -1,19 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, database
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import models, schemas, database, pagination, http_cache, bulk_import, profiling
 
 router = APIRouter(
     prefix="/work-centers",
     tags=["work-centers"],
+    route_class=profiling.ProfiledRoute,
 )
 
 from . import auth
 
 @router.post("/", response_model=schemas.WorkCenterOut)
-def create_work_center(
+async def create_work_center(
     wc: schemas.WorkCenterCreate, 
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
@@ -21,18 +24,47 @@ def create_work_center(
 
     db_wc = models.WorkCenter(**wc.dict())
     db.add(db_wc)
-    db.commit()
-    db.refresh(db_wc)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"A work center with code '{wc.code}' already exists")
+    await db.refresh(db_wc)
     return db_wc
 
+@router.post("/import")
+async def import_work_centers(
+    request: Request,
+    format: str = "csv",
+    mode: str = "insert",
+    batch_size: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.MANAGER]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+    return await bulk_import.run_import(db, request, bulk_import.WORK_CENTER_IMPORT, format, mode, batch_size)
+
 @router.get("/", response_model=List[schemas.WorkCenterOut])
-def read_work_centers(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    work_centers = db.query(models.WorkCenter).offset(skip).limit(limit).all()
-    return work_centers
+async def read_work_centers(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_db)
+):
+    async def load():
+        page = Response()
+        query = select(models.WorkCenter)
+        work_centers = await pagination.paginate(db, query, [models.WorkCenter.id], page, limit, cursor=cursor, skip=skip)
+        return [schemas.WorkCenterOut.model_validate(wc) for wc in work_centers], pagination.cursor_headers(page)
+
+    key = ("work_centers", skip, limit, cursor)
+    return await http_cache.cached_response(request, ("work_centers",), key, load)
 
 @router.get("/{wc_id}", response_model=schemas.WorkCenterOut)
-def read_work_center(wc_id: int, db: Session = Depends(database.get_db)):
-    wc = db.query(models.WorkCenter).filter(models.WorkCenter.id == wc_id).first()
+async def read_work_center(wc_id: int, db: AsyncSession = Depends(database.get_db)):
+    wc = await db.get(models.WorkCenter, wc_id)
     if wc is None:
         raise HTTPException(status_code=404, detail="Work Center not found")
     return wc
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -28,9 +28,9 @@ class UserOut(UserBase):
         from_attributes = True
 
 class UserUpdate(BaseModel):
+    # No company_name: a user's company is set when they register (see auth.register).
     role: Optional[UserRole] = None
     department: Optional[str] = None
-    company_name: Optional[str] = None
     team_id: Optional[int] = None
 
 # --- Team Schemas ---
@@ -104,6 +104,25 @@ class RequestUpdate(BaseModel):
     technician_id: Optional[int] = None
     scheduled_date: Optional[datetime] = None
 
+class RequestBulkUpdate(BaseModel):
+    ids: List[int]
+    stage: Optional[RequestStage] = None
+    priority: Optional[RequestPriority] = None
+    technician_id: Optional[int] = None # null unassigns
+
+    @field_validator("stage", "priority")
+    @classmethod
+    def _not_null(cls, value):
+        # Leave the field out to keep the current value; null would blank every matched row.
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+class RequestBulkResult(BaseModel):
+    id: int
+    status: str # "updated", "not_found" or "rejected"
+    detail: Optional[str] = None
+
 class RequestOut(RequestBase):
     id: int
     stage: RequestStage
@@ -124,6 +143,34 @@ class RequestOut(RequestBase):
     class Config:
         from_attributes = True
 
+# Hot and archived requests alike (GET /requests/history); no nested users.
+class RequestHistoryOut(RequestBase):
+    id: int
+    stage: RequestStage
+    equipment_id: Optional[int]
+    work_center_id: Optional[int]
+    team_id: Optional[int]
+    technician_id: Optional[int]
+    reporter_id: int
+    created_at: datetime
+    started_at: Optional[datetime]
+    completed_at: Optional[datetime]
+    duration_minutes: Optional[int]
+    archived: bool
+
+class RequestEventOut(BaseModel):
+    id: int
+    request_id: int
+    kind: str
+    old_value: Optional[str]
+    new_value: Optional[str]
+    actor_id: Optional[int]
+    occurred_at: datetime
+    stage_seconds: Optional[float]
+
+    class Config:
+        from_attributes = True
+
 # --- Equipment Schemas ---
 class EquipmentBase(BaseModel):
     name: str
@@ -162,3 +209,49 @@ class EquipmentOut(EquipmentBase):
 
     class Config:
         from_attributes = True
+
+# --- Search Schemas ---
+class SearchHit(BaseModel):
+    kind: str # "request", "equipment" or "work_center"
+    id: int
+    title: Optional[str] = None
+    score: float
+
+# --- Maintenance Plan Schemas ---
+class PlanBase(BaseModel):
+    name: str
+    description: Optional[str] = None
+    priority: Optional[RequestPriority] = RequestPriority.MEDIUM
+    equipment_id: Optional[int] = None
+    category_id: Optional[int] = None
+    work_center_id: Optional[int] = None
+    team_id: Optional[int] = None
+    technician_id: Optional[int] = None
+    interval_days: Optional[int] = None
+    cron: Optional[str] = None # "minute hour day-of-month month day-of-week"
+    starts_at: datetime
+    ends_at: Optional[datetime] = None
+    active: Optional[bool] = True
+
+class PlanCreate(PlanBase):
+    pass
+
+class PlanUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[RequestPriority] = None
+    team_id: Optional[int] = None
+    technician_id: Optional[int] = None
+    interval_days: Optional[int] = None
+    cron: Optional[str] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    active: Optional[bool] = None
+
+class PlanOut(PlanBase):
+    id: int
+    created_by_id: Optional[int]
+    generated_until: Optional[datetime]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,212 @@
+"""Full-text search over requests, equipment and work centers.
+
+PostgreSQL: expression GIN indexes on ``to_tsvector('simple', ...)`` for
+ranked word/prefix matches, plus pg_trgm GIN indexes for typo-tolerant
+matches on titles/names and substring matches on serial numbers and codes.
+Being expression indexes, they are maintained by PostgreSQL on every write.
+The query repeats the indexed expression verbatim (constants as literals,
+not bound parameters) so the planner can use the index.
+
+SQLite: one external-content FTS5 table per entity, kept in sync by
+triggers, queried with prefix terms and ranked by bm25. There is no typo
+tolerance on SQLite.
+
+The queries are Core statements on the tables, so the caller's tenant (see
+tenancy.py) is applied explicitly, before ranking and limiting.
+
+Existing databases get the indexes with ``python -m app.search``.
+"""
+import re
+
+from sqlalchemy import DDL, Index, column, event, func, literal, literal_column, or_, select, table as table_clause, text
+from sqlalchemy.dialects import postgresql  # noqa: F401 - registers to_tsvector()/to_tsquery() types
+
+from . import models, tenancy
+from .database import Base
+
+KINDS = ("request", "equipment", "work_center")
+# pg_trgm word_similarity threshold for typo-tolerant matches.
+TRIGRAM_THRESHOLD = 0.4
+
+
+class _Entity:
+    def __init__(self, kind, model, label, document, trigram, fragment=None):
+        self.kind = kind
+        self.model = model
+        self.label = label  # column shown as the hit's title
+        self.document = document  # columns in the tsvector / FTS5 table
+        self.trigram = trigram  # column matched with word similarity (typos)
+        self.fragment = fragment  # column matched by substring (serials, codes)
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    @property
+    def fts_table(self):
+        return f"{self.table.name}_fts"
+
+
+ENTITIES = {
+    "request": _Entity(
+        "request", models.MaintenanceRequest, "title", ("title", "description"), "title",
+    ),
+    "equipment": _Entity(
+        "equipment", models.Equipment, "name", ("name", "serial_number", "location"), "name", "serial_number",
+    ),
+    "work_center": _Entity(
+        "work_center", models.WorkCenter, "name", ("name", "code"), "name", "code",
+    ),
+}
+
+
+def _tokens(q: str) -> list:
+    return re.findall(r"\w+", q.lower())
+
+
+# --- PostgreSQL ---
+
+def _pg_document(entity):
+    columns = [func.coalesce(entity.table.c[name], literal_column("''")) for name in entity.document]
+    joined = columns[0]
+    for part in columns[1:]:
+        joined = joined + literal_column("' '") + part
+    return func.to_tsvector(literal_column("'simple'"), joined)
+
+
+def _pg_indexes(entity):
+    table = entity.table
+    indexes = [
+        Index(f"ix_{table.name}_search", _pg_document(entity), postgresql_using="gin"),
+        Index(
+            f"ix_{table.name}_{entity.trigram}_trgm", table.c[entity.trigram],
+            postgresql_using="gin", postgresql_ops={entity.trigram: "gin_trgm_ops"},
+        ),
+    ]
+    if entity.fragment:
+        indexes.append(Index(
+            f"ix_{table.name}_{entity.fragment}_trgm", table.c[entity.fragment],
+            postgresql_using="gin", postgresql_ops={entity.fragment: "gin_trgm_ops"},
+        ))
+    for index in indexes:
+        index.ddl_if(dialect="postgresql")
+        table.append_constraint(index)
+    return indexes
+
+
+PG_INDEXES = [index for entity in ENTITIES.values() for index in _pg_indexes(entity)]
+
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+def _pg_query(entity, q: str, limit: int, scope=()):
+    table = entity.table
+    tokens = _tokens(q)
+    document = _pg_document(entity)
+    tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{t}:*" for t in tokens) or "''")
+    conditions = [document.op("@@")(tsquery), literal(q).op("<%")(table.c[entity.trigram])]
+    score = func.greatest(func.ts_rank(document, tsquery), func.word_similarity(q, table.c[entity.trigram]))
+    if entity.fragment:
+        conditions.append(table.c[entity.fragment].icontains(q, autoescape=True))
+    return (
+        select(literal(entity.kind).label("kind"), table.c.id, table.c[entity.label].label("title"), score.label("score"))
+        .where(or_(*conditions), *scope)
+        .order_by(score.desc(), table.c.id)
+        .limit(limit)
+    )
+
+
+# --- SQLite ---
+
+def _sqlite_ddl(entity):
+    table, fts = entity.table.name, entity.fts_table
+    columns = ", ".join(entity.document)
+    new_values = ", ".join(f"new.{c}" for c in entity.document)
+    old_values = ", ".join(f"old.{c}" for c in entity.document)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', "
+        f"content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def create_sqlite_indexes(connection):
+    for entity in ENTITIES.values():
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": entity.fts_table}
+        ).first()
+        for statement in _sqlite_ddl(entity):
+            connection.exec_driver_sql(statement)
+        if not exists:
+            # Index rows written before the FTS table existed.
+            connection.exec_driver_sql(f"INSERT INTO {entity.fts_table}({entity.fts_table}) VALUES ('rebuild')")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_sqlite_indexes(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        create_sqlite_indexes(connection)
+
+
+def _sqlite_query(entity, q: str, limit: int, scope=()):
+    table = entity.table
+    fts = table_clause(entity.fts_table, column("rowid"), column("rank"))
+    match = " ".join(f'"{t}"*' for t in _tokens(q))
+    # Rank inside FTS5 first (ORDER BY rank LIMIT n is optimised there), then join the few winners.
+    best = select(fts.c.rowid, fts.c.rank).where(literal_column(entity.fts_table).op("MATCH")(match))
+    if scope:
+        # The FTS table holds every tenant: filter before the LIMIT so other tenants cannot crowd out the hits.
+        best = best.join(table, table.c.id == fts.c.rowid).where(*scope)
+    best = best.order_by(fts.c.rank).limit(limit).subquery()
+    return (
+        select(literal(entity.kind).label("kind"), table.c.id, table.c[entity.label].label("title"), (-best.c.rank).label("score"))
+        .join_from(best, table, table.c.id == best.c.rowid)
+        .order_by(best.c.rank, table.c.id)
+    )
+
+
+# --- Search ---
+
+async def search(db, q: str, kinds=KINDS, limit: int = 20) -> list:
+    """Best ``limit`` hits across ``kinds``, highest score first."""
+    if not _tokens(q):
+        return []
+    dialect = (await db.connection()).dialect.name
+    build = _pg_query if dialect == "postgresql" else _sqlite_query
+    if dialect == "postgresql":
+        await db.execute(text(f"SET LOCAL pg_trgm.word_similarity_threshold = {TRIGRAM_THRESHOLD}"))
+    hits = []
+    for kind in kinds:
+        entity = ENTITIES[kind]
+        scope = [tenancy.criterion(entity.table.c.company_name, tenancy.tenant_of(db))] if tenancy.is_scoped(db) else []
+        rows = await db.execute(build(entity, q, limit, scope))
+        hits.extend(dict(row._mapping) for row in rows)
+    hits.sort(key=lambda hit: (-hit["score"], KINDS.index(hit["kind"]), hit["id"]))
+    return hits[:limit]
+
+
+def create_indexes(connection):
+    """Add the search indexes to an existing database."""
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for index in PG_INDEXES:
+            index.create(connection, checkfirst=True)
+    elif connection.dialect.name == "sqlite":
+        create_sqlite_indexes(connection)
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    with engine.begin() as connection:
+        create_indexes(connection)
+    print("Search indexes created.")
@@ -0,0 +1,127 @@
+"""Fast JSON rendering and sparse fieldsets (``fields=`` / ``expand=``).
+
+Endpoints with a ``response_model`` are already serialized straight to bytes
+by Pydantic's core, which beats any dict-based encoder, so they keep the
+default response class. Responses this app builds as plain dicts (sparse
+fieldsets, the reference cache) are rendered with orjson when it is
+installed, falling back to the standard library.
+
+Sparse fieldsets let a list endpoint load and render only what the client
+asks for: ``fields=id,title,stage`` limits the columns (``load_only``),
+``expand=technician`` adds a nested object (joined in the same query), and
+``fields=technician.username`` narrows a nested object and implies its
+expansion. Without either parameter the endpoint's full schema is served
+unchanged.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import joinedload, load_only, raiseload
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        # OPT_UTC_Z: "...Z" like Pydantic renders aware UTC datetimes.
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with ``dumps`` (orjson when available)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+@dataclass
+class FieldSpec:
+    """What a list endpoint can render: its schema's columns plus expandable relationships."""
+    model: type
+    schema: type
+    expandable: dict = field(default_factory=dict)  # name -> (relationship attribute, nested FieldSpec)
+
+    @property
+    def columns(self) -> list:
+        return [name for name in self.schema.model_fields if name not in self.expandable]
+
+
+@dataclass
+class Selection:
+    columns: list
+    expand: dict  # name -> nested Selection
+
+    @property
+    def key(self) -> tuple:
+        return tuple(self.columns), tuple((name, nested.key) for name, nested in sorted(self.expand.items()))
+
+
+def _split(value: Optional[str]) -> list:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def parse(spec: FieldSpec, fields: Optional[str], expand: Optional[str]) -> Optional[Selection]:
+    """The requested Selection, or None when the client asked for the full default representation."""
+    requested, expanded = _split(fields), _split(expand)
+    if not requested and not expanded:
+        return None
+
+    columns, nested_fields = [], {}
+    for name in requested:
+        head, _, rest = name.partition(".")
+        if head in spec.expandable:
+            nested_fields.setdefault(head, [])
+            if rest:
+                nested_fields[head].append(rest)
+        elif name in spec.columns:
+            columns.append(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{name}'")
+    for name in expanded:
+        if name not in spec.expandable:
+            raise HTTPException(status_code=400, detail=f"Cannot expand '{name}'")
+        nested_fields.setdefault(name, [])
+
+    if not requested:
+        columns = list(spec.columns)
+    if "id" not in columns:
+        columns.insert(0, "id")  # keyset pagination and clients both need it
+
+    nested = {}
+    for name, names in nested_fields.items():
+        nested_spec = spec.expandable[name][1]
+        nested[name] = parse(nested_spec, ",".join(names), None) if names else Selection(list(nested_spec.columns), {})
+    return Selection(columns, nested)
+
+
+def loader_options(spec: FieldSpec, selection: Selection, pagination_columns=()) -> tuple:
+    """load_only the selected columns (plus pagination keys), join only the expanded relationships."""
+    load = set(selection.columns) | {c.key for c in pagination_columns}
+    options = [load_only(*(getattr(spec.model, name) for name in sorted(load)))]
+    for name, nested in selection.expand.items():
+        relationship, nested_spec = spec.expandable[name]
+        options.append(joinedload(relationship).load_only(*(getattr(nested_spec.model, c) for c in nested.columns)))
+    options.append(raiseload("*"))
+    return tuple(options)
+
+
+def render(obj, selection: Selection) -> dict:
+    out = {name: getattr(obj, name) for name in selection.columns}
+    for name, nested in selection.expand.items():
+        value = getattr(obj, name)
+        out[name] = render(value, nested) if value is not None else None
+    return out
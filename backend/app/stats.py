@@ -0,0 +1,141 @@
+"""Dashboard counters maintained in the same transaction as the writes.
+
+An ``after_flush`` hook turns inserted/deleted rows and changes to
+``Equipment.status``, ``User.role`` and ``MaintenanceRequest.stage`` into
+per-key deltas and upserts them into ``stat_counters``, so ``/reports/stats``
+reads a handful of rows instead of counting tables. Writes that bypass the
+ORM unit of work (bulk Core statements) must call :func:`apply_deltas`
+themselves. :func:`reconcile` recomputes everything from the source tables
+and runs at startup and periodically to repair any drift; it corrects by
+delta, so writes committed while it runs are kept.
+
+Counters are kept per tenant (``company_name``, see tenancy.py); the
+unnamed tenant keeps the plain ``prefix:value`` names.
+"""
+from collections import Counter
+
+from sqlalchemy import String, cast, event, func, inspect, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+# model -> (counter prefix, tracked attribute, value used when the attribute is unset)
+TRACKED = {
+    models.Equipment: ("equipment_status", "status", models.EquipmentStatus.ACTIVE),
+    models.User: ("user_role", "role", models.UserRole.EMPLOYEE),
+    models.MaintenanceRequest: ("request_stage", "stage", models.RequestStage.NEW),
+}
+
+
+def counter_name(prefix: str, value, tenant=None) -> str:
+    name = f"{prefix}:{getattr(value, 'value', value)}"
+    return name if tenant is None else f"{name}@{tenant}"
+
+
+def _current(obj, attr, default):
+    value = getattr(obj, attr)
+    return default if value is None else value
+
+
+def _old(obj, attr, current):
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else current
+
+
+def collect_deltas(session: Session) -> Counter:
+    deltas = Counter()
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            prefix, attr, default = tracked
+            deltas[counter_name(prefix, _current(obj, attr, default), obj.company_name)] += 1
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            prefix, attr, default = tracked
+            old = _old(obj, attr, _current(obj, attr, default))
+            deltas[counter_name(prefix, old, _old(obj, "company_name", obj.company_name))] -= 1
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if tracked and obj not in session.deleted:
+            # A change of the tracked value or of the tenant moves the row between counters.
+            prefix, attr, default = tracked
+            new = (_current(obj, attr, default), obj.company_name)
+            old = (_old(obj, attr, new[0]), _old(obj, "company_name", new[1]))
+            if old != new:
+                deltas[counter_name(prefix, *old)] -= 1
+                deltas[counter_name(prefix, *new)] += 1
+    return deltas
+
+
+def _upsert(connection, rows):
+    table = models.StatCounter.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table)
+        value = table.c.value + stmt.excluded.value
+        connection.execute(stmt.on_conflict_do_update(index_elements=[table.c.name], set_={"value": value}), rows)
+        return
+    for row in rows:
+        stmt = update(table).where(table.c.name == row["name"]).values(value=table.c.value + row["value"])
+        if connection.execute(stmt).rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def apply_deltas(connection, deltas):
+    rows = [{"name": name, "value": delta} for name, delta in sorted(deltas.items()) if delta]
+    if rows:
+        _upsert(connection, rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_counters(session, flush_context):
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+async def read_counters(db, names) -> dict:
+    rows = await db.execute(
+        select(models.StatCounter.name, models.StatCounter.value).where(models.StatCounter.name.in_(list(names)))
+    )
+    return dict(rows.all())
+
+
+def _recount(connection) -> tuple:
+    """(true counts, stored counter values), read in one statement so both come from the same snapshot."""
+    table = models.StatCounter.__table__
+    parts = [select(literal(None, String), table.c.name, literal(None, String), table.c.value)]
+    for model, (prefix, attr, _) in TRACKED.items():
+        column = getattr(model, attr)
+        parts.append(
+            select(literal(prefix), cast(column, String), model.company_name, func.count())
+            .group_by(column, model.company_name)
+        )
+    stored, counted = {}, {}
+    for prefix, value, tenant, count in connection.execute(union_all(*parts)):
+        if prefix is None:
+            stored[value] = count
+        elif value is not None:
+            counted[counter_name(prefix, value, tenant)] = count
+    # Existing counters with no rows left (e.g. a tenant's last SCRAP unit) go back to 0.
+    return {**dict.fromkeys(stored, 0), **counted}, stored
+
+
+def _correct(connection) -> dict:
+    counts, stored = _recount(connection)
+    # Add the drift instead of overwriting: a delta committed after the snapshot
+    # is already in the stored value the increment lands on, and stays there.
+    apply_deltas(connection, {name: count - stored.get(name, 0) for name, count in counts.items()})
+    return counts
+
+
+async def reconcile(session_factory):
+    """Recompute every counter from the source tables and correct the drifted ones."""
+    async with session_factory() as db:
+        connection = await db.connection()
+        counts = await connection.run_sync(_correct)
+        await db.commit()
+    return counts
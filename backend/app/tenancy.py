@@ -0,0 +1,75 @@
+"""Tenant scoping by ``company_name``.
+
+Several companies share one deployment. Teams, users, equipment, work
+centers, requests (hot and archived), their change log and plans carry the
+owning company in ``company_name`` (NULL is the default, unnamed tenant); categories are shared.
+
+A session becomes tenant-scoped with :func:`bind` (done per request by
+``auth.bind_tenant``). From then on every ORM SELECT / UPDATE / DELETE it
+runs gets ``company_name = <tenant>`` added for each tenant-owned entity,
+wherever it appears (FROM, joins, subqueries, relationship loads), and new
+objects are stamped with the tenant on flush. Sessions that were never
+bound (background jobs, scripts) see every tenant.
+
+Core statements against ``Model.__table__`` are not ORM statements and are
+not rewritten; they must add :func:`criterion` themselves. Tenant-leading
+indexes on the big tables keep a tenant's queries proportional to its own
+size.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from . import models
+
+TENANT_MODELS = (
+    models.Team,
+    models.User,
+    models.Equipment,
+    models.WorkCenter,
+    models.MaintenanceRequest,
+    models.ArchivedMaintenanceRequest,
+    models.MaintenancePlan,
+    models.RequestEvent,
+)
+
+
+def bind(session, tenant):
+    """Scope ``session`` (sync or async) to ``tenant`` (a company name, or None)."""
+    session.info["tenant"] = tenant
+
+
+def is_scoped(session) -> bool:
+    return "tenant" in session.info
+
+
+def tenant_of(session):
+    return session.info.get("tenant")
+
+
+def criterion(column, tenant):
+    """``column`` matches ``tenant``; NULL is a tenant of its own."""
+    return column.is_(None) if tenant is None else column == tenant
+
+
+def _loader_criteria(tenant):
+    if tenant is None:
+        return [with_loader_criteria(m, lambda cls: cls.company_name.is_(None), include_aliases=True) for m in TENANT_MODELS]
+    return [with_loader_criteria(m, lambda cls: cls.company_name == tenant, include_aliases=True) for m in TENANT_MODELS]
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_statement(execute_state):
+    if not is_scoped(execute_state.session):
+        return
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        execute_state.statement = execute_state.statement.options(*_loader_criteria(tenant_of(execute_state.session)))
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_new_objects(session, flush_context, instances):
+    if not is_scoped(session):
+        return
+    tenant = tenant_of(session)
+    for obj in session.new:
+        if isinstance(obj, TENANT_MODELS) and obj.company_name is None:
+            obj.company_name = tenant
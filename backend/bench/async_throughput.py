@@ -0,0 +1,115 @@
+"""Sync vs async database path throughput.
+
+Mounts two copies of the request listing query on a throwaway app - one as a
+sync ``def`` route on SessionLocal (runs on the Starlette threadpool), one as
+an ``async def`` route on AsyncSessionLocal - and drives each with the same
+number of concurrent clients.
+
+    cd backend && python -m bench.async_throughput --clients 500 --requests 5000
+
+Uses DATABASE_URL when set (e.g. a local PostgreSQL), otherwise a temporary
+SQLite database via aiosqlite.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gearguard-async-'), 'bench.db')}"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import database, models  # noqa: E402
+from app.routers.requests import REQUEST_OUT_OPTIONS  # noqa: E402
+
+PAGE = 20
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    def query():
+        return select(models.MaintenanceRequest).options(*REQUEST_OUT_OPTIONS).order_by(
+            models.MaintenanceRequest.created_at, models.MaintenanceRequest.id
+        ).limit(PAGE)
+
+    @app.get("/sync")
+    def sync_route(db: Session = Depends(database.get_sync_db)):
+        return len(db.scalars(query()).unique().all())
+
+    @app.get("/async")
+    async def async_route(db: AsyncSession = Depends(database.get_db)):
+        return len((await db.scalars(query())).unique().all())
+
+    return app
+
+
+def seed(rows: int = 200):
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    if db.scalar(select(models.MaintenanceRequest.id).limit(1)) is None:
+        db.add(models.User(username="bench", email="bench@example.com", password_hash="x"))
+        db.flush()
+        for i in range(rows):
+            db.add(models.MaintenanceRequest(
+                title=f"Request {i}", description="", request_type=models.RequestType.CORRECTIVE,
+                reporter_id=1, technician_id=1,
+            ))
+        db.commit()
+    db.close()
+
+
+async def drive(app: FastAPI, path: str, clients: int, total: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(total))
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main(clients: int, total: int):
+    seed()
+    app = build_app()
+    print(f"{clients} concurrent clients, {total} requests each run ({database.engine.url.get_backend_name()})")
+    for label, path in (("sync", "/sync"), ("async", "/async")):
+        result = await drive(app, path, clients, total)
+        print(
+            f"{label:6} {result['throughput']:8.1f} req/s   p50 {result['p50_ms']:7.1f} ms   "
+            f"p99 {result['p99_ms']:7.1f} ms   errors {result['errors']}"
+        )
+    await database.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests))
@@ -0,0 +1,118 @@
+"""Auto-dispatch simulation.
+
+Replays a random stream of request arrivals (random priority and default
+technician) and completions against ``dispatch.LoadBoard`` and against a
+naive dispatcher that scans every technician of the team (what a COUNT per
+technician amounts to), then reports decision throughput and how evenly the
+load ends up spread.
+
+    cd backend && python -m bench.dispatch_sim --teams 20 --technicians 50 --events 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gearguard-dispatch-'), 'sim.db')}")
+
+from app import dispatch, models  # noqa: E402
+
+PRIORITIES = list(dispatch.PRIORITY_WEIGHTS)
+PRIORITY_MIX = [40, 35, 20, 5]  # LOW, MEDIUM, HIGH, CRITICAL
+
+
+class NaiveDispatcher:
+    """Same policy as LoadBoard.choose, by scanning the team on every decision."""
+
+    def __init__(self, teams):
+        self.teams = teams
+        self.loads = {t: 0.0 for members in teams.values() for t in members}
+
+    def choose(self, team_id, priority, preferred):
+        best = min(self.teams[team_id], key=lambda t: (self.loads[t], t))
+        slack = 0 if priority == models.RequestPriority.CRITICAL else dispatch.DISPATCH_DEFAULT_TECH_SLACK
+        if preferred is not None and self.loads[preferred] - self.loads[best] <= slack:
+            return preferred
+        return best
+
+    def add(self, technician_id, delta):
+        self.loads[technician_id] += delta
+
+
+def workload(teams, events, seed):
+    rng = random.Random(seed)
+    team_ids = list(teams)
+    stream = []
+    open_count = 0
+    for _ in range(events):
+        # Keep roughly 10 open requests per technician once warmed up.
+        if open_count and rng.random() < min(0.5, open_count / (10 * len(team_ids) * len(teams[team_ids[0]]))):
+            stream.append(("complete", rng.random()))
+            open_count -= 1
+        else:
+            team_id = rng.choice(team_ids)
+            preferred = rng.choice(teams[team_id]) if rng.random() < 0.7 else None
+            stream.append(("create", team_id, rng.choices(PRIORITIES, PRIORITY_MIX)[0], preferred))
+            open_count += 1
+    return stream
+
+
+def run(dispatcher, stream):
+    open_requests = []
+    decisions = defaults = 0
+    started = time.perf_counter()
+    for item in stream:
+        if item[0] == "create":
+            _, team_id, priority, preferred = item
+            choice = dispatcher.choose(team_id, priority, preferred)
+            if isinstance(choice, tuple):
+                choice = choice[0]
+            dispatcher.add(choice, dispatch.weight(priority))
+            open_requests.append((choice, dispatch.weight(priority)))
+            decisions += 1
+            defaults += choice == preferred
+        else:
+            index = int(item[1] * len(open_requests))
+            open_requests[index], open_requests[-1] = open_requests[-1], open_requests[index]
+            technician_id, amount = open_requests.pop()
+            dispatcher.add(technician_id, -amount)
+    elapsed = time.perf_counter() - started
+    loads = list(dispatcher.loads.values())
+    return {
+        "decisions/s": decisions / elapsed,
+        "default tech %": 100.0 * defaults / max(decisions, 1),
+        "load spread": max(loads) - min(loads),
+        "load stdev": statistics.pstdev(loads),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--technicians", type=int, default=50, help="per team")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    teams = {
+        team_id: [team_id * args.technicians + i for i in range(args.technicians)]
+        for team_id in range(1, args.teams + 1)
+    }
+    stream = workload(teams, args.events, args.seed)
+
+    board = dispatch.LoadBoard()
+    for team_id, members in teams.items():
+        board.set_team(team_id, {t: 0.0 for t in members})
+    results = {"heap (LoadBoard)": run(board, stream), "naive scan": run(NaiveDispatcher(teams), stream)}
+
+    print(f"{'dispatcher':<18}{'decisions/s':>14}{'default tech %':>16}{'load spread':>13}{'load stdev':>12}")
+    for name, r in results.items():
+        print(f"{name:<18}{r['decisions/s']:>14,.0f}{r['default tech %']:>16.1f}{r['load spread']:>13.1f}{r['load stdev']:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
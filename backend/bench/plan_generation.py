@@ -0,0 +1,84 @@
+"""Preventive-plan generation benchmark.
+
+Seeds a throwaway SQLite database with ``--assets`` equipment in one
+category, adds a weekly plan for the category and a monthly cron plan per
+``--per-asset-plans`` assets, then times generating a quarter ahead and a
+second, idempotent run (which must create nothing).
+
+    cd backend && python -m bench.plan_generation --assets 50000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="gearguard-plans-"), "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import models, plans  # noqa: E402
+from app.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+
+
+def seed(assets: int, per_asset_plans: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(models.Team(name="Team"))
+    db.add(models.Category(name="Category"))
+    db.add(models.User(username="planner", email="planner@example.com", password_hash="x", role=models.UserRole.MANAGER))
+    db.flush()
+    db.execute(insert(models.Equipment), [
+        {
+            "name": f"Equipment {i}", "serial_number": f"SN-{i}", "department": "Plant", "category_id": 1,
+            "default_team_id": 1, "default_technician_id": 1, "status": models.EquipmentStatus.ACTIVE,
+        }
+        for i in range(assets)
+    ])
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    db.add(models.MaintenancePlan(
+        name="Weekly inspection", category_id=1, interval_days=7, starts_at=start, created_by_id=1, active=True,
+    ))
+    for i in range(per_asset_plans):
+        db.add(models.MaintenancePlan(
+            name=f"Monthly service {i}", equipment_id=i + 1, cron="0 6 1 * *", starts_at=start,
+            created_by_id=1, active=True,
+        ))
+    db.commit()
+    db.close()
+
+
+async def generate(horizon_days: int):
+    scheduler = plans.PlanScheduler()
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await scheduler.load(db)
+        created = await scheduler.run_due(db, horizon_days=horizon_days)
+    elapsed = time.perf_counter() - started
+    return created, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, default=50000)
+    parser.add_argument("--per-asset-plans", type=int, default=1000)
+    parser.add_argument("--horizon-days", type=int, default=90)
+    args = parser.parse_args(argv)
+
+    seed(args.assets, args.per_asset_plans)
+    created, elapsed = await_(generate(args.horizon_days))
+    print(f"first run:  {created:>9} requests in {elapsed:6.2f}s ({created / elapsed:,.0f} rows/s)")
+    again, elapsed = await_(generate(args.horizon_days))
+    print(f"second run: {again:>9} requests in {elapsed:6.2f}s (idempotent)")
+    return 1 if again else 0
+
+
+def await_(coro):
+    return asyncio.run(coro)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Query-count regression harness.
+
+Seeds a throwaway SQLite database, calls every list/detail endpoint at two
+page sizes and fails when the number of SQL statements an endpoint issues
+grows with the page size (i.e. an N+1 lazy load crept in).
+
+    cd backend && python -m bench.query_counts
+"""
+import os
+import sys
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="gearguard-qc-"), "qc.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models, utils  # noqa: E402
+from app.database import Base, SessionLocal, count_queries, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+ROWS = 60
+SMALL, LARGE = 5, 50
+
+# (label, path, params) - list endpoints get ?limit= appended.
+LIST_ENDPOINTS = [
+    ("requests", "/requests/", {}),
+    ("requests by technician", "/requests/", {"technician_id": 2}),
+    ("equipment", "/equipment/", {}),
+    ("users", "/users/", {}),
+    ("work centers", "/work-centers/", {}),
+    ("teams", "/teams/", {}),
+    ("categories", "/categories/", {}),
+]
+DETAIL_ENDPOINTS = [
+    ("request detail", "/requests/1", {}),
+    ("equipment detail", "/equipment/1", {}),
+    ("work center detail", "/work-centers/1", {}),
+    ("calendar", "/requests/calendar", {"start_date": "2000-01-01", "end_date": "2100-01-01"}),
+    ("request history", "/requests/history", {}),
+    ("stats", "/reports/stats", {}),
+    ("bootstrap (cold cache)", "/bootstrap/", {}),
+    ("requests by ids", "/requests/", {"ids": ",".join(str(i) for i in range(1, LARGE + 1))}),
+    ("equipment by ids", "/equipment/", {"ids": ",".join(str(i) for i in range(1, LARGE + 1))}),
+    ("users by ids", "/users/", {"ids": ",".join(str(i) for i in range(1, LARGE + 1))}),
+]
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    password = utils.get_password_hash("password")
+    db.add(models.Team(name="Team"))
+    db.add(models.Category(name="Category"))
+    db.flush()
+    for i in range(ROWS):
+        db.add(models.User(
+            username=f"user{i}", email=f"user{i}@example.com", password_hash=password,
+            role=models.UserRole.TECHNICIAN if i % 2 else models.UserRole.EMPLOYEE, team_id=1,
+        ))
+    db.flush()
+    for i in range(ROWS):
+        db.add(models.Equipment(
+            name=f"Equipment {i}", serial_number=f"SN-{i}", department="Plant", category_id=1,
+            default_team_id=1, default_technician_id=(i % ROWS) + 1,
+        ))
+        db.add(models.WorkCenter(name=f"Work Center {i}", code=f"WC-{i}", department="Plant"))
+    db.flush()
+    for i in range(ROWS):
+        db.add(models.MaintenanceRequest(
+            title=f"Request {i}", description="", request_type=models.RequestType.CORRECTIVE,
+            equipment_id=(i % ROWS) + 1, team_id=1, reporter_id=(i % ROWS) + 1, technician_id=(i % ROWS) + 1,
+        ))
+    db.commit()
+    db.close()
+
+
+def measure(client, path, params):
+    with count_queries() as counter:
+        response = client.get(path, params=params)
+    if response.status_code != 200:
+        raise AssertionError(f"GET {path} returned {response.status_code}: {response.text}")
+    return counter.count
+
+
+def warm_up(client, attempts=10):
+    # The first calls pay one-off queries (the principal cache fill, startup jobs such as
+    # the stats reconcile running alongside them); keep those out of the measurements so
+    # they do not depend on call order.
+    previous = None
+    for _ in range(attempts):
+        count = measure(client, "/requests/", {"limit": SMALL})
+        if count == previous:
+            return
+        previous = count
+
+
+def main():
+    seed()
+    failures = []
+    print(f"{'endpoint':28} {'limit=' + str(SMALL):>10} {'limit=' + str(LARGE):>10}")
+    with TestClient(app) as client:
+        client.headers["Authorization"] = f"Bearer {utils.create_access_token({'sub': 'user0'})}"
+        warm_up(client)
+        for label, path, params in LIST_ENDPOINTS:
+            small = measure(client, path, {**params, "limit": SMALL})
+            large = measure(client, path, {**params, "limit": LARGE})
+            print(f"{label:28} {small:>10} {large:>10}")
+            if large > small:
+                failures.append(label)
+        for label, path, params in DETAIL_ENDPOINTS:
+            print(f"{label:28} {measure(client, path, params):>10}")
+    if failures:
+        print(f"Query count grows with page size: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
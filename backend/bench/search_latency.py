@@ -0,0 +1,102 @@
+"""Search latency benchmark.
+
+Seeds a throwaway database (SQLite FTS5 by default; point DATABASE_URL at a
+scratch PostgreSQL database to measure the tsvector/pg_trgm path) with
+``--rows`` requests and times ``search.search`` for prefix, multi-word,
+serial-fragment and (PostgreSQL only) misspelled queries.
+
+    cd backend && python -m bench.search_latency --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gearguard-search-'), 'search.db')}")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import models, search  # noqa: E402
+from app.database import AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+
+DOMAIN_WORDS = (
+    "hydraulic pump press conveyor belt motor bearing leak noise overheating vibration spindle lathe "
+    "compressor valve filter coolant sensor calibration alignment gearbox seal pressure drive robot"
+).split()
+# Filler vocabulary so domain words have realistic selectivity (a few % of rows, not a third).
+SYLLABLES = "ka lo mi ne ru sa ti vo ze ba de fi go hu ja".split()
+FILLER = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES][:3000]
+WORDS = DOMAIN_WORDS + FILLER
+QUERIES = ["hydr", "pump leak", "conv belt", "SN-0042", "calibr sensor", "overheat", "spindle"]
+TYPO_QUERIES = ["hydrualic", "compresor", "gerabox"]
+
+
+def seed(rows: int, equipment: int):
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(3)
+    db = SessionLocal()
+    db.add(models.Team(name="Team"))
+    db.add(models.User(username="reporter", email="r@example.com", password_hash="x"))
+    db.flush()
+    db.execute(insert(models.Equipment), [
+        {"name": f"{rng.choice(DOMAIN_WORDS).title()} {i}", "serial_number": f"SN-{i:06d}", "department": "Plant",
+         "default_team_id": 1, "default_technician_id": 1, "status": models.EquipmentStatus.ACTIVE}
+        for i in range(equipment)
+    ])
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "title": " ".join([rng.choice(DOMAIN_WORDS)] + rng.sample(FILLER, 2)),
+            "description": " ".join(rng.sample(DOMAIN_WORDS, 2) + rng.sample(FILLER, 6)),
+            "request_type": models.RequestType.CORRECTIVE, "priority": models.RequestPriority.MEDIUM,
+            "stage": models.RequestStage.NEW, "equipment_id": rng.randint(1, equipment), "reporter_id": 1,
+        })
+        if len(batch) == 20000:
+            db.execute(insert(models.MaintenanceRequest), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.MaintenanceRequest), batch)
+    db.commit()
+    db.close()
+
+
+async def measure(queries, repeat: int):
+    timings = {}
+    async with AsyncSessionLocal() as db:
+        for q in queries:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                hits = await search.search(db, q)
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[q] = (statistics.median(samples), max(samples), len(hits))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--equipment", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=50)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    seed(args.rows, args.equipment)
+    print(f"seeded {args.rows} requests in {time.perf_counter() - started:.1f}s")
+    queries = QUERIES + (TYPO_QUERIES if engine.dialect.name == "postgresql" else [])
+    timings = asyncio.run(measure(queries, args.repeat))
+    slow = 0
+    print(f"{'query':<16}{'p50 ms':>9}{'max ms':>9}{'hits':>6}")
+    for q, (p50, worst, hits) in timings.items():
+        slow += p50 > args.target_ms
+        print(f"{q:<16}{p50:>9.1f}{worst:>9.1f}{hits:>6}")
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
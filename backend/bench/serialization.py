@@ -0,0 +1,98 @@
+"""Serialization benchmark: bytes and CPU per list page.
+
+Renders one page of ``--limit`` requests (reporter and technician loaded,
+like GET /requests/) several ways and reports the body size, gzip/brotli
+size and CPU time per page:
+
+* full RequestOut via Pydantic (what the default endpoint does),
+* full RequestOut via jsonable_encoder + json (the pre-Pydantic-core path),
+* a sparse fieldset through ``serialization.render`` + ``dumps``
+  (orjson when installed) and the same with the stdlib fallback.
+
+    cd backend && python -m bench.serialization --limit 100
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gearguard-ser-'), 'ser.db')}")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import compression, models, schemas, serialization  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.routers.requests import REQUEST_FIELDS, REQUEST_OUT_OPTIONS  # noqa: E402
+
+SPARSE = ("id,title,stage,priority,scheduled_date,technician.username", None)
+
+
+def seed(rows: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(models.Team(name="Team"))
+    db.add_all([
+        models.User(username="reporter", email="r@example.com", password_hash="x"),
+        models.User(username="tech", email="t@example.com", password_hash="x", role=models.UserRole.TECHNICIAN, team_id=1),
+    ])
+    db.flush()
+    db.execute(insert(models.MaintenanceRequest), [
+        {"title": f"Hydraulic pump leak on line {i % 40}", "description": "Operator reports a slow leak near the seal. " * 3,
+         "request_type": models.RequestType.CORRECTIVE, "priority": models.RequestPriority.MEDIUM,
+         "stage": models.RequestStage.NEW, "team_id": 1, "technician_id": 2, "reporter_id": 1}
+        for i in range(rows)
+    ])
+    db.commit()
+    db.close()
+
+
+def cpu_per_page(fn, repeat: int) -> float:
+    fn()
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.limit)
+    db = SessionLocal()
+    full = db.scalars(select(models.MaintenanceRequest).options(*REQUEST_OUT_OPTIONS).limit(args.limit)).unique().all()
+    selection = serialization.parse(REQUEST_FIELDS, *SPARSE)
+    sparse = db.scalars(
+        select(models.MaintenanceRequest).options(*serialization.loader_options(REQUEST_FIELDS, selection)).limit(args.limit)
+    ).unique().all()
+
+    adapter = TypeAdapter(List[schemas.RequestOut])
+    stdlib = lambda content: json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()  # noqa: E731
+    cases = {
+        "full / pydantic": lambda: adapter.dump_json(adapter.validate_python(full, from_attributes=True)),
+        "full / jsonable_encoder+json": lambda: stdlib([schemas.RequestOut.model_validate(r) for r in full]),
+        "sparse / dumps": lambda: serialization.dumps([serialization.render(r, selection) for r in sparse]),
+        "sparse / json": lambda: stdlib([serialization.render(r, selection) for r in sparse]),
+    }
+
+    print(f"orjson: {'yes' if serialization.orjson else 'no'}, brotli: {'yes' if compression.brotli else 'no'}")
+    print(f"{'case':30} {'bytes':>8} {'gzip':>7} {'br':>7} {'CPU ms/page':>12}")
+    for name, fn in cases.items():
+        body = fn()
+        br = len(compression.compress(body, "br")) if compression.brotli else "-"
+        gz = len(gzip.compress(body, compresslevel=compression.COMPRESSION_GZIP_LEVEL))
+        print(f"{name:30} {len(body):>8} {gz:>7} {br:>7} {cpu_per_page(fn, args.repeat) * 1000:>12.3f}")
+    gzip_cpu = cpu_per_page(lambda: gzip.compress(cases["full / pydantic"](), compresslevel=compression.COMPRESSION_GZIP_LEVEL), args.repeat)
+    print(f"{'gzip of full page (incl. render)':30} {'':>8} {'':>7} {'':>7} {gzip_cpu * 1000:>12.3f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
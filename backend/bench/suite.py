@@ -0,0 +1,276 @@
+"""Endpoint benchmark suite with stored baselines.
+
+Fills a database with the seeded synthetic dataset (bench/synthetic.py),
+then for every endpoint in ENDPOINTS:
+
+* a sequential pass of ``--iterations`` calls gives p50 / p95 / p99 latency
+  and the mean number of SQL statements per call;
+* a concurrent pass (``--concurrency`` clients, same number of calls) gives
+  throughput in requests per second.
+
+Calls go through the real app in-process (httpx ASGI transport, no network);
+background jobs are not started so they cannot perturb the timings. Reference
+data lists are served warm from the HTTP cache, as in production.
+
+Results are compared with ``bench/baselines/<backend>.json``: an endpoint
+regresses when its p95 exceeds the baseline by more than ``--tolerance``
+(and 1 ms), or when it issues more statements. Timings only compare on the
+same machine - regenerate the baseline there first with ``--save-baseline``;
+the statement counts compare anywhere. Exits 1 on a regression.
+
+    cd backend && python -m bench.suite                                  # SQLite, 100k requests
+    python -m bench.suite --backend postgresql --requests 2000000        # BENCH_POSTGRES_URL
+    python -m bench.suite --backend all --save-baseline
+
+The SQLite database is kept in the temp directory per (requests, seed) and
+reused by later runs; PostgreSQL (``BENCH_POSTGRES_URL``, default
+postgresql://localhost/gearguard_bench - a scratch database) is filled only
+when empty. ``--regenerate`` starts both from scratch.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKENDS = ("sqlite", "postgresql")
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+POSTGRES_URL = os.getenv("BENCH_POSTGRES_URL", "postgresql://localhost/gearguard_bench")
+
+# (label, method, path, params or JSON body). "{request}", "{equipment}" and "{work_center}"
+# rotate through seeded ids so detail endpoints do not hit one hot row.
+ENDPOINTS = [
+    ("requests", "GET", "/requests/", {"limit": 50}),
+    ("requests by equipment", "GET", "/requests/", {"equipment_id": "{equipment}", "limit": 50}),
+    ("requests by technician", "GET", "/requests/", {"technician_id": 3, "limit": 50}),
+    ("requests sparse fields", "GET", "/requests/", {"fields": "id,title,stage,priority", "limit": 200}),
+    ("requests by ids", "GET", "/requests/", {"ids": "{request_ids}"}),
+    ("request detail", "GET", "/requests/{request}", {}),
+    ("request events", "GET", "/requests/{request}/events", {}),
+    ("request history", "GET", "/requests/history", {"equipment_id": "{equipment}", "limit": 50}),
+    ("calendar month", "GET", "/requests/calendar", {"start_date": "2025-11-01", "end_date": "2025-11-30"}),
+    ("export by equipment", "GET", "/requests/export", {"format": "ndjson", "equipment_id": "{equipment}"}),
+    ("equipment", "GET", "/equipment/", {"limit": 50}),
+    ("equipment detail", "GET", "/equipment/{equipment}", {}),
+    ("work centers", "GET", "/work-centers/", {"limit": 50}),
+    ("work center detail", "GET", "/work-centers/{work_center}", {}),
+    ("users", "GET", "/users/", {"limit": 50}),
+    ("teams", "GET", "/teams/", {}),
+    ("categories", "GET", "/categories/", {}),
+    ("plans", "GET", "/plans/", {}),
+    ("bootstrap", "GET", "/bootstrap/", {}),
+    ("search", "GET", "/search/", {"q": "hydraulic"}),
+    ("stats", "GET", "/reports/stats", {}),
+    ("reliability by team", "GET", "/reports/reliability", {"group_by": "team", "bucket": "month"}),
+    ("time in stage", "GET", "/reports/time-in-stage", {}),
+    ("create request", "POST", "/requests/", {
+        "title": "Bench leak", "description": "x", "request_type": "CORRECTIVE", "equipment_id": "{equipment}",
+    }),
+    ("update request", "PUT", "/requests/{request}", {"priority": "HIGH"}),
+]
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def _fill(value, ids):
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+        return ids[value[1:-1]]()
+    return value
+
+
+def _call(client, method, path, payload, ids, headers):
+    path = path.format(**{key: pick() for key, pick in ids.items() if "{" + key + "}" in path})
+    payload = {key: _fill(value, ids) for key, value in payload.items()}
+    if method == "GET":
+        return client.get(path, params=payload, headers=headers)
+    return client.request(method, path, json=payload, headers=headers)
+
+
+async def _run_endpoint(client, endpoint, ids, headers, iterations, concurrency, warmup):
+    from app.database import count_queries
+
+    label, method, path, payload = endpoint
+    for _ in range(warmup):
+        await _call(client, method, path, payload, ids, headers)
+
+    latencies = []
+    with count_queries() as counter:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = await _call(client, method, path, payload, ids, headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{label}: {method} {path} returned {response.status_code}: {response.text[:200]}")
+
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await _call(client, method, path, payload, ids, headers)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "rps": round(iterations / elapsed, 1),
+        "queries": round(counter.count / iterations, 2),
+    }
+
+
+async def _run(args, counts):
+    import httpx
+    from app.main import app
+    from bench import synthetic
+
+    rng = random.Random(args.seed)
+    ids = {
+        "request": lambda: rng.randint(1, counts["requests"]),
+        "request_ids": lambda: ",".join(str(rng.randint(1, counts["requests"])) for _ in range(50)),
+        "equipment": lambda: rng.randint(1, counts["equipment"]),
+        "work_center": lambda: rng.randint(1, counts["work_centers"]),
+    }
+    selected = [e for e in ENDPOINTS if not args.only or any(word in e[0] for word in args.only)]
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/login", data={"username": synthetic.ADMIN_USERNAME, "password": synthetic.PASSWORD})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        for endpoint in selected:
+            results[endpoint[0]] = await _run_endpoint(
+                client, endpoint, ids, headers, args.iterations, args.concurrency, args.warmup
+            )
+            print(_row(endpoint[0], results[endpoint[0]]), flush=True)
+    return results
+
+
+def _row(label, result, baseline=None):
+    line = f"{label:26} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>9.1f} {result['queries']:>8.2f}"
+    if baseline:
+        line += f" {(result['p95_ms'] / baseline['p95_ms'] - 1) * 100 if baseline['p95_ms'] else 0:>+9.0f}%"
+    return line
+
+
+def compare(results, baseline, tolerance):
+    """Labels whose p95 or statement count regressed against ``baseline``."""
+    regressions = []
+    for label, result in results.items():
+        base = baseline.get(label)
+        if base is None:
+            continue
+        slower = result["p95_ms"] > base["p95_ms"] * (1 + tolerance) and result["p95_ms"] - base["p95_ms"] > 1
+        if slower or result["queries"] > base["queries"] + 0.5:
+            regressions.append(label)
+    return regressions
+
+
+def run_backend(args) -> int:
+    """Run the suite on ``args.backend``; DATABASE_URL must point at it before the app is imported."""
+    from app.database import engine
+    from bench import synthetic
+
+    if not synthetic.is_populated(engine):
+        print(f"Generating {args.requests:,} requests (seed {args.seed})...", flush=True)
+        synthetic.generate(engine, args.requests, args.seed)
+    counts = {**synthetic.sizes(args.requests), "requests": args.requests}
+    meta = {
+        "backend": args.backend, "requests": args.requests, "seed": args.seed,
+        "iterations": args.iterations, "concurrency": args.concurrency,
+    }
+
+    path = os.path.join(BASELINE_DIR, f"{args.backend}.json")
+    baseline = None
+    if os.path.exists(path) and not args.save_baseline:
+        with open(path) as f:
+            stored = json.load(f)
+        if stored["meta"] == meta:
+            baseline = stored["endpoints"]
+        else:
+            print(f"Baseline {path} was recorded with {stored['meta']}; not comparing.")
+
+    print(f"{'endpoint':26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8}")
+    results = asyncio.run(_run(args, counts))
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"meta": meta, "endpoints": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {path}")
+        return 0
+    if baseline is None:
+        return 0
+    print(f"\n{'vs baseline':26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8} {'p95':>10}")
+    for label, result in results.items():
+        if label in baseline:
+            print(_row(label, result, baseline[label]))
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"Regressed: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def _database_url(args) -> str:
+    if args.backend == "postgresql":
+        return POSTGRES_URL
+    path = os.path.join(tempfile.gettempdir(), f"gearguard-bench-{args.requests}-{args.seed}.db")
+    if args.regenerate and os.path.exists(path):
+        os.remove(path)
+    return f"sqlite:///{path}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="sqlite")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown (0.25 = 25%%)")
+    parser.add_argument("--only", nargs="*", help="run endpoints whose label contains any of these words")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the dataset from scratch")
+    args = parser.parse_args()
+
+    if args.backend == "all":
+        # One process per backend: the app binds its engines to DATABASE_URL at import time.
+        status = 0
+        argv, skip = [], False
+        for arg in sys.argv[1:]:
+            if skip or arg.startswith("--backend="):
+                skip = False
+                continue
+            if arg == "--backend":
+                skip = True
+                continue
+            argv.append(arg)
+        for backend in BACKENDS:
+            print(f"== {backend} ==", flush=True)
+            status |= subprocess.call([sys.executable, "-m", "bench.suite", "--backend", backend, *argv])
+        return status
+
+    os.environ["DATABASE_URL"] = _database_url(args)
+    if args.backend == "postgresql" and args.regenerate:
+        from app.database import Base, engine
+
+        Base.metadata.drop_all(bind=engine)
+    return run_backend(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""Seeded synthetic dataset: users, teams, categories, equipment, work centers, requests.
+
+The same ``--seed`` and ``--requests`` always produce the same rows (all
+timestamps hang off a fixed ``--anchor`` date, not the clock), so benchmark
+runs on different machines or commits are comparable. Sizes of the other
+tables scale with the number of requests. Rows go in with batched Core
+inserts, so millions of requests take minutes, not hours; the dashboard
+counters and reliability rollups are rebuilt afterwards.
+
+Distributions:
+
+* stage depends on age: fresh requests are mostly NEW / IN_PROGRESS, old
+  ones almost all REPAIRED (a few SCRAP) - the shape of a real history
+  (the time-in-stage rollups are filled to match);
+* priority LOW 25% / MEDIUM 50% / HIGH 20% / CRITICAL 5%;
+* 75% CORRECTIVE, 25% PREVENTIVE (with a scheduled date);
+* 90% target equipment, skewed so a few machines get most of the work,
+  10% a work center;
+* repair and wait times are log-normal.
+
+Everybody's password is ``password``; ``bench_admin`` is an ADMIN.
+
+    cd backend && DATABASE_URL=postgresql://localhost/gearguard_bench python -m bench.synthetic --requests 2000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+if __name__ == "__main__" and not os.getenv("DATABASE_URL"):
+    sys.exit("Set DATABASE_URL to the scratch database to fill.")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import models, reliability, search, stats, utils  # noqa: E402,F401  (search registers the FTS indexes)
+from app.database import AsyncSessionLocal, Base  # noqa: E402
+
+DEFAULT_ANCHOR = datetime(2026, 1, 1)
+PASSWORD = "password"
+ADMIN_USERNAME = "bench_admin"
+
+CATEGORIES = (
+    "CNC Machines", "Presses", "Conveyors", "Compressors", "Pumps", "Robots", "HVAC", "Forklifts",
+    "Generators", "Boilers", "Welding", "Packaging",
+)
+DEPARTMENTS = ("Production", "Assembly", "Logistics", "Utilities", "Quality", "Packaging")
+FAULTS = (
+    "Hydraulic leak", "Bearing noise", "Overheating", "Belt slipping", "Sensor fault", "Vibration",
+    "Pressure drop", "Motor tripping", "Coolant leak", "Misalignment", "Seal failure", "Calibration drift",
+)
+PRIORITIES = (
+    (models.RequestPriority.LOW, 25), (models.RequestPriority.MEDIUM, 50),
+    (models.RequestPriority.HIGH, 20), (models.RequestPriority.CRITICAL, 5),
+)
+# (max age in days, stage weights NEW / IN_PROGRESS / REPAIRED / SCRAP)
+STAGES_BY_AGE = (
+    (7, (50, 35, 13, 2)),
+    (30, (15, 25, 57, 3)),
+    (None, (2, 3, 90, 5)),
+)
+STAGES = (models.RequestStage.NEW, models.RequestStage.IN_PROGRESS, models.RequestStage.REPAIRED, models.RequestStage.SCRAP)
+
+
+def sizes(requests: int) -> dict:
+    """Row counts of the other tables for a dataset of ``requests`` requests."""
+    teams = min(max(3, requests // 50_000), 50)
+    return {
+        "teams": teams,
+        "technicians_per_team": 8,
+        "employees": min(max(20, requests // 2_000), 2_000),
+        "equipment": max(50, requests // 100),
+        "work_centers": max(10, requests // 5_000),
+    }
+
+
+def _pick(rng, weighted):
+    return rng.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+def _stage(rng, age_days: float):
+    for max_age, weights in STAGES_BY_AGE:
+        if max_age is None or age_days <= max_age:
+            return rng.choices(STAGES, weights)[0]
+
+
+def _insert(connection, table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        connection.execute(insert(table), rows[start:start + batch_size])
+
+
+def _reference_rows(rng, counts, anchor):
+    password_hash = utils.get_password_hash(PASSWORD)
+    # Ids are implied by position: the tables start empty, so row n gets id n on every backend.
+    teams = [{"name": f"Team {i + 1}"} for i in range(counts["teams"])]
+    categories = [{"name": name} for name in CATEGORIES]
+    users = [{
+        "username": ADMIN_USERNAME, "email": "admin@bench.example", "password_hash": password_hash,
+        "role": models.UserRole.ADMIN, "team_id": None,
+    }]
+    technicians = {}  # team_id -> [user id]
+    for team_id in range(1, counts["teams"] + 1):
+        users.append({
+            "username": f"manager{team_id}", "email": f"manager{team_id}@bench.example",
+            "password_hash": password_hash, "role": models.UserRole.MANAGER, "team_id": team_id,
+        })
+        for _ in range(counts["technicians_per_team"]):
+            id = len(users) + 1
+            users.append({
+                "username": f"tech{id}", "email": f"tech{id}@bench.example", "password_hash": password_hash,
+                "role": models.UserRole.TECHNICIAN, "team_id": team_id,
+            })
+            technicians.setdefault(team_id, []).append(id)
+    employees = []
+    for _ in range(counts["employees"]):
+        id = len(users) + 1
+        users.append({
+            "username": f"employee{id}", "email": f"employee{id}@bench.example", "password_hash": password_hash,
+            "role": models.UserRole.EMPLOYEE, "team_id": None,
+        })
+        employees.append(id)
+
+    equipment = []
+    for i in range(counts["equipment"]):
+        team_id = rng.randint(1, counts["teams"])
+        category_id = rng.randint(1, len(CATEGORIES))
+        equipment.append({
+            "name": f"{CATEGORIES[category_id - 1].rstrip('s')} {i + 1:06d}", "serial_number": f"SN-{i + 1:08d}",
+            "department": rng.choice(DEPARTMENTS), "location": f"Hall {rng.randint(1, 12)}",
+            "category_id": category_id, "default_team_id": team_id,
+            "default_technician_id": rng.choice(technicians[team_id]),
+            "status": models.EquipmentStatus.ACTIVE,
+        })
+    work_centers = [{
+        "name": f"Work Center {i + 1}", "code": f"WC-{i + 1:05d}", "department": rng.choice(DEPARTMENTS),
+    } for i in range(counts["work_centers"])]
+    return teams, categories, users, technicians, employees, equipment, work_centers
+
+
+def _request_rows(rng, count, anchor, days, equipment, work_centers, technicians, employees):
+    span = days * 86_400
+    for _ in range(count):
+        created = anchor - timedelta(seconds=span * rng.random())
+        age_days = (anchor - created).total_seconds() / 86_400
+        stage = _stage(rng, age_days)
+        request_type = models.RequestType.CORRECTIVE if rng.random() < 0.75 else models.RequestType.PREVENTIVE
+        if rng.random() < 0.9:
+            # Squaring skews the draw towards low ids: a few machines get most of the work.
+            index = int(len(equipment) * rng.random() ** 2)
+            equipment_id, work_center_id, team_id = index + 1, None, equipment[index]["default_team_id"]
+        else:
+            equipment_id, work_center_id, team_id = None, rng.randint(1, len(work_centers)), rng.randint(1, len(technicians))
+        assigned = stage != models.RequestStage.NEW or rng.random() < 0.6
+        started = completed = duration = None
+        if stage in (models.RequestStage.IN_PROGRESS, models.RequestStage.REPAIRED):
+            started = min(created + timedelta(hours=rng.lognormvariate(1.5, 1.0)), anchor)
+        if stage == models.RequestStage.REPAIRED:
+            completed = min(started + timedelta(minutes=rng.lognormvariate(4.5, 0.9)), anchor)
+            duration = int((completed - started).total_seconds() / 60)
+        changed = completed or started or created
+        if stage == models.RequestStage.SCRAP:
+            changed = min(created + timedelta(hours=rng.lognormvariate(3, 1.0)), anchor)
+        yield {
+            "title": f"{rng.choice(FAULTS)} #{rng.randint(1, 9999)}",
+            "description": f"{rng.choice(FAULTS)} reported on the {rng.choice(DEPARTMENTS).lower()} floor.",
+            "request_type": request_type,
+            "priority": _pick(rng, PRIORITIES),
+            "stage": stage,
+            "maintenance_for": "equipment" if equipment_id else "work_center",
+            "equipment_id": equipment_id,
+            "work_center_id": work_center_id,
+            "team_id": team_id,
+            "technician_id": rng.choice(technicians[team_id]) if assigned else None,
+            "reporter_id": rng.choice(employees),
+            "scheduled_date": created + timedelta(days=rng.randint(0, 14)) if request_type == models.RequestType.PREVENTIVE else None,
+            "started_at": started,
+            "completed_at": completed,
+            "duration_minutes": duration,
+            "stage_changed_at": changed,
+            "created_at": created,
+            "updated_at": changed,
+        }
+
+
+def _stage_spans(row):
+    """(stage, entered, left) for every stage the request has already left."""
+    if row["started_at"] is not None:
+        yield models.RequestStage.NEW, row["created_at"], row["started_at"]
+        if row["completed_at"] is not None:
+            yield models.RequestStage.IN_PROGRESS, row["started_at"], row["completed_at"]
+    elif row["stage"] == models.RequestStage.SCRAP:
+        yield models.RequestStage.NEW, row["created_at"], row["stage_changed_at"]
+
+
+def generate(engine, requests: int, seed: int = 42, days: int = 730, anchor: datetime = DEFAULT_ANCHOR, batch_size: int = 10_000):
+    """Create the schema on ``engine`` and fill it; returns the table sizes."""
+    rng = random.Random(seed)
+    counts = sizes(requests)
+    Base.metadata.create_all(bind=engine)
+    teams, categories, users, technicians, employees, equipment, work_centers = _reference_rows(rng, counts, anchor)
+    with engine.begin() as connection:
+        _insert(connection, models.Team.__table__, teams, batch_size)
+        _insert(connection, models.Category.__table__, categories, batch_size)
+        _insert(connection, models.User.__table__, users, batch_size)
+        _insert(connection, models.Equipment.__table__, equipment, batch_size)
+        _insert(connection, models.WorkCenter.__table__, work_centers, batch_size)
+
+    table = models.MaintenanceRequest.__table__
+    stage_time = defaultdict(lambda: [0, 0.0])  # time-in-stage rollup keys -> [transitions, seconds]
+    batch = []
+    rows = _request_rows(rng, requests, anchor, days, equipment, work_centers, technicians, employees)
+    for row in rows:
+        batch.append(row)
+        for stage, entered, left in _stage_spans(row):
+            key = ("", row["team_id"] or 0, stage.value, left.replace(hour=0, minute=0, second=0, microsecond=0))
+            stage_time[key][0] += 1
+            stage_time[key][1] += (left - entered).total_seconds()
+        if len(batch) >= batch_size:
+            with engine.begin() as connection:
+                connection.execute(insert(table), batch)
+            batch = []
+    if batch:
+        with engine.begin() as connection:
+            connection.execute(insert(table), batch)
+
+    # Core inserts bypass the flush hooks; rebuild what they would have maintained.
+    asyncio.run(stats.reconcile(AsyncSessionLocal))
+    with engine.begin() as connection:
+        reliability.rebuild(connection)
+        _insert(connection, models.StageTimeRollup.__table__, [
+            {"company_name": c, "team_id": t, "stage": stage, "day": day, "transitions": n, "seconds_sum": seconds}
+            for (c, t, stage, day), (n, seconds) in stage_time.items()
+        ], batch_size)
+    return {**counts, "users": len(users), "requests": requests}
+
+
+def is_populated(engine) -> bool:
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        return any(
+            connection.execute(select(func.count()).select_from(table)).scalar()
+            for table in (models.User.__table__, models.MaintenanceRequest.__table__)
+        )
+
+
+def main() -> int:
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=730, help="history length ending at --anchor")
+    parser.add_argument("--anchor", type=datetime.fromisoformat, default=DEFAULT_ANCHOR)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    if is_populated(engine):
+        print("Database already holds requests; point DATABASE_URL at an empty scratch database.")
+        return 1
+    started = time.perf_counter()
+    counts = generate(engine, args.requests, args.seed, args.days, args.anchor, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{name}={value}" for name, value in counts.items()))
+    print(f"Generated in {elapsed:.1f}s ({args.requests / elapsed:,.0f} requests/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# app.database builds its engines at import time; point them at a throwaway SQLite file.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gearguard-test-'), 'test.db')}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
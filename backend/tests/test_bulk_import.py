@@ -0,0 +1,48 @@
+import asyncio
+
+from app import bulk_import
+
+
+class FakeRequest:
+    """Streams ``body`` in ``size``-byte chunks, like Request.stream()."""
+
+    def __init__(self, body: str, size: int = 7):
+        self.body = body.encode()
+        self.size = size
+
+    async def stream(self):
+        for i in range(0, len(self.body), self.size):
+            yield self.body[i:i + self.size]
+
+
+def records(body: str, fmt: str = "csv"):
+    async def collect():
+        return [item async for item in bulk_import.iter_records(FakeRequest(body), fmt)]
+
+    return asyncio.run(collect())
+
+
+def test_csv_quoted_field_spans_lines():
+    body = (
+        "serial_number,description,location\r\n"
+        'SN-1,"first line\r\n\r\nsecond ""quoted"" line",Bay 1\r\n'
+        "SN-2,,Bay 2\r\n"
+    )
+    assert records(body) == [
+        (1, {"serial_number": "SN-1", "description": 'first line\n\nsecond "quoted" line', "location": "Bay 1"}),
+        (2, {"serial_number": "SN-2", "location": "Bay 2"}),
+    ]
+
+
+def test_csv_bad_row_does_not_stop_the_import():
+    body = "serial_number,location\nSN-1\n\nSN-2,Bay 2\n"
+    assert records(body) == [(1, "expected 2 columns, got 1"), (2, {"serial_number": "SN-2", "location": "Bay 2"})]
+
+
+def test_csv_unterminated_quote_is_reported():
+    rows = records('serial_number,location\nSN-1,"Bay 1\n')
+    assert len(rows) == 1 and rows[0][0] == 1 and "unterminated" in rows[0][1]
+
+
+def test_ndjson_one_record_per_line():
+    assert records('{"code": "W1"}\n\n[1]\n', "ndjson") == [(1, {"code": "W1"}), (2, "each line must be a JSON object")]
@@ -0,0 +1,45 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+
+@app.get("/small")
+def small():
+    return JSONResponse({"ok": True}, headers={"Vary": "Authorization"})
+
+
+@app.get("/large")
+def large():
+    return {"rows": ["x" * 10] * 50}
+
+
+@app.get("/image")
+def image():
+    return Response(b"\x89PNG" * 100, media_type="image/png")
+
+
+client = TestClient(app)
+
+
+def test_every_compressible_response_varies_on_accept_encoding():
+    for path in ("/small", "/large"):
+        for accept in ("gzip", "identity"):
+            response = client.get(path, headers={"Accept-Encoding": accept})
+            assert "accept-encoding" in response.headers["vary"].lower(), (path, accept)
+    assert client.get("/small").headers["vary"] == "Authorization, Accept-Encoding"
+
+
+def test_only_large_bodies_are_compressed():
+    assert client.get("/large", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_other_types_are_left_alone():
+    response = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "vary" not in response.headers and "content-encoding" not in response.headers
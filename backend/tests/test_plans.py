@@ -0,0 +1,62 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import dispatch, models, plans
+from app.database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+
+COMPANY = "plans-test"
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        team = models.Team(name="Crew", company_name=COMPANY)
+        category = models.Category(name="Plans test pumps")
+        db.add_all([team, category])
+        db.flush()
+        technicians = [
+            models.User(username=f"plans-tech{i}", email=f"plans-tech{i}@example.com", role=models.UserRole.TECHNICIAN,
+                        team_id=team.id, company_name=COMPANY)
+            for i in range(2)
+        ]
+        db.add_all(technicians)
+        db.flush()
+        for i in range(4):
+            db.add(models.Equipment(
+                name=f"Pump {i}", serial_number=f"PT-{i}", department="Plant", category_id=category.id,
+                default_team_id=team.id, default_technician_id=technicians[0].id, company_name=COMPANY,
+            ))
+        plan = models.MaintenancePlan(
+            name="Weekly pump check", category_id=category.id, interval_days=7, created_by_id=technicians[0].id,
+            starts_at=datetime(2026, 1, 5, 8), company_name=COMPANY,
+        )
+        db.add(plan)
+        db.commit()
+        return plan.id, [t.id for t in technicians]
+
+
+def test_generated_requests_are_dispatched_and_loaded(monkeypatch):
+    plan_id, technician_ids = seed()
+    monkeypatch.setattr(dispatch, "AUTO_DISPATCH", True)
+    monkeypatch.setattr(dispatch, "DISPATCH_DEFAULT_TECH_SLACK", 0)
+    dispatch.board.reset()
+
+    async def generate():
+        async with AsyncSessionLocal() as db:
+            plan = await db.get(models.MaintenancePlan, plan_id)
+            created = await plans.materialize(db, plan, datetime(2026, 1, 25))
+            MR = models.MaintenanceRequest
+            assigned = (await db.scalars(select(MR.technician_id).where(MR.plan_id == plan_id))).all()
+        await async_engine.dispose()
+        return created, assigned
+
+    created, assigned = asyncio.run(generate())
+    assert created == 4 * 3  # 4 pumps x 3 weekly occurrences
+    assert None not in assigned
+    by_technician = Counter(assigned)
+    assert set(by_technician) == set(technician_ids) and abs(by_technician[technician_ids[0]] - by_technician[technician_ids[1]]) <= 1
+    weight = dispatch.weight(models.RequestPriority.MEDIUM)
+    assert {t: dispatch.board.loads[t] for t in technician_ids} == {t: n * weight for t, n in by_technician.items()}
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app import models, reliability
+from app.database import Base, SessionLocal, engine
+
+
+def repaired(minutes, **overrides):
+    completed = datetime(2026, 3, 2, 12)
+    return SimpleNamespace(**{
+        "completed_at": completed, "created_at": completed - timedelta(minutes=minutes), "duration_minutes": minutes,
+        "request_type": models.RequestType.CORRECTIVE, "company_name": None,
+        "equipment_id": None, "team_id": None, "technician_id": None, **overrides,
+    })
+
+
+def percentiles(minutes):
+    """p50 / p90 / p95 of the "all" day bucket for requests taking ``minutes``."""
+    rollups, histogram = reliability._rollup_rows([repaired(m) for m in minutes], {})
+    cells = [(0, None, None)] * (len(reliability.REPAIR_MINUTE_BUCKETS) + 1)
+    for key, cell in histogram.items():
+        if key[1] == "all" and key[3] == "day":
+            cells[key[-1]] = (cell["count"], cell["min_minutes"], cell["max_minutes"])
+    return [reliability._percentile(cells, len(minutes), f) for f in (0.5, 0.9, 0.95)]
+
+
+def test_single_sample_reports_its_own_duration():
+    assert percentiles([0]) == [0.0, 0.0, 0.0]
+    assert percentiles([42]) == [42.0, 42.0, 42.0]
+
+
+def test_skewed_samples_stay_within_observed_times():
+    p50, p90, p95 = percentiles([5] * 9 + [1000])
+    assert p50 == 5.0 and p90 == 5.0
+    assert p95 == 1000.0  # the open-ended bucket is bounded by its largest repair
+
+
+def test_percentiles_interpolate_between_observed_times():
+    p50, p90, p95 = percentiles([20, 22, 24, 26, 28])
+    assert 20 <= p50 <= p90 <= p95 <= 28
+
+
+def test_repairing_a_reopened_request_counts_once():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        request = models.MaintenanceRequest(
+            title="Leak", request_type=models.RequestType.CORRECTIVE, stage=models.RequestStage.REPAIRED,
+            company_name="reliability-test", completed_at=datetime(2026, 3, 2, 12), duration_minutes=30,
+        )
+        db.add(request)
+        db.commit()
+        request.stage = models.RequestStage.IN_PROGRESS
+        db.commit()
+        request.stage = models.RequestStage.REPAIRED
+        request.completed_at = datetime(2026, 3, 2, 14)
+        db.commit()
+
+        R = models.ReliabilityRollup
+        count = db.scalar(select(R.repair_count).where(
+            R.company_name == "reliability-test", R.dimension == "all", R.granularity == "month",
+        ))
+    assert count == 1
@@ -28,17 +28,15 @@ const EquipmentDetail = () => {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [cats, tms, techs] = await Promise.all([
-                    resourceService.getCategories(),
-                    resourceService.getTeams(),
-                    resourceService.getUsers({ role: 'TECHNICIAN' })
+                const [ref, equipmentData] = await Promise.all([
+                    resourceService.getBootstrap(['categories', 'teams', 'technicians']),
+                    isNew ? null : resourceService.getEquipmentById(id)
                 ]);
-                setCategories(cats);
-                setTeams(tms);
-                setTechnicians(techs);
+                setCategories(ref.categories);
+                setTeams(ref.teams);
+                setTechnicians(ref.technicians);
 
                 if (!isNew) {
-                    const equipmentData = await resourceService.getEquipmentById(id);
                     setFormData({
                         name: equipmentData.name || '',
                         serial_number: equipmentData.serial_number || '',
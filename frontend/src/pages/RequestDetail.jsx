@@ -44,31 +44,17 @@ const RequestDetail = () => {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                // Determine if we need to fetch specific lists (could optimize)
-                const [eqs, wcs, allTeams] = await Promise.all([
-                    resourceService.getEquipment(),
-                    resourceService.getWorkCenters(),
-                    resourceService.getTeams()
+                const [ref, req] = await Promise.all([
+                    resourceService.getBootstrap(['equipment_summary', 'work_centers', 'teams', 'technicians']),
+                    isNew ? null : requestService.getById(id).catch(() => null)
                 ]);
+                const eqs = ref.equipment_summary;
                 setEquipmentList(eqs);
-                setWorkCenters(wcs);
-                setTeams(allTeams);
-
-                // Fetch technicians? (Just all users with role tech for now mock)
-                // In real app, filter /users?role=TECHNICIAN
-                const techs = await resourceService.getUsers(); // Assuming returns all
-                setTechnicians(techs.filter(u => u.role === 'TECHNICIAN'));
+                setWorkCenters(ref.work_centers);
+                setTeams(ref.teams);
+                setTechnicians(ref.technicians);
 
                 if (!isNew) {
-                    // Fetch existing request
-                    // Using getAll filters implementation again since GET /{id} is not fully exposed 
-                    // or assuming we fixed schemas to support rich list.
-                    // Let's rely on finding it in the list for MVP if strict getById fails.
-                    // Wait, I didn't implement backend GET /{id} for Request!
-                    // I will do a filter on getAll for this specific ID.
-                    const allRequests = await requestService.getAll();
-                    const req = allRequests.find(r => r.id === parseInt(id));
-
                     if (req) {
                         setFormData({
                             title: req.title,
@@ -35,10 +35,35 @@ export const requestService = {
         const response = await api.get(`/requests/?${params}`);
         return response.data;
     },
+    getById: async (id) => {
+        const response = await api.get(`/requests/${id}`);
+        return response.data;
+    },
+    getByIds: async (ids) => {
+        // One round trip for many cards; results come back in the order asked for.
+        const response = await api.get(`/requests/?ids=${ids.join(',')}`);
+        return response.data;
+    },
+    getHistory: async (filters = {}) => {
+        // Includes archived (long-closed) requests; next page cursor in X-Next-Cursor.
+        const params = new URLSearchParams(filters);
+        const response = await api.get(`/requests/history?${params}`);
+        return response.data;
+    },
+    getEvents: async (id) => {
+        // Stage / technician / priority change log of one request, oldest first.
+        const response = await api.get(`/requests/${id}/events`);
+        return response.data;
+    },
     getStats: async () => {
         const response = await api.get('/reports/stats');
         return response.data;
     },
+    getTimeInStage: async (filters = {}) => {
+        const params = new URLSearchParams(filters);
+        const response = await api.get(`/reports/time-in-stage?${params}`);
+        return response.data;
+    },
     getCalendar: async (start, end) => {
         const response = await api.get(`/requests/calendar?start_date=${start}&end_date=${end}`);
         return response.data;
@@ -112,6 +137,11 @@ export const resourceService = {
         const response = await api.put(`/users/${id}`, data);
         return response.data;
     },
+    getBootstrap: async (include) => {
+        // Reference data for a form in one request, e.g. ['categories', 'teams', 'technicians'].
+        const response = await api.get(`/bootstrap/?include=${include.join(',')}`);
+        return response.data;
+    },
     getCategories: async () => {
         const response = await api.get('/categories/');
         return response.data;